@@ -0,0 +1,128 @@
+"""
+Benchmark del bucle del worker: filas/s sin Redis, con un hget por lote (bucle clásico)
+y con StopWatcher + ProgressReporter (flag local y progreso volcado por intervalos).
+
+Sin --redis-url se usa fakeredis con una latencia artificial por comando (--rtt-ms)
+para simular la red; con --redis-url se mide contra un Redis real.
+
+Uso (desde backend/):  python -m bench.bench_control [--rows 200000] [--rtt-ms 0.5] [--redis-url redis://localhost:6379]
+"""
+import argparse
+import time
+
+import redis
+
+from core.compiler import compile_schema
+from core.context import GenContext
+from core.control import StopWatcher, ProgressReporter
+
+SCHEMA = [
+    {'name': 'id', 'type': 'uuid'},
+    {'name': 'temp', 'type': 'float', 'min': -10, 'max': 40, 'null_percentage': 5},
+    {'name': 'status', 'type': 'choice', 'options': ['OK', 'WARN', 'ERROR'], 'weights': [0.8, 0.15, 0.05]},
+    {'name': 'ts', 'type': 'datetime'},
+]
+
+STATUS_KEY = "sim_status:bench"
+CKPT_KEY = "sim_ckpt:bench:0"
+
+class _LatencyPipeline:
+    def __init__(self, pipe, rtt):
+        self._pipe = pipe
+        self._rtt = rtt
+
+    def __getattr__(self, name):
+        return getattr(self._pipe, name)
+
+    def execute(self):
+        time.sleep(self._rtt)  # Un viaje por pipeline, no por comando
+        return self._pipe.execute()
+
+class LatencyRedis:
+    """Envoltorio de un cliente Redis que añade un RTT fijo a cada viaje."""
+    def __init__(self, conn, rtt_seconds: float):
+        self._conn = conn
+        self._rtt = rtt_seconds
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name == 'pubsub' or not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            time.sleep(self._rtt)
+            return attr(*args, **kwargs)
+        return call
+
+    def pipeline(self, *args, **kwargs):
+        return _LatencyPipeline(self._conn.pipeline(*args, **kwargs), self._rtt)
+
+def loop_no_redis(conn, plan, rows, batch_size):
+    ctx = GenContext(seed=1)
+    i = 0
+    while i < rows:
+        n = min(batch_size, rows - i)
+        plan.batch(n, ctx=ctx)
+        i += n
+
+def loop_poll(conn, plan, rows, batch_size):
+    """Bucle clásico: hget de la parada y pipeline de progreso en cada lote."""
+    ctx = GenContext(seed=1)
+    i = 0
+    while i < rows:
+        if conn.hget(STATUS_KEY, "status") == b"stopped":
+            break
+        n = min(batch_size, rows - i)
+        plan.batch(n, ctx=ctx)
+        i += n
+        pipe = conn.pipeline()
+        pipe.hincrby(STATUS_KEY, "current", n)
+        pipe.hincrby(CKPT_KEY, "reported", n)
+        pipe.execute()
+
+def loop_watcher(conn, plan, rows, batch_size):
+    ctx = GenContext(seed=1)
+    watcher = StopWatcher(conn, "bench").start()
+    progress = ProgressReporter(conn, STATUS_KEY, CKPT_KEY)
+    i = 0
+    while i < rows and not watcher.stopped:
+        n = min(batch_size, rows - i)
+        plan.batch(n, ctx=ctx)
+        i += n
+        progress.add(n)
+    watcher.close()
+    progress.flush()
+
+def rows_per_second(fn, conn, plan, rows, batch_size) -> float:
+    conn.hset(STATUS_KEY, mapping={"status": "running", "current": 0})
+    start = time.perf_counter()
+    fn(conn, plan, rows, batch_size)
+    return rows / (time.perf_counter() - start)
+
+def make_connection(args):
+    if args.redis_url:
+        return redis.Redis.from_url(args.redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("Sin --redis-url hace falta fakeredis (pip install fakeredis)")
+    return LatencyRedis(fakeredis.FakeRedis(), args.rtt_ms / 1000)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--rtt-ms', type=float, default=0.5)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    conn = make_connection(args)
+    plan = compile_schema(SCHEMA)
+    print(f"{'lote':>6} {'sin redis':>14} {'hget por lote':>14} {'watcher':>14}")
+    for batch_size in (1, 100, 1000):
+        # Con lotes de 1 fila (simulaciones con delay) se limitan las filas para no eternizarse
+        rows = args.rows if batch_size > 1 else min(args.rows, 5000)
+        results = [rows_per_second(fn, conn, plan, rows, batch_size)
+                   for fn in (loop_no_redis, loop_poll, loop_watcher)]
+        print(f"{batch_size:>6} " + " ".join(f"{r:>12,.0f}/s" for r in results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark del modo fleet: coste de un tick (avance de estado + lecturas emitidas)
+según el tamaño de la flota, sin sink.
+
+Uso (desde backend/):  python -m bench.bench_fleet [--ticks 10] [--interval 1]
+"""
+import argparse
+import time
+
+from core.compiler import compile_schema
+from core.context import GenContext
+from core.fleet import fleet_from_config
+
+SCHEMA = [
+    {'name': 'temp', 'type': 'float', 'min': -10, 'max': 40, 'null_percentage': 1},
+    {'name': 'humidity', 'type': 'int', 'min': 0, 'max': 100},
+    {'name': 'status', 'type': 'choice', 'options': ['OK', 'WARN', 'ERROR'], 'weights': [0.9, 0.08, 0.02]},
+]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=10)
+    parser.add_argument('--interval', type=int, default=1, help="fleet_max_interval_ticks")
+    args = parser.parse_args()
+
+    plan = compile_schema(SCHEMA)
+    print(f"{'dispositivos':>12} {'ms/tick':>10} {'ticks/s':>10} {'lecturas/s':>14}")
+    for devices in (10_000, 100_000, 1_000_000):
+        config = {'device_count': devices, 'seed': 1, 'fleet_mode': True, 'schema_fields': SCHEMA,
+                  'fleet_failure_rate': 0.001, 'fleet_max_interval_ticks': args.interval}
+        ctx = GenContext(seed=1)
+        fleet = fleet_from_config(config, plan, ctx)
+        rows = 0
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            rows += len(fleet.tick_batch(devices, ctx))
+        elapsed = time.perf_counter() - start
+        print(f"{devices:>12,} {elapsed / args.ticks * 1000:>10.1f} {args.ticks / elapsed:>10.1f} {rows / elapsed:>12,.0f}/s")
+
+if __name__ == '__main__':
+    main()
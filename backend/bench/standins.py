@@ -0,0 +1,162 @@
+"""
+Sustitutos locales de los destinos para medir los sinks sin brokers reales:
+un servidor HTTP en proceso y productores Kafka/RabbitMQ/MQTT falsos que
+serializan igual que los de verdad (el coste de CPU es el mismo) y solo cuentan bytes.
+"""
+import contextlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from core import sinks
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+
+    def add(self, nbytes: int, messages: int = 1):
+        with self.lock:
+            self.messages += messages
+            self.bytes += nbytes
+
+    def reset(self):
+        with self.lock:
+            self.messages = 0
+            self.bytes = 0
+
+# --- HTTP ---
+
+class LocalHttpServer:
+    """Servidor HTTP en un hilo que acepta cualquier POST y cuenta los bytes recibidos."""
+    def __init__(self):
+        counter = self.counter = Counter()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como un webhook real
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                counter.add(len(body))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/ingest"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# --- Kafka / RabbitMQ / MQTT ---
+
+class FakeKafkaProducer:
+    counter = Counter()
+
+    def __init__(self, value_serializer=None, **kwargs):
+        self.serialize = value_serializer or (lambda v: v)
+
+    def send(self, topic, value):
+        self.counter.add(len(self.serialize(value)))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class _FakeNack:
+    pass
+
+class _FakeChannelImpl:
+    """Canal de bajo nivel: cuenta los mensajes publicados en modo confirm."""
+    def __init__(self, counter):
+        self.counter = counter
+        self.tag = 0
+        self.on_confirm = None
+
+    def add_on_return_callback(self, callback):
+        pass
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self.on_confirm = ack_nack_callback
+        callback(None)
+
+    def basic_publish(self, exchange, routing_key, body, mandatory=False):
+        self.counter.add(len(body))
+        self.tag += 1
+
+class _FakeChannel:
+    def __init__(self, counter):
+        self._impl = _FakeChannelImpl(counter)
+
+    def queue_declare(self, queue):
+        pass
+
+    def _flush_output(self, *waiters):
+        # El broker confirma de golpe todo lo publicado (ack con multiple)
+        if self._impl.tag:
+            ack = SimpleNamespace(delivery_tag=self._impl.tag, multiple=True)
+            self._impl.on_confirm(SimpleNamespace(method=ack))
+
+class _FakeBlockingConnection:
+    counter = Counter()
+
+    def __init__(self, params):
+        pass
+
+    def channel(self):
+        return _FakeChannel(self.counter)
+
+    def close(self):
+        pass
+
+class _FakeMqttClient:
+    counter = Counter()
+
+    def connect(self, host, port, keepalive):
+        pass
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def publish(self, topic, payload):
+        self.counter.add(len(payload))
+
+fake_pika = SimpleNamespace(BlockingConnection=_FakeBlockingConnection, ConnectionParameters=lambda host: host,
+                            spec=SimpleNamespace(Basic=SimpleNamespace(Nack=_FakeNack)))
+fake_mqtt = SimpleNamespace(Client=_FakeMqttClient)
+
+COUNTERS = {
+    'kafka': FakeKafkaProducer.counter,
+    'rabbitmq': _FakeBlockingConnection.counter,
+    'mqtt': _FakeMqttClient.counter,
+}
+
+@contextlib.contextmanager
+def fake_brokers():
+    """Sustituye en core.sinks los clientes Kafka/RabbitMQ/MQTT por los falsos."""
+    with mock.patch.object(sinks, 'KafkaProducer', FakeKafkaProducer), \
+         mock.patch.object(sinks, 'pika', fake_pika), \
+         mock.patch.object(sinks, 'mqtt', fake_mqtt):
+        for counter in COUNTERS.values():
+            counter.reset()
+        yield COUNTERS
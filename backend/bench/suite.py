@@ -0,0 +1,386 @@
+"""
+Suite de benchmarks con salida JSON para seguir regresiones entre versiones:
+
+- fields:  filas/s y bytes/s por tipo de campo (generate_row frente a plan.batch)
+- widths:  filas/s por anchura de esquema (10/50/200 campos)
+- formats: FileSink por formato y compresión
+- sinks:   HTTP (servidor en proceso), Kafka/RabbitMQ/MQTT (productores falsos)
+- e2e:     simulation_task completo con fakeredis
+- unique:  campos unique (permutación, filtro de huellas) y estructuras con su memoria
+- relational: índice de claves padre -> hijos (construcción y claves foráneas) y su memoria
+- cache:   caché de datasets: fallo (generar y guardar), acierto (enlazar) y reenvío a Kafka
+
+Uso (desde backend/):
+    python -m bench.suite [--rows 20000] [--only fields,formats] [--out resultados.json]
+    python -m bench.suite --compare base.json [--threshold 0.15] [--fail-on-regression]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+from config import Config
+from core.compiler import compile_schema
+from core.context import GenContext
+from core.encoding import EncodedBatch
+from core.generator import generate_batch, generate_row
+from core.sinks import FileSink, get_sink
+from core.unique import UniqueSet
+from core.relational import KeyIndex
+from bench.bench_compiler import make_schema
+from bench.standins import LocalHttpServer, fake_brokers
+
+SUITES = ('fields', 'widths', 'formats', 'sinks', 'e2e', 'unique', 'relational', 'cache')
+
+FIELD_TYPES = [
+    {'type': 'uuid'},
+    {'type': 'int', 'min': 0, 'max': 1000},
+    {'type': 'float', 'min': -50, 'max': 50},
+    {'type': 'choice', 'options': ['OK', 'WARN', 'ERROR'], 'weights': [0.8, 0.15, 0.05]},
+    {'type': 'datetime'},
+    {'type': 'name'},
+    {'type': 'email'},
+    {'type': 'city'},
+    {'type': 'name', 'pooled': True, 'label': 'name (pooled)'},
+]
+
+# Esquema "típico" para formatos, sinks y e2e
+SCHEMA = [
+    {'name': 'id', 'type': 'uuid'},
+    {'name': 'temp', 'type': 'float', 'min': -10, 'max': 40, 'null_percentage': 5},
+    {'name': 'humidity', 'type': 'int', 'min': 0, 'max': 100},
+    {'name': 'status', 'type': 'choice', 'options': ['OK', 'WARN', 'ERROR'], 'weights': [0.8, 0.15, 0.05]},
+    {'name': 'city', 'type': 'city', 'pooled': True},
+    {'name': 'ts', 'type': 'datetime'},
+]
+
+FILE_CASES = [
+    ('json', None), ('ndjson', None), ('csv', None), ('xml', None), ('toml', None),
+    ('ndjson', 'gzip'), ('ndjson', 'zstd'), ('csv', 'gzip'),
+    ('parquet', None), ('parquet', 'zstd'), ('arrow', None),
+]
+
+def ndjson_bytes(rows: list) -> int:
+    return len(EncodedBatch.from_rows(rows).ndjson())
+
+def result(suite: str, case: str, rows: int, seconds: float, nbytes: int = None, **extra) -> dict:
+    out = {"suite": suite, "case": case, "rows": rows, "seconds": round(seconds, 6),
+           "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None}
+    if nbytes is not None:
+        out.update(bytes=nbytes, bytes_per_s=round(nbytes / seconds, 1) if seconds > 0 else None)
+    out.update(extra)
+    return out
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+# --- Suites ---
+
+def bench_fields(rows: int) -> list:
+    out = []
+    for spec in FIELD_TYPES:
+        label = spec.get('label', spec['type'])
+        schema = [dict({k: v for k, v in spec.items() if k != 'label'}, name='f')]
+        plan = compile_schema(schema)
+        plan.batch(10)  # Calienta pools y cachés fuera de la medida
+        n_row = min(rows, 5000)
+        generated, secs = timed(lambda: [generate_row(schema) for _ in range(n_row)])
+        out.append(result('fields', f"{label}/generate_row", n_row, secs, ndjson_bytes(generated)))
+        batch, secs = timed(lambda: plan.batch(rows))
+        out.append(result('fields', f"{label}/plan.batch", rows, secs, ndjson_bytes(batch.to_rows())))
+        # Entrada pública: plan.batch más la búsqueda del plan en la caché por lote
+        batch, secs = timed(lambda: generate_batch(schema, rows))
+        out.append(result('fields', f"{label}/generate_batch", rows, secs, ndjson_bytes(batch.to_rows())))
+    return out
+
+def bench_widths(rows: int) -> list:
+    out = []
+    for width in (10, 50, 200):
+        schema = make_schema(width)
+        plan = compile_schema(schema)
+        n_row = min(rows, 2000)
+        _, secs = timed(lambda: [generate_row(schema) for _ in range(n_row)])
+        out.append(result('widths', f"{width}/generate_row", n_row, secs))
+        _, secs = timed(lambda: plan.batch(rows).to_rows())
+        out.append(result('widths', f"{width}/plan.batch+rows", rows, secs))
+    return out
+
+def bench_formats(rows: int) -> list:
+    out = []
+    plan = compile_schema(SCHEMA)
+    batches = [plan.batch(min(Config.BATCH_SIZE, rows - i)) for i in range(0, rows, Config.BATCH_SIZE)]
+    tmp = tempfile.mkdtemp(prefix="bench_formats_")
+    try:
+        for fmt, compression in FILE_CASES:
+            path = os.path.join(tmp, f"out.{fmt}")
+            def write(batches):
+                sink = FileSink(path, fmt, compression=compression)
+                for b in batches:
+                    sink.send_columns(b)
+                sink.close()
+                return sink.outputs()
+            write(batches[:1])  # Calentamiento: imports perezosos (pyarrow, zstd) fuera de la medida
+            files, secs = timed(lambda: write(batches))
+            nbytes = sum(os.path.getsize(p) for p, _ in files)
+            out.append(result('formats', f"{fmt}/{compression or 'none'}", rows, secs, nbytes,
+                              bytes_per_row=round(nbytes / rows, 1)))
+            for p, _ in files:
+                os.remove(p)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def bench_sinks(rows: int) -> list:
+    out = []
+    plan = compile_schema(SCHEMA)
+    data = plan.batch(rows).to_rows()
+
+    def run(sink, n):
+        for i in range(0, n, Config.BATCH_SIZE):
+            sink.send_batch(data[i:min(i + Config.BATCH_SIZE, n)])
+        sink.close()
+
+    with LocalHttpServer() as server:
+        for label, options, n in [
+            ('http/per-row', {}, min(rows, 2000)),
+            ('http/json', {'http_batch_format': 'json'}, rows),
+            ('http/ndjson+gzip x4', {'http_batch_format': 'ndjson', 'http_gzip': True, 'http_concurrency': 4}, rows),
+        ]:
+            server.counter.reset()
+            sink = get_sink(dict(options, target_type='http', http_url=server.url), 'bench', None)
+            _, secs = timed(lambda: run(sink, n))
+            out.append(result('sinks', label, n, secs, server.counter.bytes, requests=server.counter.messages))
+
+    with fake_brokers() as counters:
+        configs = {
+            'kafka': {'kafka_bootstrap': 'localhost:9092', 'kafka_topic': 'bench'},
+            'rabbitmq': {'rabbitmq_host': 'localhost', 'rabbitmq_queue': 'bench'},
+            'mqtt': {'mqtt_host': 'localhost', 'mqtt_port': 1883, 'mqtt_topic': 'bench'},
+        }
+        for target, options in configs.items():
+            sink = get_sink(dict(options, target_type=target), 'bench', None)
+            _, secs = timed(lambda: run(sink, rows))
+            out.append(result('sinks', f"{target} (fake)", rows, secs, counters[target].bytes))
+    return out
+
+def bench_e2e(rows: int) -> list:
+    try:
+        import fakeredis
+    except ImportError:
+        print("e2e omitido: hace falta fakeredis (pip install fakeredis)", file=sys.stderr)
+        return []
+    import worker
+
+    out = []
+    tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+    ndjson = {'target_type': 'file', 'file_format': 'ndjson'}
+    kafka = {'target_type': 'kafka', 'kafka_bootstrap': 'localhost:9092', 'kafka_topic': 'bench'}
+    http = {'target_type': 'http', 'http_batch_format': 'ndjson', 'http_gzip': True}
+    cases = [
+        ('file/ndjson', ndjson),
+        ('file/parquet', {'target_type': 'file', 'file_format': 'parquet'}),
+        ('kafka (fake)', kafka),
+        ('http/ndjson+gzip', http),
+        # Modo pipeline (generación y serialización solapadas con el envío)
+        ('file/ndjson pipeline=thread', dict(ndjson, pipeline_mode='thread')),
+        ('file/ndjson pipeline=process', dict(ndjson, pipeline_mode='process')),
+        ('kafka (fake) pipeline=thread', dict(kafka, pipeline_mode='thread')),
+        ('http/ndjson+gzip pipeline=thread', dict(http, pipeline_mode='thread')),
+        # Varios sinks del mismo flujo: cada formato de cable se codifica una vez
+        ('fanout ndjson+kafka+http', {'sinks': [ndjson, kafka, http]}),
+        ('fanout (json_encoder=json)', {'sinks': [ndjson, kafka, http], 'json_encoder': 'json'}),
+        ('fanout pipeline=thread', {'sinks': [ndjson, kafka, http], 'pipeline_mode': 'thread'}),
+    ]
+    try:
+        with fake_brokers() as counters, LocalHttpServer() as server, \
+             mock.patch.object(worker, 'redis_conn', fakeredis.FakeRedis()), mock.patch.object(Config, 'DATA_DIR', tmp):
+            for k, (label, options) in enumerate(cases):
+                config = dict(options, simulation_name='bench', total_records=rows, delay_seconds=0,
+                              device_count=10, seed=1, schema_fields=SCHEMA, http_url=server.url)
+                sim_id = f"bench{k:03d}"
+                with quiet():
+                    _, secs = timed(lambda: worker.simulation_task(sim_id, config))
+                # Bytes entregados a todos los sinks del caso
+                nbytes = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp) if sim_id in f)
+                nbytes += server.counter.bytes + counters['kafka'].bytes
+                server.counter.reset()
+                counters['kafka'].reset()
+                out.append(result('e2e', label, rows, secs, nbytes))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+UNIQUE_FIELDS = [
+    {'type': 'int', 'min': 0, 'max': 10**12, 'label': 'int'},
+    {'type': 'float', 'min': -10**6, 'max': 10**6, 'label': 'float'},
+    {'type': 'name', 'label': 'name (filtro)'},
+    {'type': 'name', 'pooled': True, 'pool_size': 20000, 'label': 'name (pool permutado)'},
+]
+
+def bench_unique(rows: int) -> list:
+    out = []
+    for spec in UNIQUE_FIELDS:
+        label = spec['label']
+        plan = compile_schema([dict({k: v for k, v in spec.items() if k != 'label'}, name='f', unique=True)])
+        plan.batch(1, ctx=GenContext(seed=1))  # Calienta el pool fuera de la medida
+        ctx = GenContext(seed=1, total_rows=rows)
+        with quiet():
+            _, secs = timed(lambda: plan.batch(rows, ctx=ctx))
+        out.append(result('unique', f"{label}/plan.batch", rows, secs))
+
+    # Estructuras: 20 veces más huellas que filas, exacto (presupuesto holgado) y Bloom (justo)
+    n = rows * 20
+    fps = np.random.default_rng(1).integers(1, 2**63, n, dtype=np.uint64)
+    for label, budget in (('exacto', 64 * n), ('bloom', 2 * n)):
+        uset = UniqueSet('bench', budget, n)
+        with quiet():
+            _, secs = timed(lambda: [uset.add_new(fps[k:k + 65536]) for k in range(0, n, 65536)])
+        structure = uset.bloom or uset.exact
+        out.append(result('unique', f"set {label}/add_new", n, secs,
+                          memory_mb=round(structure.nbytes / (1024 * 1024), 2), accepted=uset.count))
+    return out
+
+CARDINALITY_CASES = [
+    {'distribution': 'fixed', 'value': 50},
+    {'distribution': 'poisson', 'mean': 50},
+    {'distribution': 'zipf', 'a': 1.5, 'max': 1000},
+]
+
+def bench_relational(rows: int) -> list:
+    out = []
+    parents = rows * 50  # Padres del índice; las claves foráneas se piden en lotes de 'rows'
+    for card in CARDINALITY_CASES:
+        label = card['distribution']
+        index, secs = timed(lambda: KeyIndex(parents, card, [1, 2]))
+        out.append(result('relational', f"{label}/build", parents, secs,
+                          memory_mb=round(index.nbytes / (1024 * 1024), 2), children=index.total))
+        starts = range(0, min(index.total, rows * 50), rows)
+        _, secs = timed(lambda: [index.parents(start, min(rows, index.total - start)) for start in starts])
+        out.append(result('relational', f"{label}/parents", sum(min(rows, index.total - s) for s in starts), secs))
+    return out
+
+def bench_cache(rows: int) -> list:
+    try:
+        import fakeredis
+    except ImportError:
+        print("cache omitido: hace falta fakeredis (pip install fakeredis)", file=sys.stderr)
+        return []
+    import worker
+    from core.cache import cacheable
+
+    out = []
+    tmp = tempfile.mkdtemp(prefix="bench_cache_")
+    config = {'simulation_name': 'bench', 'total_records': rows, 'seed': 1, 'cache': True, 'schema_fields': SCHEMA,
+              'target_type': 'file', 'file_format': 'ndjson'}
+    kafka = dict(config, target_type='kafka', kafka_bootstrap='localhost:9092', kafka_topic='bench')
+    try:
+        with fake_brokers() as counters, mock.patch.object(worker, 'redis_conn', fakeredis.FakeRedis()), \
+             mock.patch.object(Config, 'DATA_DIR', tmp), quiet():
+            assert cacheable(config)
+            miss = dict(config)
+            _, secs = timed(lambda: worker.cache_lookup(miss, 1) or worker.simulation_task('bench000', miss))
+            nbytes = os.path.getsize(os.path.join(tmp, 'bench_bench000.ndjson'))
+            out.append(result('cache', 'file/ndjson miss (generar)', rows, secs, nbytes))
+            _, secs = timed(lambda: worker.cache_task('bench001', config, worker.cache_lookup(dict(config), 1), 1, None))
+            out.append(result('cache', 'file/ndjson hit (enlazar)', rows, secs, nbytes))
+            hit = worker.cache_lookup(dict(kafka), 1)
+            _, secs = timed(lambda: worker.cache_task('bench002', kafka, hit, 1, None))
+            out.append(result('cache', 'kafka (fake) replay', rows, secs, counters['kafka'].bytes))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+RUNNERS = {'fields': bench_fields, 'widths': bench_widths, 'formats': bench_formats,
+           'sinks': bench_sinks, 'e2e': bench_e2e, 'unique': bench_unique, 'relational': bench_relational,
+           'cache': bench_cache}
+
+# --- Informe ---
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+def print_table(results: list, baseline: dict = None):
+    print(f"{'suite':<10} {'caso':<32} {'filas/s':>14} {'MB/s':>9}" + (f" {'vs base':>9}" if baseline else ""),
+          file=sys.stderr)
+    for r in results:
+        mbs = f"{r['bytes_per_s'] / 1e6:9.1f}" if r.get('bytes_per_s') else f"{'-':>9}"
+        line = f"{r['suite']:<10} {r['case']:<32} {r['rows_per_s']:>14,.0f} {mbs}"
+        if baseline:
+            base = baseline.get((r['suite'], r['case']))
+            line += f" {r['rows_per_s'] / base:>8.2f}x" if base else f" {'nuevo':>9}"
+        print(line, file=sys.stderr)
+
+def regressions(results: list, baseline: dict, threshold: float) -> list:
+    """Casos cuyo rows/s cae más de 'threshold' (fracción) respecto a la base."""
+    out = []
+    for r in results:
+        base = baseline.get((r['suite'], r['case']))
+        if base and r['rows_per_s'] < base * (1 - threshold):
+            out.append((r['suite'], r['case'], base, r['rows_per_s']))
+    return out
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--only', default=','.join(SUITES), help="Suites separadas por comas: " + ','.join(SUITES))
+    parser.add_argument('--out', default=None, help="Fichero JSON de resultados (por defecto, stdout)")
+    parser.add_argument('--compare', default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.15)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.only.split(','):
+        if name not in RUNNERS:
+            parser.error(f"suite desconocida: {name}")
+        print(f"Ejecutando {name}...", file=sys.stderr)
+        results.extend(RUNNERS[name](args.rows))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = {(r['suite'], r['case']): r['rows_per_s'] for r in json.load(f)['results']}
+    print_table(results, baseline)
+
+    report = {"meta": metadata(), "rows": args.rows, "results": results}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if baseline:
+        slower = regressions(results, baseline, args.threshold)
+        for suite, case, before, now in slower:
+            print(f"REGRESIÓN {suite}/{case}: {before:,.0f} -> {now:,.0f} filas/s", file=sys.stderr)
+        if slower and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,4 +3,72 @@ import os
 class Config:
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT = 6379
-    DATA_DIR = "/app/data_output"
\ No newline at end of file
+    DATA_DIR = "/app/data_output"
+    # Filas por lote columnar en el bucle del worker
+    BATCH_SIZE = int(os.getenv('BATCH_SIZE', 1000))
+    # Planes de esquema compilados que cada worker mantiene en memoria
+    PLAN_CACHE_SIZE = int(os.getenv('PLAN_CACHE_SIZE', 128))
+    # Faker: locale por defecto y pools de valores pregenerados (modo "pooled")
+    DEFAULT_LOCALE = os.getenv('DEFAULT_LOCALE', 'es_ES')
+    FAKER_POOL_SIZE = int(os.getenv('FAKER_POOL_SIZE', 10000))
+    FAKER_POOL_MEMORY_MB = int(os.getenv('FAKER_POOL_MEMORY_MB', 256))
+    FAKER_POOL_REFRESH_SECONDS = float(os.getenv('FAKER_POOL_REFRESH_SECONDS', 60))
+    FAKER_POOL_REFRESH_FRACTION = float(os.getenv('FAKER_POOL_REFRESH_FRACTION', 0.1))
+    # Checkpoints: cada cuánto se persiste la posición y cuándo se da un job por muerto
+    CHECKPOINT_SECONDS = float(os.getenv('CHECKPOINT_SECONDS', 30))
+    STALE_AFTER_SECONDS = float(os.getenv('STALE_AFTER_SECONDS', 120))
+    # Control del bucle: sondeo de respaldo de la parada (además de pub/sub) y volcado de progreso
+    STOP_POLL_SECONDS = float(os.getenv('STOP_POLL_SECONDS', 0.5))
+    PROGRESS_FLUSH_SECONDS = float(os.getenv('PROGRESS_FLUSH_SECONDS', 0.5))
+    # Modo rate: granularidad de los micro-lotes y espera máxima antes de reevaluar el perfil
+    RATE_TICK_SECONDS = float(os.getenv('RATE_TICK_SECONDS', 0.005))
+    RATE_MAX_WAIT_SECONDS = float(os.getenv('RATE_MAX_WAIT_SECONDS', 0.05))
+    # Modo fleet: deriva por tick (fracción del rango) y probabilidad de recuperación de un dispositivo caído
+    FLEET_DRIFT = float(os.getenv('FLEET_DRIFT', 0.0001))
+    FLEET_RECOVERY_RATE = float(os.getenv('FLEET_RECOVERY_RATE', 0.05))
+    # Estado de simulaciones: retención tras terminar (0 = sin caducidad) y tamaño de página por defecto
+    STATUS_RETENTION_SECONDS = float(os.getenv('STATUS_RETENTION_SECONDS', 7 * 24 * 3600))
+    STATUS_PAGE_SIZE = int(os.getenv('STATUS_PAGE_SIZE', 100))
+    # Listado de ficheros: validez de la caché y tamaño de página; sondeo del live tail
+    FILE_LIST_CACHE_SECONDS = float(os.getenv('FILE_LIST_CACHE_SECONDS', 5))
+    FILE_PAGE_SIZE = int(os.getenv('FILE_PAGE_SIZE', 100))
+    TAIL_POLL_SECONDS = float(os.getenv('TAIL_POLL_SECONDS', 0.5))
+    # Telemetría: simulaciones expuestas en /metrics y perfilado opcional (profile: cprofile | sampling)
+    METRICS_MAX_SIMULATIONS = int(os.getenv('METRICS_MAX_SIMULATIONS', 100))
+    PROFILE_DIR = os.getenv('PROFILE_DIR')  # Por defecto, DATA_DIR/.profiles
+    PROFILE_SAMPLE_SECONDS = float(os.getenv('PROFILE_SAMPLE_SECONDS', 0.005))
+    # Errores por lote en el log: el primero y después como mucho un aviso (con los omitidos) por intervalo
+    ERROR_LOG_SECONDS = float(os.getenv('ERROR_LOG_SECONDS', 10))
+    # Modo pipeline: lotes en vuelo entre etapas y tamaño de cada hueco de memoria compartida (modo process)
+    PIPELINE_QUEUE_BATCHES = int(os.getenv('PIPELINE_QUEUE_BATCHES', 4))
+    PIPELINE_SLOT_MB = float(os.getenv('PIPELINE_SLOT_MB', 8))
+    # Colas por prioridad: umbrales de 'interactive' (filas por shard y duración estimada con ritmo)
+    # y rodajas de los trabajos 'bulk' (ceden el turno si hay interactivos esperando; 0 = sin rodajas)
+    INTERACTIVE_MAX_ROWS = int(os.getenv('INTERACTIVE_MAX_ROWS', 100000))
+    INTERACTIVE_MAX_SECONDS = float(os.getenv('INTERACTIVE_MAX_SECONDS', 30))
+    BULK_SLICE_SECONDS = float(os.getenv('BULK_SLICE_SECONDS', 30))
+    SLICE_CHECK_SECONDS = float(os.getenv('SLICE_CHECK_SECONDS', 1))
+    JOB_TIMEOUT_SECONDS = int(os.getenv('JOB_TIMEOUT_SECONDS', -1))  # -1 = sin límite (RQ)
+    # Supervisor: procesos worker (máximo; por defecto nº de CPUs), cuántos solo atienden 'interactive'
+    # y escalado por profundidad de cola (un proceso más por cada SCALE_JOBS_PER_WORKER en cola)
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', 0)) or os.cpu_count() or 1
+    WORKER_MIN_PROCESSES = int(os.getenv('WORKER_MIN_PROCESSES', 1))
+    WORKER_INTERACTIVE_PROCESSES = int(os.getenv('WORKER_INTERACTIVE_PROCESSES', 1))
+    SCALE_JOBS_PER_WORKER = int(os.getenv('SCALE_JOBS_PER_WORKER', 2))
+    SCALE_INTERVAL_SECONDS = float(os.getenv('SCALE_INTERVAL_SECONDS', 5))
+    SCALE_DOWN_IDLE_SECONDS = float(os.getenv('SCALE_DOWN_IDLE_SECONDS', 60))
+    # Locales de Faker que cada proceso worker carga al arrancar
+    WARM_LOCALES = os.getenv('WARM_LOCALES', 'es_ES,en_US')
+    # Codificador JSON de los sinks: auto (orjson/msgspec si están instalados), json, orjson o msgspec
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+    # Campos unique: memoria por shard de los filtros de campos Faker (exacto si cabe; si no, Bloom),
+    # intentos por valor antes de dar el espacio por agotado y directorio del log de huellas
+    UNIQUE_MEMORY_MB = float(os.getenv('UNIQUE_MEMORY_MB', 256))
+    UNIQUE_MAX_DRAWS = int(os.getenv('UNIQUE_MAX_DRAWS', 20))
+    UNIQUE_DIR = os.getenv('UNIQUE_DIR')  # Por defecto, DATA_DIR/.unique
+    # Tablas relacionadas: padres por bloque del índice de claves (recuentos de hijos regenerables)
+    RELATION_BLOCK_ROWS = int(os.getenv('RELATION_BLOCK_ROWS', 65536))
+    # Caché de datasets (opción cache de simulaciones con seed): directorio y tamaño máximo antes de
+    # expulsar las entradas menos usadas (LRU)
+    CACHE_DIR = os.getenv('CACHE_DIR')  # Por defecto, DATA_DIR/.cache
+    CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', 2048))
@@ -0,0 +1,280 @@
+import functools
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from importlib import metadata
+
+from config import Config
+from core.encoding import get_encoder
+from core.formats import file_extension, zstd
+from core.sinks import sink_configs
+
+LRU_KEY = "dataset_cache"              # ZSET clave -> último uso (LRU)
+STATS_KEY = "dataset_cache:stats"      # HASH hits, misses, stores, evictions, bytes
+REPLAY_KEY = "dataset_cache:replay"    # HASH clave de datos -> entrada con NDJSON para reproducir
+
+def entry_key(key: str) -> str:
+    return f"dataset_cache:entry:{key}"
+
+# Opciones que no cambian las filas generadas: nombre, cola, modo de ejecución, perfilado y
+# conexión con los destinos. El codificador JSON sí cuenta: los números (1e16 / 1e+16) y NaN
+# no se escriben igual con todos
+NEUTRAL_KEYS = ('simulation_name', 'priority', 'profile', 'cache', 'cache_key',
+                'cache_data_key', 'target_type', 'sinks', 'merge_shards')
+NEUTRAL_PREFIXES = ('pipeline_', 'file_', 'mqtt_', 'kafka_', 'http_', 'rabbitmq_')
+# Ajustes del servidor que sí cambian las filas con el mismo seed
+DATA_SETTINGS = ('BATCH_SIZE', 'DEFAULT_LOCALE', 'FAKER_POOL_SIZE', 'RATE_TICK_SECONDS', 'FLEET_DRIFT',
+                 'FLEET_RECOVERY_RATE', 'UNIQUE_MEMORY_MB', 'UNIQUE_MAX_DRAWS')
+# Módulos que generan y escriben los datos (el worker y el pipeline fijan los cortes de lote,
+# y con ellos cómo se consumen los RNG): cualquier cambio en ellos invalida la caché
+GENERATION_MODULES = ('core/compiler.py', 'core/context.py', 'core/encoding.py', 'core/fleet.py',
+                      'core/formats.py', 'core/generator.py', 'core/pipeline.py', 'core/pools.py',
+                      'core/rate.py', 'core/sinks.py', 'core/unique.py', 'worker.py')
+FILE_OPTIONS = ('file_format', 'file_compression', 'file_max_rows', 'file_max_mb')
+
+@functools.lru_cache(maxsize=1)
+def generator_version() -> str:
+    """Versión del generador: hash del código de generación y de las librerías que fijan los bytes."""
+    digest = hashlib.sha256()
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in GENERATION_MODULES:
+        with open(os.path.join(backend, name), 'rb') as f:
+            digest.update(f.read())
+    for lib in ('Faker', 'numpy', 'pyarrow', 'zstandard', 'orjson', 'msgspec'):
+        try:
+            version = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            version = '-'
+        digest.update(f"{lib}={version}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def cacheable(config: dict) -> bool:
+    """Solo una simulación con seed produce siempre los mismos bytes (y sin tablas, que van por jobs)."""
+    return bool(config.get('cache')) and config.get('seed') is not None and not config.get('tables')
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+def _hash(value) -> str:
+    return hashlib.sha256(_canonical(value).encode('utf-8')).hexdigest()[:32]
+
+def data_key(config: dict, shards: int) -> str:
+    """Clave del flujo de filas: esquema, seed, registros, ritmo, shards y versión del generador."""
+    params = {k: v for k, v in config.items()
+              if k not in NEUTRAL_KEYS and not k.startswith(NEUTRAL_PREFIXES)}
+    params['shards'] = shards  # El efectivo (nunca más que filas o dispositivos)
+    params['json_encoder'] = get_encoder(config.get('json_encoder')).name  # 'auto' según lo instalado
+    settings = {name: getattr(Config, name) for name in DATA_SETTINGS}
+    return _hash([params, settings, generator_version()])
+
+def file_specs(config: dict) -> list:
+    return [c for c in sink_configs(config) if c.get('target_type') == 'file']
+
+def cache_keys(config: dict, shards: int):
+    """(clave de datos, clave de la entrada): la de la entrada añade la disposición de los ficheros."""
+    dkey = data_key(config, shards)
+    layout = [{k: c.get(k) for k in FILE_OPTIONS} for c in file_specs(config)]
+    merge = bool(config.get('merge_shards')) and shards > 1
+    return dkey, _hash([dkey, layout, merge])
+
+def message_config(config: dict):
+    """La configuración con solo sus destinos de mensajes (sin ficheros), o None si no tiene."""
+    specs = sink_configs(config)
+    if all(c['target_type'] == 'file' for c in specs):
+        return None
+    if not config.get('sinks'):
+        return config
+    return dict(config, sinks=[s for s, c in zip(config['sinks'], specs) if c['target_type'] != 'file'])
+
+def cache_dir() -> str:
+    # Directorio oculto bajo DATA_DIR: mismo sistema de ficheros (enlaces duros) y fuera de /api/files
+    return Config.CACHE_DIR or os.path.join(Config.DATA_DIR, '.cache')
+
+def replayable(config: dict) -> str:
+    """Extensión del NDJSON de la simulación (del que se reproducen los mensajes), o None."""
+    for c in file_specs(config):
+        if c.get('file_format') == 'ndjson':
+            return file_extension('ndjson', c.get('file_compression'))
+    return None
+
+def _open_text(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstd is None: raise Exception("zstandard no instalado")
+        # El fichero puede tener varios frames (uno por reanudación)
+        reader = zstd.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    return open(path, 'rb')
+
+def replay_batches(paths: list, batch_size: int):
+    """Líneas (bytes, sin salto) de los NDJSON indicados, por lotes de batch_size."""
+    batch = []
+    for path in paths:
+        with _open_text(path) as f:
+            for line in f:
+                batch.append(line.rstrip(b'\n'))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+def _link(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)  # Otro sistema de ficheros (o sin enlaces duros)
+
+def _rename_manifest(src: str, dst: str, old_prefix: str, prefix: str, sim_id: str):
+    with open(src, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['sim_id'] = sim_id
+    for part in manifest.get('parts', []):
+        if part['file'].startswith(old_prefix):
+            part['file'] = prefix + part['file'][len(old_prefix):]
+    with open(dst, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+class DatasetCache:
+    """
+    Caché de datasets direccionada por contenido. Una entrada guarda todos los ficheros de una
+    simulación con seed terminada (partes, rotaciones y manifests), con enlaces duros si se
+    puede, bajo la clave de su configuración. Un acierto los enlaza con el nombre de la nueva
+    simulación en lugar de generarlos; los manifests se reescriben con el nuevo sim_id.
+    El uso de cada entrada va en un ZSET (LRU): al pasar de CACHE_MAX_MB se expulsan las
+    menos usadas.
+    """
+    def __init__(self, redis_conn, root: str = None, max_bytes: int = None):
+        self.redis = redis_conn
+        self.root = root or cache_dir()
+        self.max_bytes = int(Config.CACHE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+
+    def entry(self, key: str):
+        """{'files': [{suffix, rows, shard, index}], 'prefix'} de la entrada, o None."""
+        files, prefix = self.redis.hmget(entry_key(key), "files", "prefix")
+        if files is None:
+            return None
+        return {"files": json.loads(files), "prefix": prefix.decode('utf-8')}
+
+    def record(self, hit: bool, keys: list = ()):
+        """Cuenta un acierto (y marca como recién usadas sus entradas) o un fallo."""
+        pipe = self.redis.pipeline()
+        pipe.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+        if hit and keys:
+            now = time.time()
+            pipe.zadd(LRU_KEY, {key: now for key in keys})
+        pipe.execute()
+
+    def replay_entry(self, dkey: str):
+        """(entrada, ficheros NDJSON en orden) con las filas de la clave de datos, o None."""
+        key = self.redis.hget(REPLAY_KEY, dkey)
+        if key is None:
+            return None
+        key = key.decode('utf-8')
+        raw = self.redis.hget(entry_key(key), "replay")
+        if raw is None:
+            return None
+        return key, [os.path.join(self.root, key, name) for name in json.loads(raw)]
+
+    def materialize(self, key: str, entry: dict, prefix: str, sim_id: str, data_dir: str) -> list:
+        """
+        Enlaza los ficheros de la entrada como '{prefix}{sufijo}' en data_dir (prefix: 'nombre_simid.').
+        Devuelve [(ruta, filas, shard, índice)] de los ficheros de datos; OSError si la
+        entrada se expulsó entretanto (no queda nada a medias).
+        """
+        created, outputs = [], []
+        try:
+            for f in entry["files"]:
+                src = os.path.join(self.root, key, f["suffix"])
+                dst = os.path.join(data_dir, prefix + f["suffix"])
+                if f["rows"] is None:
+                    _rename_manifest(src, dst, entry["prefix"], prefix, sim_id)
+                else:
+                    _link(src, dst)
+                    outputs.append((dst, f["rows"], f["shard"], f["index"]))
+                created.append(dst)
+        except (OSError, ValueError):
+            for path in created:
+                os.remove(path)
+            raise
+        return outputs
+
+    def store(self, key: str, dkey: str, prefix: str, data_dir: str, outputs: dict, replay_ext: str = None):
+        """
+        Guarda los ficheros '{prefix}*' de data_dir (prefix: 'nombre_simid.') (outputs: ruta -> {rows, shard, index};
+        lo que no está en outputs es un manifest). Si ya existe la entrada no hace nada.
+        """
+        if self.redis.exists(entry_key(key)):
+            return False
+        names = sorted(n for n in os.listdir(data_dir) if n.startswith(prefix))
+        files, size = [], 0
+        for name in names:
+            meta = outputs.get(os.path.join(data_dir, name)) or {}
+            files.append({"suffix": name[len(prefix):], "rows": meta.get("rows"),
+                          "shard": meta.get("shard"), "index": meta.get("index")})
+            size += os.path.getsize(os.path.join(data_dir, name))
+        if not files or size > self.max_bytes:
+            return False
+
+        final = os.path.join(self.root, key)
+        tmp = f"{final}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            for f in files:
+                _link(os.path.join(data_dir, prefix + f["suffix"]), os.path.join(tmp, f["suffix"]))
+            os.rename(tmp, final)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # Otro worker la guardó a la vez
+            return False
+
+        replay = None
+        if replay_ext:
+            parts = [f for f in files if f["rows"] is not None and f".{f['suffix']}".endswith(f".{replay_ext}")]
+            replay = [f["suffix"] for f in sorted(parts, key=lambda f: (f["shard"], f["index"]))]
+        pipe = self.redis.pipeline()
+        mapping = {"files": json.dumps(files), "prefix": prefix, "bytes": size, "created": time.time()}
+        if replay:
+            mapping["replay"] = json.dumps(replay)
+            pipe.hset(REPLAY_KEY, dkey, key)
+        pipe.hset(entry_key(key), mapping=mapping)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+        pipe.hincrby(STATS_KEY, "stores", 1)
+        pipe.hincrby(STATS_KEY, "bytes", size)
+        pipe.execute()
+        self.evict()
+        return True
+
+    def remove(self, key: str) -> bool:
+        size = self.redis.hget(entry_key(key), "bytes")
+        if not self.redis.zrem(LRU_KEY, key):
+            return False  # Otro proceso ya la expulsó
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+        pipe = self.redis.pipeline()
+        pipe.delete(entry_key(key))
+        pipe.hincrby(STATS_KEY, "bytes", -int(size or 0))
+        pipe.hincrby(STATS_KEY, "evictions", 1)
+        pipe.execute()
+        for dkey, target in self.redis.hgetall(REPLAY_KEY).items():
+            if target.decode('utf-8') == key:
+                self.redis.hdel(REPLAY_KEY, dkey)
+        return True
+
+    def evict(self):
+        """Expulsa las entradas menos usadas hasta quedar por debajo de max_bytes."""
+        while int(self.redis.hget(STATS_KEY, "bytes") or 0) > self.max_bytes:
+            oldest = self.redis.zrange(LRU_KEY, 0, 0)
+            if not oldest:
+                break
+            self.remove(oldest[0].decode('utf-8'))
+
+    def stats(self) -> dict:
+        raw = {k.decode('utf-8'): int(v) for k, v in self.redis.hgetall(STATS_KEY).items()}
+        hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+        return {"entries": self.redis.zcard(LRU_KEY), "bytes": raw.get("bytes", 0), "max_bytes": self.max_bytes,
+                "hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+                "stores": raw.get("stores", 0), "evictions": raw.get("evictions", 0)}
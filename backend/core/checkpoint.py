@@ -0,0 +1,106 @@
+import json
+import time
+
+from core.context import GenContext
+
+ACTIVE_SET = "sim_active"
+
+def ctx_state(ctx: GenContext) -> dict:
+    """Estado serializable (JSON) del contexto de generación."""
+    state = {"index": ctx.index}
+    if ctx.deterministic:
+        state["rng"] = ctx.rng.bit_generator.state
+        state["rnd"] = ctx.rnd.getstate()
+        state["fakers"] = {loc: f.random.getstate() for loc, f in ctx._fakers.items()}
+    return state
+
+def _as_random_state(state):
+    # json convierte las tuplas de random.getstate() en listas
+    version, internal, gauss = state
+    return version, tuple(internal), gauss
+
+def restore_ctx(ctx: GenContext, state: dict):
+    ctx.index = state["index"]
+    if ctx.deterministic and "rng" in state:
+        ctx.rng.bit_generator.state = state["rng"]
+        ctx.rnd.setstate(_as_random_state(state["rnd"]))
+        for loc, fstate in state.get("fakers", {}).items():
+            ctx.faker(loc).random.setstate(_as_random_state(fstate))
+
+class CheckpointStore:
+    """
+    Checkpoint de un shard en Redis (sim_ckpt:{sim_id}:{shard}):
+    - offset: siguiente fila a generar
+    - ctx: estado del RNG/reloj en ese offset
+    - sink: posición durable del sink en ese offset
+    - reported: filas sumadas a 'current' por este shard (para corregir el progreso al reanudar)
+    - ts: último latido del job
+    - parked: el job cedió el turno y su continuación ya está encolada (no se reanuda aparte)
+    El estado binario de la flota (modo fleet) va aparte, en sim_ckpt:{sim_id}:{shard}:fleet.
+    """
+    def __init__(self, redis_conn, sim_id: str, shard: int = 0):
+        self.redis = redis_conn
+        self.sim_id = sim_id
+        self.shard = shard
+        self.key = f"sim_ckpt:{sim_id}:{shard}"
+        self.fleet_key = f"{self.key}:fleet"
+        self.member = f"{sim_id}:{shard}"
+
+    def save(self, offset: int, ctx, sink_position: dict, reported: int = None, fleet_state: bytes = None,
+             unique: dict = None):
+        # ctx: el GenContext o su estado ya capturado (modo pipeline: el productor va por delante)
+        # unique: longitudes de los logs de huellas (campos unique) hasta 'offset'
+        mapping = {
+            "offset": offset,
+            "ctx": json.dumps(ctx if isinstance(ctx, dict) else ctx_state(ctx)),
+            "sink": json.dumps(sink_position or {}),
+            "ts": time.time(),
+        }
+        if reported is not None:
+            mapping["reported"] = reported
+        if unique is not None:
+            mapping["unique"] = json.dumps(unique)
+        pipe = self.redis.pipeline()
+        pipe.hset(self.key, mapping=mapping)
+        if fleet_state is not None:
+            pipe.set(self.fleet_key, fleet_state)
+        pipe.sadd(ACTIVE_SET, self.member)
+        pipe.execute()
+
+    def load(self) -> dict:
+        data = self.redis.hgetall(self.key)
+        if not data:
+            return None
+        data = {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+        return {
+            "offset": int(data["offset"]),
+            "ctx": json.loads(data["ctx"]),
+            "sink": json.loads(data["sink"]),
+            "reported": int(data.get("reported", 0)),
+            "ts": float(data.get("ts", 0)),
+            "fleet": self.redis.get(self.fleet_key),
+            "parked": "parked" in data,
+            "unique": json.loads(data.get("unique", "{}")),
+        }
+
+    def touch(self):
+        """Latido sin checkpoint: el job sigue vivo aunque el sink aún no pueda cortar."""
+        self.redis.hset(self.key, "ts", time.time())
+
+    def park(self):
+        self.redis.hset(self.key, "parked", time.time())
+
+    def unpark(self):
+        self.redis.hdel(self.key, "parked")
+
+    def clear(self):
+        pipe = self.redis.pipeline()
+        pipe.delete(self.key, self.fleet_key)
+        pipe.srem(ACTIVE_SET, self.member)
+        pipe.execute()
+
+def active_checkpoints(redis_conn):
+    """(sim_id, shard) de todos los shards con checkpoint vivo (no terminados)."""
+    for member in redis_conn.smembers(ACTIVE_SET):
+        sim_id, shard = member.decode('utf-8').rsplit(':', 1)
+        yield sim_id, int(shard)
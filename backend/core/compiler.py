@@ -0,0 +1,262 @@
+import hashlib
+import json
+import math
+import numpy as np
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, NamedTuple, Tuple
+
+from config import Config
+from core.pools import registry
+from core.context import GenContext, DEFAULT_CONTEXT
+from core.unique import UniqueExhausted, value_space
+from core.generator import (
+    ColumnBatch, FAKER_TYPES, _bound,
+    batch_uuid, batch_int, batch_float, batch_choice, batch_const, batch_null_mask
+)
+
+class FieldPlan(NamedTuple):
+    """Generador especializado de un campo: parámetros ya convertidos y callables prebound."""
+    name: str
+    null_percentage: int
+    one: Callable   # one(ctx) -> valor
+    many: Callable  # many(n, ctx) -> np.ndarray
+
+class SchemaPlan(NamedTuple):
+    """
+    Plan inmutable de un esquema. Se compila una vez por job (y se cachea por hash)
+    para no re-interpretar el esquema en cada fila. El estado (RNG, reloj) vive en
+    el GenContext que se pasa en cada llamada, nunca en el plan.
+    """
+    key: str
+    fields: Tuple[FieldPlan, ...]
+
+    def row(self, sensor_pool: list = None, ctx: GenContext = None) -> dict:
+        ctx = ctx or DEFAULT_CONTEXT
+        rnd = ctx.rnd
+        row = {}
+        if sensor_pool:
+            row['sensor_id'] = rnd.choice(sensor_pool)
+            row['firmware_ver'] = "v1.4.2"
+        for f in self.fields:
+            if f.null_percentage and rnd.randint(0, 100) < f.null_percentage:
+                row[f.name] = None
+            else:
+                row[f.name] = f.one(ctx)
+        if '_timestamp' not in row:
+            row['_timestamp'] = ctx.timestamp(utc=True)
+        ctx.advance(1)
+        return row
+
+    def batch(self, n: int, sensor_pool: list = None, ctx: GenContext = None) -> ColumnBatch:
+        ctx = ctx or DEFAULT_CONTEXT
+        rng = ctx.rng
+        batch = ColumnBatch(n)
+        if sensor_pool:
+            pool = np.asarray(sensor_pool, dtype=object)
+            batch.add('sensor_id', pool[rng.integers(0, len(pool), size=n)])
+            batch.add('firmware_ver', batch_const(n, "v1.4.2"))
+        for f in self.fields:
+            batch.add(f.name, f.many(n, ctx), batch_null_mask(n, rng, f.null_percentage))
+        if '_timestamp' not in batch.columns:
+            batch.add('_timestamp', ctx.timestamps(n, utc=True))
+        ctx.advance(n)
+        return batch
+
+# --- KERNELS (parámetros prebound; el estado llega en ctx) ---
+
+_UUID_CLEAR = ~((0xf000 << 64) | (0xc000 << 48))
+_UUID_SET = (0x4000 << 64) | (0x8000 << 48)  # Versión 4, variante RFC 4122
+
+def _one_uuid(ctx):
+    h = '%032x' % (ctx.rnd.getrandbits(128) & _UUID_CLEAR | _UUID_SET)
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def _many_uuid(n, ctx):
+    return batch_uuid(n, ctx.rng)
+
+def _one_int(ctx, lo, hi):
+    return ctx.rnd.randint(lo, hi)
+
+def _many_int(n, ctx, lo, hi):
+    return batch_int(n, ctx.rng, lo, hi)
+
+def _one_float(ctx, lo, hi):
+    return round(ctx.rnd.uniform(lo, hi), 2)
+
+def _many_float(n, ctx, lo, hi):
+    return batch_float(n, ctx.rng, lo, hi)
+
+def _one_choice(ctx, options, cum_weights):
+    return ctx.rnd.choices(options, cum_weights=cum_weights, k=1)[0]
+
+def _one_uniform_choice(ctx, options):
+    return ctx.rnd.choice(options)
+
+def _many_choice(n, ctx, options, cum_weights=None):
+    return batch_choice(n, ctx.rng, options, cum_weights)
+
+def _one_now(ctx):
+    return ctx.timestamp()
+
+def _many_now(n, ctx):
+    return ctx.timestamps(n)
+
+# Tablas relacionadas: clave primaria = nº de fila (1..N); clave foránea del índice de claves
+def _one_key(ctx):
+    return ctx.index + 1
+
+def _many_key(n, ctx):
+    return np.arange(ctx.index + 1, ctx.index + n + 1, dtype=np.int64)
+
+def _one_ref(ctx, table):
+    return int(_many_ref(1, ctx, table)[0])
+
+def _many_ref(n, ctx, table):
+    index = (ctx.keys or {}).get(table)
+    if index is None:
+        raise ValueError(f"Sin índice de claves de la tabla '{table}' (solo en simulaciones con tables)")
+    return index.parents(ctx.index, n)
+
+def _one_const(ctx, value):
+    return value
+
+def _many_const(n, ctx, value):
+    return batch_const(n, value)
+
+def _one_faker(ctx, locale, provider):
+    return getattr(ctx.faker(locale), provider)()
+
+def _many_faker(n, ctx, locale, provider):
+    gen = getattr(ctx.faker(locale), provider)
+    return np.array([gen() for _ in range(n)], dtype=object)
+
+# Modo "pooled": se busca el pool en el registro en cada llamada para que el
+# desalojo LRU libere memoria aunque el plan siga cacheado.
+def _one_pooled(ctx, locale, provider, size, unique):
+    return registry.get(locale, provider, size, unique, seed=ctx.pool_seed).sample_one(ctx.rnd)
+
+def _many_pooled(n, ctx, locale, provider, size, unique):
+    return registry.get(locale, provider, size, unique, seed=ctx.pool_seed).sample(n, ctx.rng)
+
+# Campos unique: la fila i toma el valor perm(i) de una permutación del espacio de valores
+# (int, float en centésimas, choice, pool con seed); Faker, rechazando repetidos con un filtro.
+
+def _unique_index(n, ctx, name, size):
+    if ctx.index + n > size or (ctx.total_rows or 0) > size:
+        raise UniqueExhausted(f"Campo '{name}': {size} valores posibles para {ctx.total_rows or ctx.index + n} filas")
+    return ctx.permutation(name, size)(np.arange(ctx.index, ctx.index + n, dtype=np.uint64))
+
+def _one_unique(ctx, **kw):
+    value = _many_unique(1, ctx, **kw)[0]
+    return value.item() if isinstance(value, np.generic) else value
+
+def _many_unique(n, ctx, name, size, lo=0, scale=None, options=None):
+    idx = _unique_index(n, ctx, name, size)
+    if options is not None:
+        return options[idx]
+    values = idx.astype(np.int64) + lo
+    return values if scale is None else np.round(values / scale, 2)
+
+def _one_unique_faker(ctx, **kw):
+    return _many_unique_faker(1, ctx, **kw)[0]
+
+def _many_unique_faker(n, ctx, name, locale, provider, pool_size=None):
+    if pool_size is None:
+        gen = getattr(ctx.faker(locale), provider)
+    else:
+        pool = registry.get(locale, provider, pool_size, True, seed=ctx.pool_seed)
+        if ctx.deterministic:
+            # Pool con seed: idéntico en todos los shards, se permuta como un choice
+            return pool.values[_unique_index(n, ctx, name, len(pool))]
+        gen = partial(pool.sample_one, ctx.rnd)
+    return np.array(ctx.unique_filters().draw(name, n, gen), dtype=object)
+
+def _compile_unique(field: dict):
+    name, ftype = field['name'], field['type']
+    if ftype in FAKER_TYPES:
+        kw = dict(name=name, locale=field.get('locale') or Config.DEFAULT_LOCALE, provider=ftype,
+                  pool_size=int(field.get('pool_size') or Config.FAKER_POOL_SIZE) if field.get('pooled') else None)
+        return partial(_one_unique_faker, **kw), partial(_many_unique_faker, **kw)
+    size = value_space(field)
+    if ftype == 'int':
+        kw = dict(lo=int(_bound(field, 'min', 0)))
+    elif ftype == 'float':
+        kw = dict(lo=math.ceil(float(_bound(field, 'min', 0)) * 100 - 1e-6), scale=100)
+    elif ftype == 'choice':
+        kw = dict(options=np.asarray(field.get('options') or [None], dtype=object))
+    else:
+        return None  # uuid, key, datetime con seed: únicos por construcción; ref: según la cardinalidad
+    kw.update(name=name, size=size)
+    return partial(_one_unique, **kw), partial(_many_unique, **kw)
+
+def compile_field(field: dict) -> FieldPlan:
+    ftype = field['type']
+    unique = _compile_unique(field) if field.get('unique') else None
+    if unique is not None:
+        return FieldPlan(field['name'], int(field.get('null_percentage') or 0), *unique)
+
+    if ftype == 'uuid':
+        one, many = _one_uuid, _many_uuid
+    elif ftype in FAKER_TYPES:
+        locale = field.get('locale') or Config.DEFAULT_LOCALE
+        if field.get('pooled'):
+            pool_args = dict(locale=locale, provider=ftype,
+                             size=int(field.get('pool_size') or Config.FAKER_POOL_SIZE),
+                             unique=bool(field.get('pool_unique')))
+            one, many = partial(_one_pooled, **pool_args), partial(_many_pooled, **pool_args)
+        else:
+            one, many = partial(_one_faker, locale=locale, provider=ftype), partial(_many_faker, locale=locale, provider=ftype)
+    elif ftype == 'int':
+        lo, hi = int(_bound(field, 'min', 0)), int(_bound(field, 'max', 100))
+        one, many = partial(_one_int, lo=lo, hi=hi), partial(_many_int, lo=lo, hi=hi)
+    elif ftype == 'float':
+        lo, hi = float(_bound(field, 'min', 0)), float(_bound(field, 'max', 100))
+        one, many = partial(_one_float, lo=lo, hi=hi), partial(_many_float, lo=lo, hi=hi)
+    elif ftype == 'choice':
+        options = field.get('options') or []
+        weights = field.get('weights')
+        if options:
+            opts = tuple(options)
+            opts_arr = np.asarray(options, dtype=object)
+            if weights and len(weights) == len(options):
+                cum = np.cumsum(weights, dtype=float)
+                one = partial(_one_choice, options=opts, cum_weights=tuple(cum.tolist()))
+                many = partial(_many_choice, options=opts_arr, cum_weights=cum)
+            else:
+                one = partial(_one_uniform_choice, options=opts)
+                many = partial(_many_choice, options=opts_arr)
+        else:
+            one, many = partial(_one_const, value=None), partial(_many_const, value=None)
+    elif ftype == 'datetime':
+        one, many = _one_now, _many_now
+    elif ftype == 'key':
+        one, many = _one_key, _many_key
+    elif ftype == 'ref':
+        one, many = partial(_one_ref, table=field.get('table')), partial(_many_ref, table=field.get('table'))
+    else:
+        one, many = partial(_one_const, value="N/A"), partial(_many_const, value="N/A")
+
+    return FieldPlan(field['name'], int(field.get('null_percentage') or 0), one, many)
+
+# --- CACHÉ DE PLANES (por proceso worker) ---
+
+_plan_cache = OrderedDict()
+
+def schema_key(schema: list) -> str:
+    canonical = json.dumps(schema, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+def compile_schema(schema: list) -> SchemaPlan:
+    """Devuelve el plan compilado del esquema, reutilizando el de la caché si ya existe."""
+    key = schema_key(schema)
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        _plan_cache.move_to_end(key)
+        return plan
+
+    plan = SchemaPlan(key, tuple(compile_field(f) for f in schema))
+    _plan_cache[key] = plan
+    if len(_plan_cache) > Config.PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return plan
@@ -0,0 +1,124 @@
+import random
+import zlib
+import numpy as np
+from datetime import datetime
+from faker import Faker
+
+from core.generator import _rng, batch_now, get_faker
+from core.unique import Permutation, UniqueFilters, field_key
+
+DEFAULT_START = datetime(2024, 1, 1)
+
+class GenContext:
+    """
+    Fuentes de aleatoriedad y de tiempo de un job de generación.
+
+    - Sin seed: RNG global, Faker compartido y reloj de pared (comportamiento clásico).
+    - Con seed: RNG NumPy/Random/Faker propios derivados de (seed, shard) y un reloj
+      virtual (start_time + índice_de_fila * step), de modo que la salida es
+      reproducible bit a bit para el mismo seed y número de shards.
+    """
+    def __init__(self, seed: int = None, shard: int = 0, start_time: datetime = None,
+                 step_seconds: float = 0.001, offset: int = 0, unique_key: int = None, total_rows: int = None):
+        self.seed = seed
+        self.shard = shard
+        self.index = offset  # Índice global de la próxima fila a generar
+        self._fakers = {}
+        # Campos unique: clave de las permutaciones (común a todos los shards), filas de la
+        # simulación y filtros de los campos Faker (UniqueFilters; se crean al primer uso)
+        if unique_key is None:
+            unique_key = seed if seed is not None else random.getrandbits(63)
+        self.unique_key = unique_key
+        self.total_rows = total_rows
+        self.unique = None
+        self._perms = {}
+        self.keys = None  # Tablas relacionadas: índices de claves (KeyIndex) por tabla padre
+
+        if seed is None:
+            self.rng = _rng
+            self.rnd = random
+            self.pool_seed = None
+            self.virtual_start = None
+        else:
+            seq = np.random.SeedSequence(seed, spawn_key=(shard,))
+            self.rng = np.random.Generator(np.random.PCG64(seq))
+            self.rnd = random.Random(int(seq.generate_state(2, np.uint64)[0]))
+            self._faker_seed = int(seq.generate_state(2, np.uint64)[1])
+            # Los pools se comparten entre shards: se siembran con el seed de la simulación
+            self.pool_seed = seed
+            self.virtual_start = np.datetime64(start_time or DEFAULT_START, 'us')
+            self.step_us = max(int(round(step_seconds * 1e6)), 1)
+
+    @property
+    def deterministic(self) -> bool:
+        return self.seed is not None
+
+    def faker(self, locale: str) -> Faker:
+        if not self.deterministic:
+            return get_faker(locale)
+        f = self._fakers.get(locale)
+        if f is None:
+            f = Faker(locale)
+            f.seed_instance(self._faker_seed ^ zlib.crc32(locale.encode('utf-8')))
+            self._fakers[locale] = f
+        return f
+
+    def timestamps(self, n: int, utc: bool = False) -> np.ndarray:
+        if self.virtual_start is None:
+            return batch_now(n, utc=utc)
+        offsets = (self.index + np.arange(n, dtype=np.int64)) * self.step_us
+        return self.virtual_start + offsets.astype('timedelta64[us]')
+
+    def timestamp(self, utc: bool = False) -> str:
+        if self.virtual_start is None:
+            return (datetime.utcnow() if utc else datetime.now()).isoformat()
+        ts = self.virtual_start + np.timedelta64(self.index * self.step_us, 'us')
+        return np.datetime_as_string(ts, unit='us')
+
+    def advance(self, n: int):
+        self.index += n
+
+    def permutation(self, name: str, size: int) -> Permutation:
+        perm = self._perms.get((name, size))
+        if perm is None:
+            perm = self._perms[(name, size)] = Permutation(size, field_key(self.unique_key, name))
+        return perm
+
+    def unique_filters(self) -> UniqueFilters:
+        if self.unique is None:
+            self.unique = UniqueFilters()  # Sin log (fuera del worker): solo en memoria
+        return self.unique
+
+DEFAULT_CONTEXT = GenContext()
+
+def _row_interval(config: dict) -> float:
+    # Paso del reloj virtual: el intervalo entre filas de la simulación completa
+    rate = config.get('rate_per_second')
+    if rate:
+        return 1 / float(rate)
+    return float(config.get('delay_seconds') or 0)
+
+def context_from_config(config: dict, shard: int = 0, offset: int = 0) -> GenContext:
+    start_time = config.get('start_time')
+    if isinstance(start_time, str):
+        start_time = datetime.fromisoformat(start_time)
+    return GenContext(
+        seed=config.get('seed'),
+        shard=shard,
+        start_time=start_time,
+        step_seconds=max(_row_interval(config), 0.001),
+        offset=offset,
+        unique_key=config.get('unique_key'),
+        total_rows=config.get('total_records'),
+    )
+
+def shard_range(total: int, shard: int, shards: int):
+    """Filas [start, end) que le tocan a un shard; reparto contiguo y estable."""
+    return total * shard // shards, total * (shard + 1) // shards
+
+def build_sensor_pool(device_count: int, seed: int = None) -> list:
+    if device_count <= 1:
+        return []
+    # Con seed, el pool es el mismo en todos los shards
+    rnd = random.Random(seed) if seed is not None else random.Random()
+    return [f"SENSOR_{str(i+1).zfill(3)}_{rnd.getrandbits(16):04x}" for i in range(device_count)]
@@ -0,0 +1,146 @@
+import threading
+import time
+
+from core.status import publish_event, set_status
+
+def control_channel(sim_id: str) -> str:
+    return f"sim_control:{sim_id}"
+
+def publish_stop(redis_conn, sim_id: str):
+    """Marca la simulación como parada y avisa por pub/sub a los workers que la ejecutan."""
+    set_status(redis_conn, sim_id, "stopped")
+    redis_conn.publish(control_channel(sim_id), "stop")
+
+class StopWatcher:
+    """
+    Vigila la orden de STOP en un hilo aparte para que el bucle de generación no
+    pague un viaje a Redis por fila: el bucle solo consulta un flag local.
+
+    - Pub/sub (sim_control:{sim_id}): la parada llega en cuanto se publica.
+    - Sondeo de respaldo cada poll_seconds sobre sim_status: cubre mensajes perdidos
+      (reconexiones, paradas escritas sin publicar) y Redis sin pub/sub.
+
+    Latencia máxima de parada: poll_seconds + la duración de un lote (el flag se
+    mira entre lotes; los delays se esperan con wait(), que despierta al instante).
+    """
+    def __init__(self, redis_conn, sim_id: str, poll_seconds: float = 0.5):
+        self.redis = redis_conn
+        self.sim_id = sim_id
+        self.status_key = f"sim_status:{sim_id}"
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Duerme hasta 'seconds' o hasta que llegue la parada. Devuelve True si debe parar."""
+        return self._stop.wait(seconds)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"stop-watcher-{self.sim_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        # Sin join: el hilo sale solo en menos de poll_seconds y no retrasa el cierre del job
+        self._closed.set()
+
+    def _subscribe(self):
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(control_channel(self.sim_id))
+            return pubsub
+        except Exception as e:
+            print(f"Aviso: pub/sub no disponible para {self.sim_id}, solo sondeo: {e}")
+            return None
+
+    def _poll(self):
+        try:
+            status = self.redis.hget(self.status_key, "status")
+            if status and status.decode('utf-8') == "stopped":
+                self._stop.set()
+        except Exception:
+            pass  # Si falla redis momentaneamente, se reintenta en el siguiente sondeo
+
+    def _run(self):
+        # Suscribirse antes del primer sondeo: una parada publicada entre medias no se pierde
+        pubsub = self._subscribe()
+        next_poll = 0.0
+        while not self._closed.is_set() and not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_poll:
+                self._poll()
+                next_poll = now + self.poll_seconds
+                continue
+            timeout = next_poll - now
+            if pubsub is None:
+                self._closed.wait(timeout)
+                continue
+            try:
+                message = pubsub.get_message(timeout=timeout)
+                if message and message.get("data") in (b"stop", "stop"):
+                    self._stop.set()
+            except Exception as e:
+                print(f"Aviso: pub/sub caído para {self.sim_id}, se sigue por sondeo: {e}")
+                pubsub = None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+class ProgressReporter:
+    """
+    Acumula el progreso del shard y lo vuelca a Redis en un único pipeline como mucho
+    cada interval_seconds (current, 'reported' del checkpoint y estadísticas del sink).
+    current y reported van en la misma transacción para que la corrección al reanudar cuadre.
+    Con sim_id, cada volcado se publica además como evento 'progress' (streaming de estado).
+    Con telemetry, sus métricas acumuladas viajan en el mismo pipeline. Sin ckpt_key (trabajos
+    sin checkpoint) solo se vuelca el progreso.
+    """
+    def __init__(self, redis_conn, status_key: str, ckpt_key: str, sink=None, interval_seconds: float = 0.5,
+                 sim_id: str = None, telemetry=None):
+        self.redis = redis_conn
+        self.sim_id = sim_id
+        self.status_key = status_key
+        self.ckpt_key = ckpt_key
+        self.sink = sink
+        self.telemetry = telemetry
+        self.interval = interval_seconds
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, n: int):
+        self.pending += n
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        sink_stats = self.sink.stats() if self.sink is not None else None
+        if not self.pending and not sink_stats and self.telemetry is None:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            if self.pending:
+                pipe.hincrby(self.status_key, "current", self.pending)
+                if self.ckpt_key:
+                    pipe.hincrby(self.ckpt_key, "reported", self.pending)
+            if sink_stats:
+                pipe.hset(self.status_key, mapping={f"sink_{k}": v for k, v in sink_stats.items()})
+            if self.telemetry is not None:
+                self.telemetry.drain(pipe)
+            results = pipe.execute()
+            if self.sim_id and (self.pending or sink_stats):
+                event = {f"sink_{k}": v for k, v in (sink_stats or {}).items()}
+                if self.pending:
+                    event.update(current=results[0], delta=self.pending)
+                publish_event(self.redis, self.sim_id, "progress", event)
+            self.pending = 0
+        except Exception as e:
+            # Las filas pendientes se quedan acumuladas para el siguiente volcado
+            print(f"Error volcando progreso: {e}")
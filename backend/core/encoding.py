@@ -0,0 +1,163 @@
+import gzip
+import json
+import time
+
+from config import Config
+from core.formats import batch_to_table, pa
+
+# Codificadores JSON opcionales (más rápidos que json); sin ellos se usa la librería estándar
+try:
+    import orjson
+except ImportError: orjson = None
+try:
+    import msgspec
+except ImportError: msgspec = None
+
+# Salida compacta, como orjson/msgspec: el mismo seed da los mismos bytes con cualquier codificador
+_COMPACT = (',', ':')
+
+class StdlibEncoder:
+    name = 'json'
+    def dumps(self, row: dict) -> bytes:
+        return json.dumps(row, ensure_ascii=False, separators=_COMPACT).encode('utf-8')
+    def dumps_many(self, rows: list) -> list:
+        dumps = json.dumps
+        return [dumps(r, ensure_ascii=False, separators=_COMPACT).encode('utf-8') for r in rows]
+    def dumps_array(self, rows: list) -> bytes:
+        return json.dumps(rows, ensure_ascii=False, separators=_COMPACT).encode('utf-8')
+
+class OrjsonEncoder:
+    name = 'orjson'
+    def __init__(self):
+        if orjson is None: raise Exception("orjson no instalado")
+    def dumps(self, row: dict) -> bytes:
+        return orjson.dumps(row)
+    def dumps_many(self, rows: list) -> list:
+        dumps = orjson.dumps
+        return [dumps(r) for r in rows]
+    def dumps_array(self, rows: list) -> bytes:
+        return orjson.dumps(rows)
+
+class MsgspecEncoder:
+    name = 'msgspec'
+    def __init__(self):
+        if msgspec is None: raise Exception("msgspec no instalado")
+        self.encoder = msgspec.json.Encoder()
+    def dumps(self, row: dict) -> bytes:
+        return self.encoder.encode(row)
+    def dumps_many(self, rows: list) -> list:
+        encode = self.encoder.encode
+        return [encode(r) for r in rows]
+    def dumps_array(self, rows: list) -> bytes:
+        return self.encoder.encode(rows)
+
+ENCODERS = {'json': StdlibEncoder, 'orjson': OrjsonEncoder, 'msgspec': MsgspecEncoder}
+_instances = {}
+
+def get_encoder(name: str = None):
+    """
+    Codificador JSON por nombre (json, orjson, msgspec); 'auto' (por defecto, JSON_ENCODER)
+    elige el más rápido instalado. Todos producen UTF-8 sin escapar y una fila por objeto.
+    """
+    name = name or Config.JSON_ENCODER
+    if name == 'auto':
+        name = 'orjson' if orjson else 'msgspec' if msgspec else 'json'
+    if name not in ENCODERS:
+        raise ValueError(f"Codificador JSON desconocido: {name} ({', '.join(ENCODERS)})")
+    if name not in _instances:
+        _instances[name] = ENCODERS[name]()
+    return _instances[name]
+
+class EncodedBatch:
+    """
+    Un lote con sus codificaciones memoizadas por formato de cable (filas, JSON por fila,
+    NDJSON, array JSON, gzip de cada uno, tabla Arrow). Cada formato se calcula una sola
+    vez y todos los sinks que lo usan reciben el mismo objeto bytes, sin copias.
+    seconds acumula el tiempo de codificación (telemetría: serialización).
+    Se puede enviar a otro proceso (modo pipeline): el codificador viaja por nombre.
+    """
+    def __init__(self, batch=None, encoder: str = None, rows: list = None):
+        self.batch = batch
+        self.encoder_name = get_encoder(encoder).name
+        self.cache = {} if rows is None else {'rows': rows}
+        self.seconds = 0.0
+        self._depth = 0  # Un formato puede derivar de otro: solo se cronometra el exterior
+
+    @classmethod
+    def from_rows(cls, rows: list, encoder: str = None):
+        return cls(encoder=encoder, rows=rows)
+
+    @classmethod
+    def from_json_rows(cls, json_rows: list, encoder: str = None):
+        """Lote de filas ya codificadas (un JSON por fila, p. ej. líneas NDJSON): se envían tal cual."""
+        encoded = cls(encoder=encoder)
+        encoded.cache['json_rows'] = json_rows
+        return encoded
+
+    def __len__(self) -> int:
+        if self.batch is not None:
+            return len(self.batch)
+        return len(self.cache['rows'] if 'rows' in self.cache else self.cache['json_rows'])
+
+    def __getstate__(self):
+        # Las filas (dicts) cuestan más de enviar a otro proceso que de rehacer desde el lote
+        state = dict(self.__dict__)
+        if self.batch is not None:
+            state['cache'] = {k: v for k, v in self.cache.items() if k != 'rows'}
+        return state
+
+    @property
+    def encoder(self):
+        return get_encoder(self.encoder_name)
+
+    def _get(self, key, fn):
+        value = self.cache.get(key)
+        if value is None:
+            t0 = time.perf_counter()
+            self._depth += 1
+            try:
+                value = self.cache[key] = fn()
+            finally:
+                self._depth -= 1
+            if not self._depth:
+                self.seconds += time.perf_counter() - t0
+        return value
+
+    def rows(self) -> list:
+        if self.batch is None:
+            return self._get('rows', lambda: [json.loads(r) for r in self.cache['json_rows']])
+        return self._get('rows', lambda: self.batch.to_rows())
+
+    def json_rows(self) -> list:
+        """Un JSON (bytes) por fila: mensajes de Kafka/RabbitMQ/MQTT, POST por fila."""
+        return self._get('json_rows', lambda: self.encoder.dumps_many(self.rows()))
+
+    def ndjson(self) -> bytes:
+        return self._get('ndjson', lambda: b''.join(r + b'\n' for r in self.json_rows()))
+
+    def json_array(self) -> bytes:
+        return self._get('json_array', lambda: self.encoder.dumps_array(self.rows()))
+
+    def gzip(self, fmt: str):
+        """gzip del formato indicado (una lista se comprime elemento a elemento)."""
+        def compress():
+            value = getattr(self, fmt)()
+            if isinstance(value, list):
+                return [gzip.compress(v, compresslevel=5) for v in value]
+            return gzip.compress(value, compresslevel=5)
+        return self._get(('gzip', fmt), compress)
+
+    def table(self):
+        """pyarrow.Table del lote (sin pasar por filas si hay ColumnBatch); se trocea sin copias."""
+        if self.batch is None:
+            return self._get('table', lambda: pa.Table.from_pylist(self.rows()))
+        return self._get('table', lambda: batch_to_table(self.batch))
+
+    def prepare(self, formats) -> 'EncodedBatch':
+        """Calcula por adelantado los formatos indicados (modo pipeline)."""
+        for fmt in formats:
+            if isinstance(fmt, tuple):
+                self.gzip(fmt[1])
+            else:
+                getattr(self, fmt)()
+        return self
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from config import Config
+from core.formats import COLUMNAR_FORMATS, COMPRESSION_EXT, TEXT_FORMATS
+from core.status import FINISHED
+
+# Extensiones posibles de un fichero de salida, de la más larga a la más corta (json.gz antes que json)
+EXTENSIONS = sorted(
+    list(TEXT_FORMATS) + list(COLUMNAR_FORMATS) + ['manifest.json'] +
+    [f"{fmt}.{ext}" for fmt in TEXT_FORMATS for ext in COMPRESSION_EXT.values()],
+    key=len, reverse=True)
+
+# {simulation_name}_{sim_id}[.partNNN][.NNNN].{ext}
+_SIM_ID = re.compile(r'_([0-9a-f]{8})(?:\.part\d{3})?(?:\.\d{4})?\.[^_]+$')
+
+def safe_path(data_dir: str, filename: str) -> str:
+    """Ruta del fichero dentro de data_dir, o None si no existe o se sale del directorio."""
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.dirname(path) != root or not os.path.isfile(path):
+        return None
+    return path
+
+def split_extension(filename: str):
+    for ext in EXTENSIONS:
+        if filename.endswith('.' + ext):
+            return filename[:-len(ext) - 1], ext
+    return filename, None
+
+def sim_id_of(filename: str) -> str:
+    m = _SIM_ID.search(filename)
+    return m.group(1) if m else None
+
+def next_part(filename: str) -> str:
+    """Nombre de la siguiente parte de rotación (base -> .0001 -> .0002...)."""
+    stem, ext = split_extension(filename)
+    m = re.match(r'(.*)\.(\d{4})$', stem)
+    base, index = (m.group(1), int(m.group(2))) if m else (stem, 0)
+    return f"{base}.{index + 1:04d}.{ext}"
+
+def is_compressed(filename: str) -> bool:
+    _, ext = split_extension(filename)
+    return ext is not None and (ext in COLUMNAR_FORMATS or ext.rsplit('.', 1)[-1] in COMPRESSION_EXT.values())
+
+class FileIndex:
+    """
+    Listado cacheado del directorio de salida (os.scandir: nombre + stat en una pasada).
+    Se rehace si cambia el mtime del directorio (altas/bajas) o si la entrada tiene más
+    de FILE_LIST_CACHE_SECONDS (los tamaños de los ficheros en curso crecen).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}  # data_dir -> (mtime_ns, timestamp, [entradas])
+
+    def _scan(self, data_dir: str) -> list:
+        entries = []
+        with os.scandir(data_dir) as it:
+            for e in it:
+                if e.name.startswith('.') or not e.is_file():
+                    continue
+                st = e.stat()
+                entries.append({"name": e.name, "size": st.st_size, "mtime": st.st_mtime})
+        entries.sort(key=lambda e: (e["mtime"], e["name"]), reverse=True)
+        return entries
+
+    def entries(self, data_dir: str) -> list:
+        if not os.path.isdir(data_dir):
+            return []
+        mtime = os.stat(data_dir).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(data_dir)
+            if cached and cached[0] == mtime and time.monotonic() - cached[1] < Config.FILE_LIST_CACHE_SECONDS:
+                return cached[2]
+        entries = self._scan(data_dir)
+        with self._lock:
+            self._cache[data_dir] = (mtime, time.monotonic(), entries)
+        return entries
+
+    def page(self, redis_conn, data_dir: str, offset: int = 0, limit: int = 100):
+        """(entradas de la página con 'rows' si se conocen, total de ficheros)."""
+        entries = self.entries(data_dir)
+        page = [dict(e) for e in entries[offset:offset + limit]]
+        # Filas: las registra el worker en sim_files:{sim_id} al cerrar cada fichero
+        sim_ids = sorted({sid for sid in (sim_id_of(e["name"]) for e in page) if sid})
+        rows = {}
+        if sim_ids:
+            pipe = redis_conn.pipeline()
+            for sid in sim_ids:
+                pipe.hgetall(f"sim_files:{sid}")
+            for files in pipe.execute():
+                for path, meta in files.items():
+                    rows[os.path.basename(path.decode('utf-8'))] = json.loads(meta)["rows"]
+        for e in page:
+            e["rows"] = rows.get(e["name"])
+            e["modified"] = datetime.fromtimestamp(e.pop("mtime")).isoformat()
+        return page, len(entries)
+
+file_index = FileIndex()
+
+def gzip_stream(path: str, chunk_size: int = 1024 * 1024):
+    """Contenido del fichero comprimido con gzip al vuelo, por bloques."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+    yield compressor.flush()
+
+def writer_finished(redis_conn, path: str) -> bool:
+    """Nadie va a escribir más en el fichero: su simulación terminó o ya rotó a la parte siguiente."""
+    name = os.path.basename(path)
+    if os.path.exists(os.path.join(os.path.dirname(path), next_part(name))):
+        return True
+    sim_id = sim_id_of(name)
+    if sim_id is None:
+        return True
+    status = redis_conn.hget(f"sim_status:{sim_id}", "status")
+    return status is None or status.decode('utf-8') in FINISHED
+
+async def tail_stream(path: str, is_finished, from_start: bool = True, lines: bool = True,
+                      poll_seconds: float = 0.5, chunk_size: int = 256 * 1024):
+    """
+    Sigue un fichero mientras se escribe (como tail -f) y termina cuando is_finished()
+    y el fichero deja de crecer. Con lines=True solo se envían líneas completas (texto
+    sin comprimir); con compresión se envían los bytes tal cual (miembros gzip/zstd).
+    """
+    with open(path, 'rb') as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        pending = b''
+        skip_partial = lines and not from_start  # Desde el final: la primera línea llega a medias
+        finishing = False
+        while True:
+            data = f.read(chunk_size)
+            if data:
+                finishing = False
+                pending += data
+                if skip_partial:
+                    nl = pending.find(b'\n')
+                    if nl < 0:
+                        continue
+                    pending, skip_partial = pending[nl + 1:], False
+                cut = pending.rfind(b'\n') + 1 if lines else len(pending)
+                if cut:
+                    yield pending[:cut]
+                    pending = pending[cut:]
+                continue
+            if finishing:
+                # Una vuelta más sin datos tras ver el fin: el escritor ya cerró el fichero
+                if pending and not skip_partial:
+                    yield pending
+                return
+            finishing = await asyncio.to_thread(is_finished)
+            await asyncio.sleep(poll_seconds)
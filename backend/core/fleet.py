@@ -0,0 +1,137 @@
+import io
+import numpy as np
+from datetime import datetime
+
+from config import Config
+from core.compiler import SchemaPlan, _many_now
+from core.context import GenContext, build_sensor_pool, shard_range
+from core.generator import ColumnBatch, _bound, batch_const, batch_null_mask
+
+# Tipos con estado por dispositivo (paseo aleatorio); el resto se genera por lectura
+STATEFUL_TYPES = ('int', 'float')
+
+class Fleet:
+    """
+    Flota de dispositivos simulada por ticks. El estado de cada dispositivo vive en
+    arrays NumPy (una posición por dispositivo) y cada tick avanza la flota entera
+    en un paso vectorizado:
+
+    - Campos int/float: paseo aleatorio con deriva propia por dispositivo, acotado a [min, max].
+    - Fallos: cada tick un dispositivo cae con probabilidad failure_rate y vuelve con
+      FLEET_RECOVERY_RATE; mientras está caído no emite lecturas.
+    - Muestreo: cada dispositivo emite cada 'interval' ticks con una fase propia.
+
+    El resto de campos del esquema (choice, uuid, Faker...) se generan solo para las
+    lecturas emitidas, con los kernels del plan compilado.
+    """
+    def __init__(self, plan: SchemaPlan, schema: list, device_ids: np.ndarray, ctx: GenContext,
+                 tick_seconds: float = 1.0, volatility: float = 0.01, failure_rate: float = 0.0,
+                 max_interval_ticks: int = 1):
+        rng = ctx.rng
+        size = len(device_ids)
+        self.plan = plan
+        self.ids = device_ids
+        self.tick_us = max(int(round(tick_seconds * 1e6)), 1)
+        self.failure_rate = failure_rate
+        self.tick = 0
+        # Con seed, la línea de tiempo es la virtual; sin seed arranca ahora y el ritmo real la mantiene
+        self.start = ctx.virtual_start if ctx.deterministic else np.datetime64(datetime.utcnow(), 'us')
+
+        # Estado por campo numérico (float32: 4 bytes por dispositivo y array)
+        self.fields = {}
+        for field in schema:
+            if field['type'] not in STATEFUL_TYPES:
+                continue
+            lo, hi = float(_bound(field, 'min', 0)), float(_bound(field, 'max', 100))
+            span = hi - lo
+            self.fields[field['name']] = {
+                'lo': lo, 'hi': hi, 'int': field['type'] == 'int',
+                'sigma': span * volatility,
+                'value': rng.uniform(lo, hi, size).astype(np.float32),
+                'drift': rng.normal(0, span * Config.FLEET_DRIFT, size).astype(np.float32),
+            }
+        self.online = np.ones(size, dtype=bool)
+        self.sampled = max_interval_ticks > 1
+        self.interval = rng.integers(1, max_interval_ticks + 1, size=size, dtype=np.uint16) if self.sampled else None
+        self.phase = rng.integers(0, np.iinfo(np.uint16).max, size=size, dtype=np.uint16) if self.sampled else None
+
+    def _step(self, rng):
+        """Avanza el estado de toda la flota un tick."""
+        size = len(self.ids)
+        if self.failure_rate:
+            roll = rng.random(size, dtype=np.float32)
+            self.online = np.where(self.online, roll >= self.failure_rate, roll < Config.FLEET_RECOVERY_RATE)
+        for state in self.fields.values():
+            value = state['value']
+            value += state['drift'] + rng.standard_normal(size, dtype=np.float32) * np.float32(state['sigma'])
+            np.clip(value, state['lo'], state['hi'], out=value)
+
+    def tick_batch(self, limit: int, ctx: GenContext) -> ColumnBatch:
+        """Avanza un tick y devuelve las lecturas emitidas (como mucho 'limit')."""
+        rng = ctx.rng
+        self._step(rng)
+        emit = self.online
+        if self.sampled:
+            emit = emit & ((self.tick + self.phase.astype(np.int64)) % self.interval == 0)
+        idx = np.flatnonzero(emit)[:limit]
+        n = len(idx)
+        ts = self.start + np.timedelta64(self.tick * self.tick_us, 'us')
+        self.tick += 1
+
+        batch = ColumnBatch(n)
+        batch.add('sensor_id', self.ids[idx])
+        batch.add('firmware_ver', batch_const(n, "v1.4.2"))
+        for f in self.plan.fields:
+            state = self.fields.get(f.name)
+            if state is not None:
+                values = state['value'][idx]
+                values = np.rint(values).astype(np.int64) if state['int'] else np.round(values.astype(np.float64), 2)
+            elif f.many is _many_now:
+                values = np.full(n, ts)
+            else:
+                values = f.many(n, ctx)
+            batch.add(f.name, values, batch_null_mask(n, rng, f.null_percentage))
+        if '_timestamp' not in batch.columns:
+            batch.add('_timestamp', np.full(n, ts))
+        ctx.advance(n)
+        return batch
+
+    # --- Checkpoint: el estado de la flota se guarda como un .npz binario ---
+
+    def state(self) -> bytes:
+        arrays = {'tick': np.array(self.tick), 'start': np.array(self.start), 'online': self.online}
+        if self.sampled:
+            arrays.update(interval=self.interval, phase=self.phase)
+        for name, state in self.fields.items():
+            arrays[f"value:{name}"] = state['value']
+            arrays[f"drift:{name}"] = state['drift']
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        return buf.getvalue()
+
+    def restore(self, data: bytes):
+        arrays = np.load(io.BytesIO(data))
+        self.tick = int(arrays['tick'])
+        self.start = arrays['start'][()]
+        self.online = arrays['online']
+        if self.sampled:
+            self.interval, self.phase = arrays['interval'], arrays['phase']
+        for name, state in self.fields.items():
+            state['value'] = arrays[f"value:{name}"]
+            state['drift'] = arrays[f"drift:{name}"]
+
+def fleet_from_config(config: dict, plan: SchemaPlan, ctx: GenContext, shard: int = 0, shards: int = 1) -> Fleet:
+    """Flota del shard (cada shard simula su tramo de dispositivos) o None si no aplica."""
+    device_count = config.get('device_count', 1)
+    if not config.get('fleet_mode') or device_count <= 1:
+        return None
+    # Mismos ids que el modo aleatorio, en un array de ancho fijo (sin un objeto por dispositivo)
+    lo, hi = shard_range(device_count, shard, shards)
+    ids = np.array(build_sensor_pool(device_count, config.get('seed'))[lo:hi], dtype='U')
+    return Fleet(
+        plan, config.get('schema_fields', []), ids, ctx,
+        tick_seconds=config.get('fleet_tick_seconds') or 1.0,
+        volatility=config.get('fleet_volatility', 0.01),
+        failure_rate=config.get('fleet_failure_rate') or 0.0,
+        max_interval_ticks=config.get('fleet_max_interval_ticks') or 1,
+    )
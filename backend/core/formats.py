@@ -0,0 +1,245 @@
+import csv
+import gzip
+import io
+import os
+
+# Librerías opcionales (para que no falle si falta alguna al arrancar)
+try:
+    import zstandard as zstd
+except ImportError: zstd = None
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError: pa = None
+try:
+    import toml
+except ImportError: toml = None
+try:
+    from dict2xml import dict2xml
+except ImportError: dict2xml = None
+
+TEXT_FORMATS = ('json', 'ndjson', 'csv', 'toml', 'xml')
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+COMPRESSION_EXT = {'gzip': 'gz', 'zstd': 'zst'}
+
+# Envoltorio de cada formato de texto: (cabecera, cierre, separador entre lotes)
+ENVELOPES = {
+    'json': ('[', ']', ',\n'),
+    'ndjson': ('', '', ''),
+    'xml': ('<root>\n', '</root>', ''),
+    'csv': ('', '', ''),
+    'toml': ('', '', ''),
+}
+
+# Filas mínimas por row group en Parquet (los lotes del worker son más pequeños)
+ROW_GROUP_ROWS = 128 * 1024
+
+def file_extension(fmt: str, compression: str = None) -> str:
+    """Extensión del fichero: los formatos columnares comprimen internamente."""
+    if compression and fmt in TEXT_FORMATS:
+        return f"{fmt}.{COMPRESSION_EXT[compression]}"
+    return fmt
+
+class TextStream:
+    """
+    Fichero de texto con compresión gzip/zstd opcional en streaming.
+    sync() cierra el miembro/frame comprimido en curso y abre otro sobre el mismo
+    fichero: gzip y zstd aceptan miembros concatenados, así que el fichero es válido
+    en cada punto de sync y se puede reanudar truncando ahí.
+    """
+    def __init__(self, path: str, compression: str = None, offset: int = None):
+        if compression == 'zstd' and zstd is None: raise Exception("zstandard no instalado")
+        self.compression = compression
+        if offset is None:
+            self.raw = open(path, 'wb')
+        else:
+            self.raw = open(path, 'r+b')
+            self.raw.truncate(offset)
+            self.raw.seek(offset)
+        self._open_member()
+
+    def _open_member(self):
+        if self.compression == 'gzip':
+            # mtime fijo y sin nombre (lleva el sim_id): la cabecera gzip no cambia entre
+            # ejecuciones con el mismo seed
+            self.cstream = gzip.GzipFile(filename='', fileobj=self.raw, mode='wb', compresslevel=6, mtime=0)
+        elif self.compression == 'zstd':
+            self.cstream = zstd.ZstdCompressor(level=3).stream_writer(self.raw, closefd=False)
+        else:
+            self.cstream = self.raw
+        self.text = io.TextIOWrapper(self.cstream, encoding='utf-8')
+
+    def write(self, s: str):
+        self.text.write(s)
+
+    def write_bytes(self, b: bytes):
+        """Escribe bytes ya codificados en UTF-8 (sin pasar por el texto)."""
+        self.text.flush()
+        self.cstream.write(b)
+
+    @property
+    def size(self) -> int:
+        """Bytes en disco (aproximado con compresión: el compresor retiene un buffer)."""
+        return self.raw.tell()
+
+    def flush(self):
+        """Hace visible lo escrito para lectores en vivo (tail), sin fsync. Con compresión no
+        hace nada: vaciar el compresor en cada lote empeoraría el ratio."""
+        if not self.compression:
+            self.text.flush()
+
+    def _end_member(self):
+        self.text.flush()
+        if self.compression:
+            self.text.detach()
+            self.cstream.close()  # Cierra el miembro sin cerrar el fichero
+
+    def sync(self) -> int:
+        self._end_member()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        offset = self.raw.tell()
+        if self.compression:
+            self._open_member()
+        return offset
+
+    def close(self):
+        self._end_member()
+        if self.compression:
+            self.raw.close()
+        else:
+            self.text.close()
+
+class RowEncoder:
+    """Serializa lotes de filas (dicts) al formato de texto de un fichero."""
+    def __init__(self, fmt: str, first_row: bool = True):
+        self.fmt = fmt
+        self.first_row = first_row
+        self.head, self.tail, self.sep = ENVELOPES[fmt]
+        self.csv_buf = io.StringIO()
+        self.csv_writer = None
+
+    def _encode_one(self, data: dict) -> str:
+        if self.fmt == 'toml' and toml:
+            # TOML no soporta listas de objetos nativamente bien en stream,
+            # así que lo guardamos como bloques separados por saltos
+            return toml.dumps(data) + "\n#---\n"
+        elif self.fmt == 'xml' and dict2xml:
+            return dict2xml(data, wrap="record", indent="  ") + "\n"
+        return ""
+
+    def _encode_csv(self, rows: list) -> str:
+        # Un único DictWriter por fichero, escribiendo a un buffer en memoria
+        if self.csv_writer is None:
+            self.csv_writer = csv.DictWriter(self.csv_buf, fieldnames=list(rows[0].keys()))
+            if self.first_row: self.csv_writer.writeheader()
+        self.csv_writer.writerows(rows)
+        chunk = self.csv_buf.getvalue()
+        self.csv_buf.seek(0)
+        self.csv_buf.truncate()
+        return chunk
+
+    def encode(self, rows: list) -> str:
+        """csv/toml/xml; json y ndjson van por encode_json con las filas de EncodedBatch."""
+        if self.fmt == 'csv':
+            chunk = self._encode_csv(rows)
+        else:
+            chunk = ''.join(self._encode_one(r) for r in rows)
+        self.first_row = False
+        return chunk
+
+    def encode_json(self, json_rows: list) -> bytes:
+        """json/ndjson a partir de filas ya codificadas (bytes, ver core.encoding)."""
+        if self.fmt == 'json':
+            chunk = b',\n'.join(json_rows)
+            if not self.first_row: chunk = self.sep.encode('utf-8') + chunk
+        else:
+            chunk = b''.join(r + b'\n' for r in json_rows)
+        self.first_row = False
+        return chunk
+
+def batch_to_table(batch, schema=None):
+    """ColumnBatch -> pyarrow.Table sin pasar por filas (las columnas object son texto)."""
+    arrays = []
+    for name, col in batch.columns.items():
+        if col.dtype == object:
+            arrays.append(pa.array(batch.column_values(name), type=pa.string()))
+        else:
+            arrays.append(pa.array(col, mask=batch.nulls.get(name)))
+    table = pa.Table.from_arrays(arrays, names=list(batch.columns))
+    return table.cast(schema) if schema is not None else table
+
+class ColumnarWriter:
+    """
+    Escritor Parquet / Arrow IPC por row groups. El fichero se crea con el primer
+    lote (el esquema sale de él); si no llega ninguno, no se crea.
+    """
+    def __init__(self, path: str, fmt: str, compression: str = None):
+        if pa is None: raise Exception("pyarrow no instalado")
+        self.path = path
+        self.fmt = fmt
+        self.compression = compression
+        self.schema = None
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+        self.pending_bytes = 0  # nbytes Arrow (sin comprimir) de lo que aún no está en disco
+        self.flushed_bytes = 0
+
+    def _open(self, schema):
+        self.schema = schema
+        if self.fmt == 'parquet':
+            self.writer = pq.ParquetWriter(self.path, schema, compression=self.compression or 'snappy')
+        else:
+            codec = 'zstd' if self.compression == 'zstd' else None  # IPC solo admite zstd/lz4
+            options = pa_ipc.IpcWriteOptions(compression=codec)
+            self.writer = pa_ipc.new_file(self.path, schema, options=options)
+
+    def write_table(self, table):
+        if self.writer is None:
+            self._open(table.schema)
+        elif table.schema != self.schema:
+            table = table.cast(self.schema)
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        self.pending_bytes += table.nbytes
+        if self.pending_rows >= ROW_GROUP_ROWS:
+            self.flush()
+
+    def write_columns(self, batch):
+        self.write_table(batch_to_table(batch, self.schema))
+
+    def write_rows(self, rows: list):
+        self.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def flush(self):
+        if self.pending:
+            self.writer.write_table(pa.concat_tables(self.pending))
+            self.flushed_bytes += self.pending_bytes
+            self.pending = []
+            self.pending_rows = 0
+            self.pending_bytes = 0
+
+    @property
+    def size(self) -> int:
+        """
+        Tamaño estimado del fichero: lo escrito en disco más lo que sigue en memoria. Lo
+        pendiente se escala con la compresión observada en los row groups ya escritos
+        (sin ninguno, cuenta sin comprimir), para que file_max_mb rote a tiempo.
+        """
+        if self.writer is None:
+            return 0
+        written = os.path.getsize(self.path)
+        if not self.pending_bytes:
+            return written
+        ratio = written / self.flushed_bytes if self.flushed_bytes else 1.0
+        return written + int(self.pending_bytes * min(ratio, 1.0))
+
+    def close(self) -> bool:
+        """Cierra el fichero; devuelve False si no llegó a crearse."""
+        if self.writer is None:
+            return False
+        self.flush()
+        self.writer.close()
+        return True
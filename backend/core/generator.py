@@ -1,9 +1,20 @@
 import random
 import uuid
+import numpy as np
 from faker import Faker
 from datetime import datetime
 
 fake = Faker('es_ES')
+_rng = np.random.default_rng()
+_fakers = {'es_ES': fake}
+
+FAKER_TYPES = {'name': fake.name, 'email': fake.email, 'city': fake.city, 'country': fake.country}
+
+def get_faker(locale: str) -> Faker:
+    """Instancia Faker compartida por locale (crear una es caro)."""
+    if locale not in _fakers:
+        _fakers[locale] = Faker(locale)
+    return _fakers[locale]
 
 def generate_row(schema: list, sensor_pool: list = None):
     row = {}
@@ -50,4 +61,109 @@ def generate_row(schema: list, sensor_pool: list = None):
     if '_timestamp' not in row:
         row['_timestamp'] = datetime.utcnow().isoformat()
         
-    return row
\ No newline at end of file
+    return row
+
+# --- MOTOR POR LOTES (COLUMNAR) ---
+
+class ColumnBatch:
+    """
+    Lote columnar: una columna NumPy por campo más una máscara de nulos opcional.
+    Las filas (dicts) solo se materializan cuando un sink las pide.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.columns = {}
+        self.nulls = {}
+
+    def __len__(self):
+        return self.size
+
+    def add(self, name: str, values: np.ndarray, null_mask: np.ndarray = None):
+        self.columns[name] = values
+        if null_mask is not None and null_mask.any():
+            self.nulls[name] = null_mask
+        else:
+            self.nulls.pop(name, None)
+
+    def column_values(self, name: str) -> list:
+        """Convierte una columna a valores Python (None donde la máscara de nulos lo indica)."""
+        col = self.columns[name]
+        if col.dtype.kind == 'M':
+            values = np.datetime_as_string(col, unit='us').tolist()
+        else:
+            values = col.tolist()
+        mask = self.nulls.get(name)
+        if mask is not None:
+            for i in np.flatnonzero(mask).tolist():
+                values[i] = None
+        return values
+
+    def slice(self, start: int, stop: int) -> 'ColumnBatch':
+        part = ColumnBatch(len(range(start, min(stop, self.size))))
+        for name, col in self.columns.items():
+            mask = self.nulls.get(name)
+            part.add(name, col[start:stop], mask[start:stop] if mask is not None else None)
+        return part
+
+    def to_rows(self) -> list:
+        names = list(self.columns)
+        cols = [self.column_values(name) for name in names]
+        return [dict(zip(names, vals)) for vals in zip(*cols)]
+
+    def rows(self):
+        return iter(self.to_rows())
+
+# Kernels vectorizados: generan una columna completa de n valores en una pasada.
+
+_UUID_HEX_POS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+def _bound(field: dict, key: str, default):
+    # Pydantic serializa los límites no informados como None
+    value = field.get(key)
+    return default if value is None else value
+
+def batch_uuid(n: int, rng) -> np.ndarray:
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0f) | 0x40  # Versión 4
+    raw[:, 8] = (raw[:, 8] & 0x3f) | 0x80  # Variante RFC 4122
+    hexed = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8).reshape(n, 32)
+    out = np.full((n, 36), ord('-'), dtype=np.uint8)
+    out[:, _UUID_HEX_POS] = hexed
+    return out.view('S36').ravel().astype('U36')
+
+def batch_int(n: int, rng, lo: int, hi: int) -> np.ndarray:
+    return rng.integers(lo, hi + 1, size=n)
+
+def batch_float(n: int, rng, lo: float, hi: float) -> np.ndarray:
+    return np.round(rng.uniform(lo, hi, size=n), 2)
+
+def batch_choice(n: int, rng, options: np.ndarray, cum_weights: np.ndarray = None) -> np.ndarray:
+    if cum_weights is None:
+        idx = rng.integers(0, len(options), size=n)
+    else:
+        idx = np.searchsorted(cum_weights, rng.random(n) * cum_weights[-1], side='right')
+    return options[idx]
+
+def batch_now(n: int, utc: bool = False) -> np.ndarray:
+    now = datetime.utcnow() if utc else datetime.now()
+    return np.full(n, np.datetime64(now, 'us'))
+
+def batch_const(n: int, value) -> np.ndarray:
+    col = np.empty(n, dtype=object)
+    col.fill(value)
+    return col
+
+def batch_null_mask(n: int, rng, null_percentage: int) -> np.ndarray:
+    # Misma semántica que generate_row: randint(0, 100) < null_percentage
+    if not null_percentage:
+        return None
+    return rng.integers(0, 101, size=n) < null_percentage
+
+def generate_batch(schema: list, n: int, sensor_pool: list = None, ctx=None) -> ColumnBatch:
+    """
+    Genera n filas en formato columnar. Atajo sobre el plan compilado del esquema
+    (compile_schema(schema).batch, cacheado por proceso): el mismo camino que el worker.
+    ctx (GenContext) aporta seed, índice de fila y claves; sin él, aleatoriedad global.
+    """
+    from core.compiler import compile_schema  # compiler importa este módulo
+    return compile_schema(schema).batch(n, sensor_pool, ctx)
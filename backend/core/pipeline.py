@@ -0,0 +1,447 @@
+import multiprocessing as mp
+import pickle
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from config import Config
+from core.checkpoint import ctx_state, restore_ctx
+from core.compiler import compile_schema
+from core.context import context_from_config
+from core.fleet import fleet_from_config
+from core.sinks import preparer_for
+from core.unique import UniqueExhausted, UniqueFilters
+
+PIPELINE_MODES = ('thread', 'process')
+
+class Chunk:
+    """
+    Un lote en tránsito entre etapas: filas, carga (ColumnBatch o ya serializada por el
+    preparador del sink), estado del contexto tras generarlo y segundos por etapa.
+    payload None con n > 0: lote perdido por un error en la etapa 'error'.
+    start: primera fila del lote (con varios productores, para entregarlos en orden).
+    """
+    __slots__ = ('n', 'payload', 'prepared', 'state', 'fleet_state', 'seconds', 'error', 'fatal', 'start')
+
+    def __init__(self, n: int, payload=None, state: dict = None, fleet_state: bytes = None,
+                 seconds: dict = None, error: str = None, fatal: bool = False, start: int = None):
+        self.n = n
+        self.start = start
+        self.payload = payload
+        self.prepared = False
+        self.state = state
+        self.fleet_state = fleet_state
+        self.seconds = seconds if seconds is not None else {}
+        self.error = error
+        self.fatal = fatal
+
+def generate_chunks(plan, ctx, i: int, end: int, batch_size: int, fleet=None, sensor_pool=None,
+                    scheduler=None, wait=None, stopped=None, snapshot: bool = False,
+                    want_fleet_state=None, claim=None):
+    """
+    Etapa productora: genera los lotes de [i, end). Es el mismo código en serie (se itera
+    en el hilo del worker), en un hilo productor o en un proceso.
+
+    - snapshot: adjunta a cada lote el estado del contexto tras generarlo (en pipeline el
+      consumidor va por detrás y es el que hace los checkpoints).
+    - want_fleet_state: Event; si está activo, el siguiente lote lleva el estado de la flota.
+    - claim(n): reparte tramos entre varios productores (sin seed); devuelve el inicio o None.
+    """
+    clock = time.perf_counter
+    while stopped is None or not stopped():
+        if claim is not None:
+            start = claim(batch_size)
+            if start is None:
+                return
+            i = ctx.index = start
+        elif i >= end:
+            return
+        n = min(batch_size, end - i)
+        seconds = {}
+
+        # Con tasa objetivo, esperar (interrumpible) a tener tokens (en modo fleet, uno por tick)
+        if scheduler:
+            t0 = clock()
+            ready = scheduler.acquire(1 if fleet else n, wait)
+            seconds['throttle'] = clock() - t0
+            if not ready:
+                return
+
+        t0 = clock()
+        try:
+            if fleet:
+                batch = fleet.tick_batch(end - i, ctx)
+                n = len(batch)
+            else:
+                batch = plan.batch(n, sensor_pool=sensor_pool, ctx=ctx)
+        except UniqueExhausted:
+            raise  # Ningún lote posterior podría cumplirlo: la simulación termina en error
+        except Exception as e:
+            print(f"Error generando lote: {e}")
+            if fleet:
+                # El estado de la flota quedó a medias: se reanuda desde el checkpoint
+                yield Chunk(0, seconds=seconds, error='generate', fatal=True)
+                return
+            ctx.index = i + n
+            i += n
+            yield Chunk(n, state=ctx_state(ctx) if snapshot else None, seconds=seconds, error='generate', start=i - n)
+            continue
+        seconds['generate'] = clock() - t0
+        i += n
+        fleet_state = None
+        if fleet is not None and want_fleet_state is not None and want_fleet_state.is_set():
+            want_fleet_state.clear()
+            fleet_state = fleet.state()
+        yield Chunk(n, batch, ctx_state(ctx) if snapshot else None, fleet_state, seconds, start=i - n)
+
+def prepare_chunk(chunk: Chunk, preparer) -> Chunk:
+    """Etapa de serialización: aplica el preparador del sink (si lo tiene) a la carga."""
+    if preparer is None or chunk.payload is None or not chunk.n:
+        return chunk
+    t0 = time.perf_counter()
+    try:
+        chunk.payload = preparer(chunk.payload)
+        chunk.prepared = True
+    except Exception as e:
+        print(f"Error serializando lote: {e}")
+        chunk.payload, chunk.error = None, 'serialize'
+    chunk.seconds['serialize'] = time.perf_counter() - t0
+    return chunk
+
+class SerialPipeline:
+    """Sin pipeline: el worker genera y envía en el mismo hilo; el contexto vivo es el del checkpoint."""
+    def __init__(self, chunks, ctx, fleet=None):
+        self.chunks = chunks
+        self.ctx = ctx
+        self.fleet = fleet
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def state_at(self, chunk: Chunk, i: int):
+        return self.ctx
+
+    def fleet_state_at(self, chunk: Chunk) -> bytes:
+        return self.fleet.state() if self.fleet is not None else None
+
+    def request_fleet_state(self):
+        pass
+
+    def close(self):
+        pass
+
+class ThreadPipeline:
+    """
+    Generación en un hilo productor y serialización en 'serializers' hilos, unidos al
+    consumidor (el hilo del worker, dueño del sink) por una cola acotada de futuros en
+    orden: el orden de envío se conserva y, si el sink no da abasto, el productor se
+    bloquea al llenarse la cola (backpressure).
+    """
+    def __init__(self, chunks, preparer=None, serializers: int = 1, depth: int = 4, want_fleet_state=None):
+        self.chunks = chunks
+        self.preparer = preparer
+        self.queue = queue.Queue(maxsize=depth)
+        self.pool = ThreadPoolExecutor(serializers, thread_name_prefix="pipeline-prepare") if preparer else None
+        self.want_fleet_state = want_fleet_state
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._produce, name="pipeline-generate", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _put(self, item) -> bool:
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for chunk in self.chunks:
+                if self.pool is not None:
+                    future = self.pool.submit(prepare_chunk, chunk, None if chunk.error else self.preparer)
+                else:
+                    future = Future()
+                    future.set_result(chunk)
+                if not self._put(future):
+                    return
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            self._put(future)
+        finally:
+            self._put(None)
+
+    def __iter__(self):
+        while True:
+            t0 = time.perf_counter()
+            future = self.queue.get()
+            if future is None:
+                return
+            chunk = future.result()  # Relanza los errores del productor
+            chunk.seconds['wait'] = time.perf_counter() - t0
+            yield chunk
+
+    def state_at(self, chunk: Chunk, i: int):
+        return chunk.state
+
+    def fleet_state_at(self, chunk: Chunk) -> bytes:
+        return chunk.fleet_state
+
+    def request_fleet_state(self):
+        if self.want_fleet_state is not None:
+            self.want_fleet_state.set()
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+# --- Variante con procesos y memoria compartida ---
+
+def _ship(chunk: Chunk, shm, slot_bytes: int, free, ready, stop) -> bool:
+    """Escribe el lote en un hueco libre (pickle protocolo 5 + buffers fuera de banda)."""
+    buffers = []
+    data = pickle.dumps(chunk, protocol=5, buffer_callback=buffers.append)
+    try:
+        raws = [b.raw() for b in buffers]
+    except BufferError:
+        raws = None  # Algún array no contiguo: viaja entero por la cola
+    if raws is None or len(data) + sum(r.nbytes for r in raws) > slot_bytes:
+        ready.put(('inline', pickle.dumps(chunk, protocol=5)))
+        return True
+    while True:
+        try:
+            slot = free.get(timeout=0.1)  # Bloquea mientras el consumidor no libere huecos
+            break
+        except queue.Empty:
+            if stop.is_set():
+                return False
+    pos = slot * slot_bytes
+    shm.buf[pos:pos + len(data)] = data
+    pos += len(data)
+    for raw in raws:
+        shm.buf[pos:pos + raw.nbytes] = raw
+        pos += raw.nbytes
+    ready.put(('slot', slot, len(data), [r.nbytes for r in raws]))
+    return True
+
+def _claimer(next_offset, delivered, end: int, window: int, stop):
+    """
+    Reparto de tramos entre varios productores. Sin adelantarse más de 'window' filas a lo
+    entregado: acota los lotes que el consumidor guarda para entregarlos en orden.
+    """
+    def claim(n):
+        while not stop.is_set():
+            with next_offset.get_lock():
+                start = next_offset.value
+                if start >= end:
+                    return None
+                if start - delivered.value < window:
+                    next_offset.value = min(start + n, end)
+                    return start
+            time.sleep(0.001)
+        return None
+    return claim
+
+def _producer_main(job: dict, index: int, shm_name: str, slot_bytes: int, free, ready, stop,
+                   want_fleet_state, next_offset, delivered):
+    shm = None
+    try:
+        # Con spawn, los productores comparten el resource_tracker del worker: solo él desenlaza
+        shm = shared_memory.SharedMemory(name=shm_name)
+        config = job['config']
+        plan = compile_schema(config.get('schema_fields', []))
+        ctx = context_from_config(config, shard=job['shard'], offset=job['start'])
+        # La flota consume del RNG al crearse: el contexto se restaura después
+        fleet = fleet_from_config(config, plan, ctx, job['shard'], job['shards'])
+        if fleet is not None:
+            fleet.restore(job['fleet'])
+        restore_ctx(ctx, job['ctx'])
+        if job['unique']:
+            ctx.unique = UniqueFilters(**job['unique'])
+        ctx.keys = job['keys']
+
+        claim = _claimer(next_offset, delivered, job['end'], job['window'], stop) if job['producers'] > 1 else None
+        preparer = preparer_for(config)
+        chunks = generate_chunks(plan, ctx, job['start'], job['end'], job['batch_size'], fleet=fleet,
+                                 sensor_pool=job['sensor_pool'], stopped=stop.is_set,
+                                 snapshot=job['producers'] == 1, want_fleet_state=want_fleet_state, claim=claim)
+        for chunk in chunks:
+            prepare_chunk(chunk, None if chunk.error else preparer)
+            if not _ship(chunk, shm, slot_bytes, free, ready, stop):
+                break
+        ready.put(('done', index))
+    except Exception:
+        ready.put(('error', index, traceback.format_exc()))
+    finally:
+        if shm is not None:
+            shm.close()
+
+class ProcessPipeline:
+    """
+    Generación y serialización en 'producers' procesos. Los lotes viajan por un anillo de
+    huecos en memoria compartida: el productor escribe el pickle (protocolo 5, con los
+    buffers NumPy fuera de banda) en un hueco libre y avisa por una cola con su índice;
+    el consumidor lo copia y devuelve el hueco. Los huecos son el límite de lotes en vuelo
+    (backpressure). Un lote que no cabe en un hueco viaja por la propia cola.
+    Con varios productores los lotes llegan desordenados: se entregan en orden de fila, así
+    que lo entregado es siempre el tramo contiguo [start, i) y el checkpoint en i es exacto
+    (al reanudar no se repite ni se pierde ninguna fila, ni un valor unique o una clave).
+    """
+    def __init__(self, job: dict, producers: int = 1, depth: int = 4, slot_bytes: int = 8 * 1024 * 1024):
+        mpctx = mp.get_context('spawn')  # Sin fork: el worker tiene hilos (watcher, sinks...)
+        self.slot_bytes = slot_bytes
+        self.slots = max(depth, producers)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+        self.free = mpctx.Queue()
+        for slot in range(self.slots):
+            self.free.put(slot)
+        self.ready = mpctx.Queue()
+        self.stop = mpctx.Event()
+        self.want_fleet_state = mpctx.Event()
+        self.multi = producers > 1
+        self.next_offset = mpctx.Value('q', job['start'])  # Vivo mientras arrancan los productores
+        self.delivered = mpctx.Value('q', job['start'])  # Fin del tramo contiguo ya entregado
+        job = dict(job, producers=producers, window=self.slots * job['batch_size'])
+        self.procs = [
+            mpctx.Process(target=_producer_main, name=f"pipeline-producer-{k}", daemon=True,
+                          args=(job, k, self.shm.name, slot_bytes, self.free, self.ready, self.stop,
+                                self.want_fleet_state, self.next_offset, self.delivered))
+            for k in range(producers)
+        ]
+
+    def start(self):
+        for p in self.procs:
+            p.start()
+        return self
+
+    def _read(self, message) -> Chunk:
+        if message[0] == 'inline':
+            return pickle.loads(message[1])
+        _, slot, size, sizes = message
+        pos = slot * self.slot_bytes
+        data = bytes(self.shm.buf[pos:pos + size])
+        pos += size
+        buffers = []
+        for n in sizes:
+            buffers.append(bytearray(self.shm.buf[pos:pos + n]))  # Copia: el hueco se reutiliza
+            pos += n
+        self.free.put(slot)
+        return pickle.loads(data, buffers=buffers)
+
+    def __iter__(self):
+        done = 0
+        pending = {}  # Lotes llegados antes que alguno anterior (varios productores), por inicio
+        while done < len(self.procs):
+            t0 = time.perf_counter()
+            try:
+                message = self.ready.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self.procs if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"Productor terminado sin avisar: {', '.join(dead)}")
+                continue
+            if message[0] == 'done':
+                done += 1
+                continue
+            if message[0] == 'error':
+                raise RuntimeError(f"Error en el productor {message[1]}:\n{message[2]}")
+            chunk = self._read(message)
+            chunk.seconds['wait'] = time.perf_counter() - t0
+            if not self.multi:
+                yield chunk
+                continue
+            pending[chunk.start] = chunk
+            while self.delivered.value in pending:
+                chunk = pending.pop(self.delivered.value)
+                self.delivered.value += chunk.n
+                yield chunk
+
+    def state_at(self, chunk: Chunk, i: int):
+        # Con varios productores (sin seed) el contexto solo aporta el índice: los lotes se
+        # entregan en orden, así que i es el final exacto de lo entregado
+        return {"index": i} if self.multi else chunk.state
+
+    def fleet_state_at(self, chunk: Chunk) -> bytes:
+        return chunk.fleet_state
+
+    def request_fleet_state(self):
+        self.want_fleet_state.set()
+
+    def close(self):
+        self.stop.set()
+        # Se vacía la cola mientras terminan: un productor no sale con datos sin entregar
+        deadline = time.monotonic() + 10
+        while any(p.is_alive() for p in self.procs) and time.monotonic() < deadline:
+            try:
+                message = self.ready.get(timeout=0.1)
+                if message[0] == 'slot':
+                    self.free.put(message[1])
+            except queue.Empty:
+                pass
+        for p in self.procs:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        self.shm.close()
+        self.shm.unlink()
+
+def pipeline_mode(config: dict) -> str:
+    """Modo de ejecución de la simulación (None = en serie); valida la configuración."""
+    mode = config.get('pipeline_mode') or None
+    if mode is not None and mode not in PIPELINE_MODES:
+        raise ValueError(f"Modo pipeline desconocido: {mode} (thread, process)")
+    return mode
+
+def open_pipeline(mode: str, config: dict, plan, ctx, i: int, end: int, batch_size: int,
+                  shard: int = 0, shards: int = 1, fleet=None, sensor_pool=None, scheduler=None, watcher=None):
+    """
+    Fuente de lotes del bucle del worker según pipeline_mode:
+
+    - None: en serie, en el hilo del worker.
+    - thread: un hilo generador + pipeline_serializers hilos de serialización.
+    - process: pipeline_producers procesos que generan y serializan. Con seed, fleet o tasa
+      objetivo se usa un único productor (la secuencia del RNG, la flota y el ritmo son uno
+      solo); con tasa objetivo, además, hilos: el ritmo no necesita más CPU.
+    """
+    depth = config.get('pipeline_queue') or Config.PIPELINE_QUEUE_BATCHES
+    stopped = (lambda: watcher.stopped) if watcher is not None else None
+    wait = watcher.wait if watcher is not None else None
+    if mode == 'process' and scheduler is not None:
+        print("Worker: Con tasa objetivo el pipeline usa hilos en lugar de procesos.")
+        mode = 'thread'
+
+    if mode is None:
+        chunks = generate_chunks(plan, ctx, i, end, batch_size, fleet=fleet, sensor_pool=sensor_pool,
+                                 scheduler=scheduler, wait=wait, stopped=stopped)
+        return SerialPipeline(chunks, ctx, fleet)
+
+    if mode == 'thread':
+        want_fleet_state = threading.Event()
+        chunks = generate_chunks(plan, ctx, i, end, batch_size, fleet=fleet, sensor_pool=sensor_pool,
+                                 scheduler=scheduler, wait=wait, stopped=stopped, snapshot=True,
+                                 want_fleet_state=want_fleet_state)
+        return ThreadPipeline(chunks, preparer_for(config), config.get('pipeline_serializers') or 1,
+                              depth, want_fleet_state).start()
+
+    producers = config.get('pipeline_producers') or 1
+    if producers > 1 and (ctx.deterministic or fleet is not None):
+        print("Worker: Con seed o fleet_mode el pipeline usa un único productor.")
+        producers = 1
+    job = {
+        'config': config, 'shard': shard, 'shards': shards, 'start': i, 'end': end,
+        'batch_size': batch_size, 'ctx': ctx_state(ctx), 'sensor_pool': sensor_pool,
+        'fleet': fleet.state() if fleet is not None else None,
+        'unique': ctx.unique.spec() if ctx.unique is not None else None,
+        'keys': ctx.keys,  # Índices de claves (tablas relacionadas): solo offsets por bloque
+    }
+    return ProcessPipeline(job, producers, depth, int(Config.PIPELINE_SLOT_MB * 1024 * 1024)).start()
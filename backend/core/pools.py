@@ -0,0 +1,142 @@
+import sys
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from faker import Faker
+from faker.exceptions import UniquenessException
+
+from config import Config
+
+class ValuePool:
+    """
+    Pool de valores Faker pregenerados para un (locale, provider).
+    Se rellena en bloque y se muestrea por índice; el refresco sustituye el array
+    completo (copy-on-write), así que los lectores nunca ven un pool a medias.
+    Un pool con seed es determinista y no se refresca nunca.
+    """
+    def __init__(self, locale: str, provider: str, size: int, unique: bool = False, seed: int = None):
+        self.locale = locale
+        self.provider = provider
+        self.unique = unique
+        self.seed = seed
+        self.requested = size  # Puede quedar más corto si el espacio de valores únicos se agota
+        self.faker = Faker(locale)
+        if seed is not None:
+            self.faker.seed_instance(seed)
+        self.values = self._fill(size)
+        self.nbytes = self._estimate_bytes(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _fill(self, size: int, exclude: set = None) -> np.ndarray:
+        if self.unique:
+            gen = getattr(self.faker.unique, self.provider)
+            self.faker.unique.clear()
+        else:
+            gen = getattr(self.faker, self.provider)
+        out = []
+        try:
+            while len(out) < size:
+                v = gen()
+                if exclude is None or v not in exclude:
+                    out.append(v)
+        except UniquenessException:
+            pass  # Espacio de valores agotado: el pool se queda con los únicos que haya
+        return np.array(out, dtype=object)
+
+    @staticmethod
+    def _estimate_bytes(values: np.ndarray) -> int:
+        return values.nbytes + sum(sys.getsizeof(v) for v in values)
+
+    def sample(self, n: int, rng) -> np.ndarray:
+        values = self.values
+        return values[rng.integers(0, len(values), size=n)]
+
+    def sample_one(self, rnd):
+        values = self.values
+        return values[rnd.randrange(len(values))]
+
+    def refresh(self, fraction: float):
+        """Regenera una fracción de los valores para que el pool no sea estático."""
+        current = self.values
+        k = int(len(current) * fraction)
+        if k == 0:
+            return
+        fresh = self._fill(k, exclude=set(current.tolist()) if self.unique else None)
+        if len(fresh) == 0:
+            return
+        new = current.copy()
+        slots = np.random.default_rng().choice(len(new), size=len(fresh), replace=False)
+        new[slots] = fresh
+        self.values = new
+
+class PoolRegistry:
+    """
+    Registro global de pools con presupuesto de memoria y desalojo LRU entre locales.
+    Un hilo en segundo plano refresca periódicamente los pools vivos.
+    """
+    def __init__(self, budget_bytes: int, refresh_seconds: float, refresh_fraction: float):
+        self.budget_bytes = budget_bytes
+        self.refresh_seconds = refresh_seconds
+        self.refresh_fraction = refresh_fraction
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(p.nbytes for p in self._pools.values())
+
+    def get(self, locale: str, provider: str, size: int, unique: bool = False, seed: int = None) -> ValuePool:
+        # Un pool con seed se muestrea por índice: su tamaño forma parte de la salida
+        key = (locale, provider, unique, seed, size if seed is not None else None)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None and pool.requested >= size:
+                self._pools.move_to_end(key)
+                return pool
+
+        # El relleno es lento: se hace fuera del lock para no bloquear otros pools
+        pool = ValuePool(locale, provider, size, unique, seed)
+        with self._lock:
+            self._pools[key] = pool
+            self._pools.move_to_end(key)
+            self._evict(keep=key)
+        self._ensure_refresher()
+        return pool
+
+    def _evict(self, keep):
+        while self.used_bytes > self.budget_bytes and len(self._pools) > 1:
+            oldest = next(iter(self._pools))
+            if oldest == keep:
+                break
+            self._pools.popitem(last=False)
+
+    def _ensure_refresher(self):
+        if self._refresher is None and self.refresh_seconds > 0:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="faker-pool-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            with self._lock:
+                pools = [p for p in self._pools.values() if p.seed is None]
+            for pool in pools:
+                try:
+                    pool.refresh(self.refresh_fraction)
+                    pool.nbytes = pool._estimate_bytes(pool.values)
+                except Exception as e:
+                    print(f"Error refrescando pool {pool.locale}/{pool.provider}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+
+registry = PoolRegistry(
+    budget_bytes=Config.FAKER_POOL_MEMORY_MB * 1024 * 1024,
+    refresh_seconds=Config.FAKER_POOL_REFRESH_SECONDS,
+    refresh_fraction=Config.FAKER_POOL_REFRESH_FRACTION,
+)
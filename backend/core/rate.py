@@ -0,0 +1,110 @@
+import math
+import time
+
+from config import Config
+
+PROFILES = ('constant', 'ramp', 'sine', 'spike')
+
+# Fracción de cada periodo que dura un pico en el perfil 'spike'
+SPIKE_DUTY = 0.1
+
+class RateProfile:
+    """
+    Tasa objetivo (filas/s) en función del tiempo transcurrido desde el arranque:
+    - constant: rate fijo
+    - ramp: sube linealmente de 0 a rate en period segundos y se mantiene
+    - sine: rate * (1 + amplitude * sin(2πt/period))
+    - spike: rate, con picos de rate * (1 + amplitude) durante el último 10% de cada periodo
+    """
+    def __init__(self, rate: float, profile: str = 'constant', period: float = 60, amplitude: float = 0.5):
+        if profile not in PROFILES:
+            raise ValueError(f"Perfil de carga desconocido: {profile} ({', '.join(PROFILES)})")
+        self.rate = rate
+        self.profile = profile
+        self.period = period
+        self.amplitude = amplitude
+
+    def rate_at(self, t: float) -> float:
+        if self.profile == 'ramp':
+            return self.rate * min(t / self.period, 1.0)
+        if self.profile == 'sine':
+            return max(self.rate * (1 + self.amplitude * math.sin(2 * math.pi * t / self.period)), 0.0)
+        if self.profile == 'spike' and (t % self.period) >= self.period * (1 - SPIKE_DUTY):
+            return self.rate * (1 + self.amplitude)
+        return self.rate
+
+class RateScheduler:
+    """
+    Token bucket contra el reloj monotónico: los tokens se acumulan según la tasa del
+    perfil, así que el tiempo de generación y envío no acumula deriva (se descuenta
+    solo). 'burst' es la capacidad del cubo: lo que se puede recuperar de golpe tras
+    un atasco; más allá, el retraso se pierde en lugar de disparar una avalancha.
+
+    Se emite en micro-lotes de 'chunk' filas, de tamaño fijo (depende solo de la tasa
+    base), para que con seed la salida no dependa de la temporización.
+    """
+    def __init__(self, profile: RateProfile, chunk: int = 1, burst: float = None, clock=time.monotonic):
+        self.profile = profile
+        self.chunk = max(int(chunk), 1)
+        self.burst = max(float(burst or 0), self.chunk)
+        self.clock = clock
+        self.start = clock()
+        self.last = self.start
+        self.tokens = float(self.chunk)  # La primera emisión sale sin esperar
+        self.emitted = 0
+
+    def _refill(self):
+        now = self.clock()
+        # Tasa en el punto medio del intervalo: integra bien los perfiles variables
+        mid = (self.last + now) / 2 - self.start
+        self.tokens = min(self.tokens + self.profile.rate_at(mid) * (now - self.last), self.burst)
+        self.last = now
+
+    def acquire(self, n: int, wait) -> bool:
+        """
+        Bloquea hasta que haya n tokens y los consume. 'wait(segundos)' duerme y
+        devuelve True si hay que parar (p.ej. StopWatcher.wait). Devuelve False si se paró.
+        """
+        n = min(n, self.burst)
+        while True:
+            self._refill()
+            if self.tokens >= n:
+                self.tokens -= n
+                self.emitted += n
+                return True
+            rate = self.profile.rate_at(self.last - self.start)
+            # Espera acotada: con perfiles variables (o tasa 0 al inicio de una rampa) se reevalúa
+            pause = (n - self.tokens) / rate if rate > 0 else Config.RATE_MAX_WAIT_SECONDS
+            if wait(min(pause, Config.RATE_MAX_WAIT_SECONDS)):
+                return False
+
+    def achieved(self) -> float:
+        """Tasa media conseguida desde el arranque (filas/s)."""
+        elapsed = self.clock() - self.start
+        return self.emitted / elapsed if elapsed > 0 else 0.0
+
+def scheduler_from_config(config: dict, shards: int = 1, batch_size: int = None, fleet: bool = False) -> RateScheduler:
+    """
+    Scheduler del job según la configuración, o None si va a máxima velocidad.
+    rate_per_second es para toda la simulación: cada shard emite su parte.
+    delay_seconds se trata como una tasa de 1/delay sin ráfagas.
+    En modo fleet el scheduler marca ticks (1/fleet_tick_seconds) si fleet_realtime.
+    """
+    if fleet:
+        if not config.get('fleet_realtime', True):
+            return None
+        return RateScheduler(RateProfile(1 / (config.get('fleet_tick_seconds') or 1.0)), chunk=1, burst=1)
+    rate = config.get('rate_per_second')
+    delay = float(config.get('delay_seconds') or 0)
+    if rate:
+        rate = float(rate) / shards
+        amplitude = config.get('rate_amplitude')
+        profile = RateProfile(rate, config.get('rate_profile') or 'constant',
+                              period=config.get('rate_period_seconds') or 60,
+                              amplitude=0.5 if amplitude is None else amplitude)
+        chunk = min(max(int(rate * Config.RATE_TICK_SECONDS), 1), batch_size or Config.BATCH_SIZE)
+        burst = config.get('rate_burst') or max(chunk, rate * 0.1)
+        return RateScheduler(profile, chunk=chunk, burst=burst)
+    if delay > 0:
+        return RateScheduler(RateProfile(1 / delay), chunk=1, burst=1)
+    return None
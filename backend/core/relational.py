@@ -0,0 +1,208 @@
+import zlib
+import numpy as np
+
+from config import Config
+
+# Distribuciones del nº de hijos por fila padre y sus parámetros obligatorios
+CARDINALITIES = {'fixed': ('value',), 'uniform': ('min', 'max'), 'poisson': ('mean',), 'zipf': ('a',)}
+ZIPF_DEFAULT_MAX = 1000  # Tope de hijos por padre con zipf si no se indica max
+
+def _name_key(name: str) -> int:
+    return zlib.crc32(name.encode('utf-8'))
+
+def _child_counts(card: dict, rng, n: int) -> np.ndarray:
+    dist = card.get('distribution') or 'fixed'
+    if dist == 'fixed':
+        return np.full(n, int(card.get('value') or 0), dtype=np.int64)
+    if dist == 'uniform':
+        return rng.integers(int(card.get('min') or 0), int(card.get('max') or 0) + 1, size=n, dtype=np.int64)
+    if dist == 'poisson':
+        return rng.poisson(float(card.get('mean') or 0), size=n).astype(np.int64)
+    if dist == 'zipf':
+        top = int(card.get('max') or ZIPF_DEFAULT_MAX)
+        return np.minimum(rng.zipf(float(card.get('a') or 2), size=n), top).astype(np.int64)
+    raise ValueError(f"Cardinalidad desconocida: {dist} ({', '.join(CARDINALITIES)})")
+
+class KeyIndex:
+    """
+    Índice de claves de una relación padre -> hijos. Las claves primarias son el nº de fila
+    (1..N) y los hijos de cada padre van seguidos, así que basta con saber cuántos hijos tiene
+    cada padre. Los recuentos se generan por bloques de 'block' padres con un RNG propio del
+    bloque (se pueden regenerar en cualquier proceso, shard o reanudación) y el índice solo
+    guarda el primer hijo de cada bloque: ~8 bytes por bloque (10M padres ≈ 1,2 KB).
+    parents(start, n) devuelve la clave del padre de los hijos [start, start + n).
+    """
+    def __init__(self, parent_rows: int, cardinality: dict, key: list, block: int = None):
+        self.parent_rows = parent_rows
+        self.cardinality = dict(cardinality)
+        self.key = list(key)
+        self.block = block or Config.RELATION_BLOCK_ROWS
+        blocks = -(-parent_rows // self.block)
+        self.offsets = np.zeros(blocks + 1, dtype=np.int64)
+        for b in range(blocks):
+            self.offsets[b + 1] = self.offsets[b] + int(self._counts(b).sum())
+        self._cached = (None, None)  # Último bloque usado: (nº, fin de los hijos de cada padre)
+
+    @property
+    def total(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + 16 * self.block  # Índice más el bloque en uso
+
+    def _counts(self, b: int) -> np.ndarray:
+        rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(self.key + [b])))
+        n = min(self.block, self.parent_rows - b * self.block)
+        return _child_counts(self.cardinality, rng, n)
+
+    def _ends(self, b: int) -> np.ndarray:
+        cached_b, ends = self._cached
+        if cached_b != b:
+            ends = self.offsets[b] + np.cumsum(self._counts(b))
+            self._cached = (b, ends)
+        return ends
+
+    def parents(self, start: int, n: int) -> np.ndarray:
+        rows = np.arange(start, start + n, dtype=np.int64)
+        out = np.empty(n, dtype=np.int64)
+        b = int(np.searchsorted(self.offsets, start, side='right')) - 1
+        pos = 0
+        while pos < n:
+            stop = min(n, int(self.offsets[b + 1]) - start)
+            if stop > pos:
+                out[pos:stop] = b * self.block + np.searchsorted(self._ends(b), rows[pos:stop], side='right') + 1
+                pos = stop
+            b += 1
+        return out
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_cached'] = (None, None)
+        return state
+
+def estimated_children(parent_rows: int, cardinality: dict, key: list) -> int:
+    """Estimación barata (un bloque) de las filas hijas; exacta si el padre cabe en un bloque."""
+    sample = KeyIndex(min(parent_rows, Config.RELATION_BLOCK_ROWS), cardinality, key)
+    return int(round(sample.total * parent_rows / max(sample.parent_rows, 1)))
+
+# --- Configuración ---
+
+def relation_key(config: dict, name: str) -> list:
+    """Clave de los recuentos de una tabla: seed (o unique_key sin seed) y nombre."""
+    base = config.get('seed')
+    if base is None:
+        base = config.get('unique_key') or 0
+    return [int(base), _name_key(name)]
+
+def _references(spec: dict) -> list:
+    refs = [spec['parent']] if spec.get('parent') else []
+    return refs + [f['table'] for f in spec.get('schema_fields', []) if f.get('type') == 'ref' and f.get('table')]
+
+def ordered_tables(tables: list) -> list:
+    """Tablas en orden de dependencias (padres y tablas referenciadas antes); ValueError si no hay orden."""
+    names = [t['name'] for t in tables]
+    if len(set(names)) != len(names):
+        raise ValueError("Nombres de tabla repetidos")
+    unknown = {r for t in tables for r in _references(t) if r not in names}
+    if unknown:
+        raise ValueError(f"Tabla desconocida: {', '.join(sorted(unknown))}")
+    pending = {t['name']: t for t in tables}
+    ordered = []
+    while pending:
+        ready = [t for t in pending.values() if all(r not in pending for r in _references(t))]
+        if not ready:
+            raise ValueError(f"Dependencias circulares entre tablas: {', '.join(sorted(pending))}")
+        for t in ready:
+            ordered.append(t)
+            del pending[t['name']]
+    return ordered
+
+def check_tables(config: dict) -> list:
+    """Valida una simulación relacional; devuelve sus tablas en orden de dependencias."""
+    if config.get('fleet_mode'):
+        raise ValueError("tables no es compatible con fleet_mode")
+    tables = ordered_tables(config['tables'])
+    for t in tables:
+        if t.get('parent'):
+            card = t.get('cardinality') or {}
+            dist = card.get('distribution') or 'fixed'
+            if dist not in CARDINALITIES:
+                raise ValueError(f"Tabla '{t['name']}': cardinalidad desconocida {dist} ({', '.join(CARDINALITIES)})")
+            missing = [p for p in CARDINALITIES[dist] if card.get(p) is None]
+            if missing:
+                raise ValueError(f"Tabla '{t['name']}': la cardinalidad {dist} necesita {', '.join(missing)}")
+            if dist == 'uniform' and card['min'] > card['max']:
+                raise ValueError(f"Tabla '{t['name']}': cardinalidad uniform con min > max")
+            if dist == 'zipf' and card['a'] <= 1:
+                raise ValueError(f"Tabla '{t['name']}': zipf necesita a > 1")
+        elif not t.get('total_records'):
+            raise ValueError(f"Tabla '{t['name']}': sin parent necesita total_records")
+        # La tabla de un ref existe (ordered_tables); aquí, que se indique
+        missing = [f.get('name') for f in t.get('schema_fields') or [] if f.get('type') == 'ref' and not f.get('table')]
+        if missing:
+            raise ValueError(f"Tabla '{t['name']}': el campo ref {', '.join(map(str, missing))} necesita table")
+    return tables
+
+def check_refs(config: dict):
+    """Simulación plana: un campo ref no tiene tabla de la que tomar claves (ValueError)."""
+    refs = [f.get('name') for f in config.get('schema_fields') or [] if f.get('type') == 'ref']
+    if refs:
+        raise ValueError(f"Campo ref sin tables: {', '.join(map(str, refs))}")
+
+def table_rows(config: dict, estimate: bool = False) -> list:
+    """Filas de cada tabla (en el orden de config['tables']); exactas salvo con estimate."""
+    rows = {}
+    for t in config['tables']:
+        if not t.get('parent'):
+            rows[t['name']] = int(t['total_records'])
+        elif estimate:
+            rows[t['name']] = estimated_children(rows[t['parent']], t.get('cardinality') or {},
+                                                 relation_key(config, t['name']))
+        else:
+            rows[t['name']] = key_index(config, t, rows[t['parent']]).total
+    return [rows[t['name']] for t in config['tables']]
+
+def key_index(config: dict, spec: dict, parent_rows: int) -> KeyIndex:
+    return KeyIndex(parent_rows, spec.get('cardinality') or {}, relation_key(config, spec['name']))
+
+def _table_seed(config: dict, name: str):
+    # Cada tabla con su propio flujo aleatorio (si no, todas repetirían los mismos valores)
+    if config.get('seed') is None:
+        return None
+    return int(np.random.SeedSequence(relation_key(config, name)).generate_state(1, np.uint64)[0] >> np.uint64(1))
+
+def table_config(config: dict, k: int, rows: list) -> dict:
+    """
+    Configuración plana de la tabla k: su clave primaria (key), la clave foránea al padre
+    (ref, del índice de claves) y sus campos; un ref a otra tabla se muestrea como entero
+    uniforme entre sus claves. Hereda los destinos de la simulación salvo que la tabla
+    indique los suyos; los ficheros llevan el nombre de la tabla.
+    """
+    spec = config['tables'][k]
+    sizes = {t['name']: n for t, n in zip(config['tables'], rows)}
+    fields = [{'name': spec.get('key') or 'id', 'type': 'key'}]
+    if spec.get('parent'):
+        fields.append({'name': spec.get('foreign_key') or f"{spec['parent']}_id", 'type': 'ref', 'table': spec['parent']})
+    for f in spec.get('schema_fields', []):
+        if f.get('type') == 'ref' and f.get('table') != spec.get('parent'):
+            f = dict(f, type='int', min=1, max=sizes[f['table']])
+        fields.append(f)
+
+    flat = {key: value for key, value in config.items() if key not in ('tables', 'table')}
+    flat.update(simulation_name=f"{config['simulation_name']}_{spec['name']}", schema_fields=fields,
+                total_records=sizes[spec['name']], device_count=1, seed=_table_seed(config, spec['name']),
+                table=k, table_name=spec['name'])
+    if config.get('unique_key') is not None:
+        flat['unique_key'] = config['unique_key'] ^ _name_key(spec['name'])
+    if spec.get('sinks'):
+        flat['sinks'] = spec['sinks']
+    return flat
+
+def table_keys(config: dict, k: int, rows: list) -> dict:
+    """Índices de claves que necesita la tabla k (el de su padre), por nombre de tabla."""
+    spec = config['tables'][k]
+    if not spec.get('parent'):
+        return {}
+    parent = [t['name'] for t in config['tables']].index(spec['parent'])
+    return {spec['parent']: key_index(config, spec, rows[parent])}
@@ -0,0 +1,97 @@
+import math
+import time
+
+from rq import Queue, get_current_job
+
+from config import Config
+
+# Colas por prioridad: los workers vacían 'interactive' antes de mirar 'bulk'.
+# 'default' es la cola anterior; se sigue atendiendo (al final) por los trabajos ya encolados.
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+QUEUES = (INTERACTIVE, BULK)
+LEGACY_QUEUE = 'default'
+
+def estimated_seconds(config: dict, shards: int = 1) -> float:
+    """Duración mínima de un shard impuesta por el ritmo (rate, delay o ticks en tiempo real); 0 si va a máxima velocidad."""
+    rows = config.get('total_records', 0) / max(shards, 1)
+    if config.get('fleet_mode') and config.get('fleet_realtime', True):
+        devices = max(config.get('device_count', 1) / max(shards, 1), 1)
+        return rows / devices * float(config.get('fleet_tick_seconds') or 1)
+    if config.get('rate_per_second'):
+        # La tasa se reparte entre shards: cada uno tarda lo que el total
+        return config.get('total_records', 0) / float(config['rate_per_second'])
+    return rows * float(config.get('delay_seconds') or 0)
+
+def queue_for(config: dict, shards: int = 1) -> str:
+    """
+    Cola de una simulación: la indicada en 'priority' o, si no, interactive para las
+    pequeñas (filas por shard y duración estimada por debajo de los umbrales) y bulk
+    para el resto.
+    """
+    priority = config.get('priority')
+    if priority:
+        if priority not in QUEUES:
+            raise ValueError(f"Prioridad desconocida: {priority} (interactive, bulk)")
+        return priority
+    rows = config.get('total_records', 0) / max(shards, 1)
+    if rows <= Config.INTERACTIVE_MAX_ROWS and estimated_seconds(config, shards) <= Config.INTERACTIVE_MAX_SECONDS:
+        return INTERACTIVE
+    return BULK
+
+def enqueue_simulation(redis_conn, sim_id: str, config: dict, shard: int = 0, shards: int = 1,
+                       resume: bool = False, queue: str = None):
+    """Encola un shard (o su continuación, con resume) en la cola que le corresponde."""
+    name = queue or queue_for(config, shards)
+    # Por ruta: worker importa este módulo
+    return Queue(name, connection=redis_conn).enqueue(
+        'worker.simulation_task', sim_id, config, shard, shards, resume,
+        job_timeout=Config.JOB_TIMEOUT_SECONDS, description=f"sim {sim_id} shard {shard}")
+
+def enqueue_cached(redis_conn, sim_id: str, config: dict, hit: dict, shards: int, queue: str):
+    """Encola una simulación servida desde la caché de datasets (enlazar ficheros y reenviar)."""
+    return Queue(queue, connection=redis_conn).enqueue(
+        'worker.cache_task', sim_id, config, hit, shards, queue,
+        job_timeout=Config.JOB_TIMEOUT_SECONDS, description=f"sim {sim_id} cache")
+
+def queue_depths(redis_conn) -> dict:
+    return {name: Queue(name, connection=redis_conn).count for name in QUEUES + (LEGACY_QUEUE,)}
+
+class TimeSlice:
+    """
+    Rodaja de tiempo de un trabajo bulk: pasados 'seconds', el bucle cede el turno en
+    cuanto haya trabajos interactivos esperando (lo mira como mucho cada check_seconds,
+    una consulta LLEN). Al ceder se guarda checkpoint y el trabajo se re-encola al final
+    de bulk, así que un job enorme no bloquea a los pequeños que llegan detrás.
+    """
+    def __init__(self, redis_conn, seconds: float, check_seconds: float = 1.0):
+        self.redis = redis_conn
+        self.check_seconds = check_seconds
+        self.next_check = time.monotonic() + seconds
+
+    def expired(self) -> bool:
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.check_seconds
+        try:
+            return Queue(INTERACTIVE, connection=self.redis).count > 0
+        except Exception:
+            return False  # Sin Redis no se cede: se sigue hasta el siguiente intento
+
+def time_slice(redis_conn, scheduler=None) -> TimeSlice:
+    """Rodaja para el job de RQ en curso si viene de bulk (None fuera de RQ o sin rodajas)."""
+    if Config.BULK_SLICE_SECONDS <= 0 or scheduler is not None:
+        return None  # Con ritmo (rate, delay, ticks) no se cede: desplazaría la serie temporal
+    job = get_current_job()
+    if job is None or job.origin != BULK:
+        return None
+    return TimeSlice(redis_conn, Config.BULK_SLICE_SECONDS, Config.SLICE_CHECK_SECONDS)
+
+def desired_workers(busy: int, depth: int) -> int:
+    """
+    Política de escalado por profundidad de cola: un proceso por cada trabajo en curso
+    más uno por cada SCALE_JOBS_PER_WORKER trabajos en cola, entre el mínimo y el máximo.
+    """
+    want = busy + math.ceil(depth / max(Config.SCALE_JOBS_PER_WORKER, 1))
+    return max(Config.WORKER_MIN_PROCESSES, min(Config.WORKER_PROCESSES, want))
@@ -1,8 +1,20 @@
 import json
-import csv
+import hashlib
 import os
+import queue
+import threading
+import time
+from functools import partial
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from abc import ABC, abstractmethod
+from collections import deque
+
+from core.encoding import EncodedBatch, get_encoder
+from core.formats import (
+    COLUMNAR_FORMATS, ENVELOPES, ROW_GROUP_ROWS, ColumnarWriter, RowEncoder, TextStream, file_extension
+)
 
 # Librerías opcionales (para que no falle si falta alguna al arrancar)
 try:
@@ -14,90 +26,400 @@ except ImportError: KafkaProducer = None
 try:
     import pika
 except ImportError: pika = None
-try:
-    import toml
-except ImportError: toml = None
-try:
-    from dict2xml import dict2xml
-except ImportError: dict2xml = None
+
+# Formato de cable (método de EncodedBatch) y Content-Type de cada http_batch_format
+HTTP_FORMATS = {None: ('json_rows', 'application/json'), 'json': ('json_array', 'application/json'),
+                'ndjson': ('ndjson', 'application/x-ndjson')}
+
+def wire_formats(config: dict) -> list:
+    """
+    Formatos de EncodedBatch que consume un sink (('gzip', fmt) si va comprimido). Los de
+    texto sin JSON (csv, xml, toml) no se listan: los serializa el propio sink desde las filas.
+    """
+    t = config.get('target_type')
+    if t == 'http':
+        fmt = HTTP_FORMATS[config.get('http_batch_format')][0]
+        return [('gzip', fmt) if config.get('http_gzip') else fmt]
+    if t in ('kafka', 'rabbitmq', 'mqtt'):
+        return ['json_rows']
+    if t == 'file':
+        fmt = config.get('file_format', 'json')
+        if fmt in COLUMNAR_FORMATS:
+            return ['table']
+        return {'json': ['json_rows'], 'ndjson': ['ndjson']}.get(fmt, [])
+    return []
 
 class DataSink(ABC):
+    # Segundos dedicados a serializar (telemetría: el worker lo separa del tiempo de envío)
+    serialize_seconds = 0.0
+    # Codificador JSON (core.encoding); None = JSON_ENCODER
+    json_encoder = None
+    # Telemetría del job (la asigna el worker) y etiqueta 'sink' de sus errores de envío
+    telemetry = None
+    name = None
     @abstractmethod
     def send(self, data: dict): pass
     @abstractmethod
     def close(self): pass
+    def send_batch(self, rows: list):
+        """Envía un lote de filas. Por defecto, una a una; cada sink lo especializa."""
+        for row in rows:
+            self.send(row)
+    def send_columns(self, batch):
+        """Envía un ColumnBatch: se codifica bajo demanda en el formato que use el sink."""
+        self.send_prepared(EncodedBatch(batch, self.json_encoder))
+    def send_prepared(self, encoded: EncodedBatch):
+        """Envía un EncodedBatch (en modo pipeline, con los formatos ya calculados por preparer_for)."""
+        before = encoded.seconds
+        try:
+            self.send_encoded(encoded)
+        except Exception:
+            if self.telemetry is not None:
+                self.telemetry.error('send', sink=self.name)
+            raise
+        finally:
+            self.serialize_seconds += encoded.seconds - before
+    def send_encoded(self, encoded: EncodedBatch):
+        """Envía un lote ya codificado. Por defecto, sus filas; cada sink toma su formato de cable."""
+        self.send_batch(encoded.rows())
+    def _encoded(self, rows: list) -> EncodedBatch:
+        return EncodedBatch.from_rows(rows, self.json_encoder)
+    def _serialize(self, fn, *args):
+        """Ejecuta fn(*args) contando su tiempo como serialización."""
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.serialize_seconds += time.perf_counter() - t0
+    def checkpoint(self, force: bool = False) -> dict:
+        """
+        Hace durable lo enviado y devuelve la posición para reanudar (vacía si no aplica).
+        Puede devolver None si ahora no conviene cortar; con force siempre corta.
+        """
+        return {}
+    def stats(self) -> dict:
+        """Contadores/latencias propios del sink para publicar en el estado de la simulación."""
+        return {}
+    def outputs(self) -> list:
+        """Ficheros cerrados por el sink como [(ruta, filas)], en orden."""
+        return []
 
 class FileSink(DataSink):
-    def __init__(self, filename, fmt='json'):
-        self.filepath = filename
+    """
+    Fichero JSON/NDJSON/CSV/TOML/XML (con gzip/zstd opcional) o Parquet/Arrow IPC.
+    Con max_rows/max_bytes rota a ficheros parte: el primero conserva el nombre
+    base y los siguientes añaden .0001, .0002... antes de la extensión.
+    """
+    def __init__(self, filename, fmt='json', resume: dict = None, compression: str = None,
+                 max_rows: int = None, max_bytes: int = None):
+        self.base = filename
         self.fmt = fmt
-        self.first_row = True
-        os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
-        
-        # Modo Append para ficheros grandes
-        mode = 'w' 
-        self.file = open(self.filepath, mode, encoding='utf-8')
-        
-        if self.fmt == 'json':
-            self.file.write('[')
-        elif self.fmt == 'xml':
-            self.file.write('<root>\n')
+        self.compression = compression
+        self.columnar = fmt in COLUMNAR_FORMATS
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.files = []  # Ficheros ya cerrados: [(ruta, filas)]
+        self.index = 0
+        os.makedirs(os.path.dirname(self.base), exist_ok=True)
+
+        if resume:
+            # Reanudación: se descarta lo escrito tras el último checkpoint (y el cierre, si lo hubo)
+            self.files = [tuple(f) for f in resume.get('files', [])]
+            self.index = resume.get('index', 0)
+            self._discard_from(self.index if self.columnar else self.index + 1)
+            self._open(resume.get('offset'), resume.get('first_row', False), resume.get('rows_in_file', 0))
+        else:
+            self._open()
+
+    def path_for(self, index: int) -> str:
+        if index == 0:
+            return self.base
+        ext = file_extension(self.fmt, self.compression)
+        return f"{self.base[:-len(ext) - 1]}.{index:04d}.{ext}"
+
+    @property
+    def filepath(self) -> str:
+        return self.path_for(self.index)
+
+    def _discard_from(self, index: int):
+        while os.path.exists(self.path_for(index)):
+            os.remove(self.path_for(index))
+            index += 1
+
+    def _open(self, offset: int = None, first_row: bool = True, rows: int = 0):
+        self.first_row = first_row
+        self.rows_in_file = rows
+        if self.columnar:
+            self.writer = ColumnarWriter(self.filepath, self.fmt, self.compression)
+            return
+        self.stream = TextStream(self.filepath, self.compression, offset)
+        self.encoder = RowEncoder(self.fmt, first_row)
+        if offset is None:
+            self.stream.write(self.encoder.head)
+
+    def _close_current(self):
+        if self.columnar:
+            created = self.writer.close()
+        else:
+            self.stream.write(self.encoder.tail)
+            self.stream.close()
+            created = True
+        if created:
+            self.files.append((self.filepath, self.rows_in_file))
+
+    def _roll(self):
+        self._close_current()
+        self.index += 1
+        self._open()
+
+    def _size(self) -> int:
+        return self.writer.size if self.columnar else self.stream.size
+
+    def _room(self, wanted: int) -> int:
+        """Rota si el fichero actual está lleno y devuelve cuántas filas caben en él."""
+        if self.max_bytes and self.rows_in_file and self._size() >= self.max_bytes:
+            self._roll()
+        if self.max_rows:
+            if self.rows_in_file >= self.max_rows:
+                self._roll()
+            return min(wanted, self.max_rows - self.rows_in_file)
+        return wanted
 
     def send(self, data: dict):
-        if self.fmt == 'json':
-            if not self.first_row: self.file.write(',\n')
-            self.file.write(json.dumps(data, ensure_ascii=False))
-        elif self.fmt == 'csv':
-            writer = csv.DictWriter(self.file, fieldnames=data.keys())
-            if self.first_row: writer.writeheader()
-            writer.writerow(data)
-        elif self.fmt == 'toml' and toml:
-            # TOML no soporta listas de objetos nativamente bien en stream,
-            # así que lo guardamos como bloques separados por saltos
-            self.file.write(toml.dumps(data) + "\n#---\n")
-        elif self.fmt == 'xml' and dict2xml:
-            self.file.write(dict2xml(data, wrap="record", indent="  ") + "\n")
-
-        self.first_row = False
+        self.send_batch([data])
+
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+
+    def send_encoded(self, encoded: EncodedBatch):
+        total, done = len(encoded), 0
+        while done < total:
+            n = self._room(total - done)
+            if self.columnar:
+                self.writer.write_table(encoded.table().slice(done, n))  # Trozo sin copia
+            elif self.fmt == 'ndjson' and n == total:
+                self.stream.write_bytes(encoded.ndjson())  # Los mismos bytes que el resto de sinks
+                self.encoder.first_row = False
+            elif self.fmt in ('json', 'ndjson'):
+                json_rows = encoded.json_rows()[done:done + n]
+                self.stream.write_bytes(self._serialize(self.encoder.encode_json, json_rows))
+            else:
+                self.stream.write(self._serialize(self.encoder.encode, encoded.rows()[done:done + n]))
+            self.rows_in_file += n
+            self.first_row = False
+            done += n
+        if not self.columnar:
+            self.stream.flush()  # Lo enviado queda visible para /api/files/tail
+
+    def checkpoint(self, force: bool = False) -> dict:
+        if self.columnar:
+            # Un Parquet/Arrow no se puede truncar y seguir: se cierra la parte y se abre otra,
+            # pero no antes de llenar un row group (evita miles de ficheros diminutos)
+            if not force and self.rows_in_file < ROW_GROUP_ROWS:
+                return None
+            if self.rows_in_file:
+                self._roll()
+            return {"index": self.index, "files": self.files}
+        return {"index": self.index, "offset": self.stream.sync(), "first_row": self.first_row,
+                "rows_in_file": self.rows_in_file, "files": self.files}
+
+    def outputs(self) -> list:
+        return list(self.files)
 
     def close(self):
-        if self.fmt == 'json': self.file.write(']')
-        elif self.fmt == 'xml': self.file.write('</root>')
-        self.file.close()
+        self._close_current()
 
 class HttpSink(DataSink):
-    def __init__(self, url):
+    """
+    Webhook HTTP sobre una sesión con keep-alive. Con concurrency > 1, N hilos envían
+    en paralelo desde una cola acotada: si el destino no da abasto, send() se bloquea
+    (la generación se frena) en lugar de perder datos.
+    """
+    def __init__(self, url, batch_format: str = None, concurrency: int = 1, gzip_body: bool = False,
+                 retries: int = 0, timeout: float = 2):
         self.url = url
+        # None: un POST por fila (contrato clásico); 'json': array; 'ndjson': una fila por línea
+        self.batch_format = batch_format
+        self.gzip_body = gzip_body
+        self.wire_format, content_type = HTTP_FORMATS[batch_format]
+        # Cabeceras compartidas por todas las peticiones (requests no las modifica)
+        self.headers = {'Content-Type': content_type}
+        if gzip_body:
+            self.headers['Content-Encoding'] = 'gzip'
+        self.retries = retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(concurrency, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.sent = self.failed = self.retried = 0
+        self.latencies = deque(maxlen=10000)  # Segundos, últimas peticiones
+        self._lock = threading.Lock()
+
+        self.queue = None
+        self.threads = []
+        if concurrency > 1:
+            self.queue = queue.Queue(maxsize=concurrency * 4)
+            for k in range(concurrency):
+                t = threading.Thread(target=self._sender, name=f"http-sink-{k}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def _post(self, body: bytes, headers: dict):
+        """POST con reintentos y backoff exponencial ante errores de red, 429 y 5xx."""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock: self.retried += 1
+                time.sleep(min(0.1 * 2 ** (attempt - 1), 5.0))
+            t0 = time.perf_counter()
+            try:
+                resp = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            except Exception as e:
+                error = e
+                continue
+            with self._lock: self.latencies.append(time.perf_counter() - t0)
+            if resp.status_code < 400:
+                with self._lock: self.sent += 1
+                return
+            error = f"HTTP {resp.status_code}"
+            if resp.status_code != 429 and resp.status_code < 500:
+                break  # Error del cliente: reintentar no lo arregla
+        with self._lock: self.failed += 1
+        print(f"Error HTTP: {error}")
+
+    def _sender(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._post(*item)
+            finally:
+                self.queue.task_done()
+
+    def _submit(self, body: bytes, headers: dict):
+        if self.queue is None:
+            self._post(body, headers)
+        else:
+            self.queue.put((body, headers))  # Bloquea si la cola está llena (backpressure)
+
     def send(self, data: dict):
-        try:
-            requests.post(self.url, json=data, timeout=2)
-        except Exception as e:
-            print(f"Error HTTP: {e}")
-    def close(self): pass
+        self.send_batch([data])
+
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+
+    def send_encoded(self, encoded: EncodedBatch):
+        # Un POST por fila (lista de cuerpos) o uno por lote
+        if self.gzip_body:
+            bodies = encoded.gzip(self.wire_format)
+        else:
+            bodies = getattr(encoded, self.wire_format)()
+        for body in (bodies if isinstance(bodies, list) else [bodies]):
+            self._submit(body, self.headers)
+
+    def checkpoint(self, force: bool = False) -> dict:
+        if self.queue is not None:
+            self.queue.join()
+        return {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = np.array(self.latencies) if self.latencies else None
+            out = {"sent": self.sent, "failed": self.failed, "retried": self.retried}
+        if lat is not None:
+            p50, p99 = np.percentile(lat, [50, 99]) * 1000
+            out.update({"p50_ms": round(float(p50), 2), "p99_ms": round(float(p99), 2)})
+        return out
+
+    def close(self):
+        if self.queue is not None:
+            for _ in self.threads:
+                self.queue.put(None)
+            for t in self.threads:
+                t.join()
+        self.session.close()
 
 class KafkaSink(DataSink):
-    def __init__(self, bootstrap_servers, topic):
+    def __init__(self, bootstrap_servers, topic, linger_ms: int = 20, batch_size: int = 256 * 1024):
         if not KafkaProducer: raise Exception("kafka-python no instalado")
+        # Los mensajes se serializan por lotes antes de send() (tiempo medible aparte)
         self.producer = KafkaProducer(
             bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8')
+            # Agrupa mensajes en lotes grandes en lugar de un request por mensaje
+            linger_ms=linger_ms,
+            batch_size=batch_size,
         )
         self.topic = topic
     def send(self, data: dict):
-        self.producer.send(self.topic, data)
+        self.send_batch([data])
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+    def send_encoded(self, encoded: EncodedBatch):
+        # send() es asíncrono: el producer acumula y envía por lotes según linger_ms/batch_size
+        send, topic = self.producer.send, self.topic
+        for body in encoded.json_rows():
+            send(topic, body)
+    def checkpoint(self, force: bool = False) -> dict:
+        self.producer.flush()
+        return {}
     def close(self):
         self.producer.flush()
         self.producer.close()
 
 class RabbitMQSink(DataSink):
+    """
+    Cola de RabbitMQ con publisher confirms por lote: se publica el lote entero y se espera
+    una sola vez a que el broker confirme todos sus mensajes. BlockingChannel.basic_publish
+    en modo confirm espera el ack de cada mensaje, así que el modo se activa en el canal
+    subyacente (_impl), los ack/nack/return se cuentan aquí y la espera usa la misma
+    primitiva que BlockingChannel (_flush_output: termina también si se cae la conexión).
+    Un mensaje rechazado (nack) o sin cola de destino (return, se publica con mandatory)
+    hace fallar el lote.
+    """
     def __init__(self, host, queue_name):
         if not pika: raise Exception("pika no instalado")
         self.connection = pika.BlockingConnection(pika.ConnectionParameters(host=host))
         self.channel = self.connection.channel()
         self.queue = queue_name
         self.channel.queue_declare(queue=self.queue)
+        self.published = 0  # delivery tag del último mensaje publicado en el canal
+        self.unconfirmed = set()
+        self.nacked = self.returned = 0
+        selected = []
+        self.impl = self.channel._impl
+        self.impl.add_on_return_callback(self._on_return)
+        self.impl.confirm_delivery(ack_nack_callback=self._on_confirm, callback=selected.append)
+        self.channel._flush_output(lambda: bool(selected))
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        if method.multiple:
+            done = {tag for tag in self.unconfirmed if tag <= method.delivery_tag}
+        else:
+            done = {method.delivery_tag} & self.unconfirmed
+        if isinstance(method, pika.spec.Basic.Nack):
+            self.nacked += len(done)
+        self.unconfirmed -= done
+
+    def _on_return(self, channel, method, properties, body):
+        self.returned += 1
+
     def send(self, data: dict):
-        self.channel.basic_publish(exchange='', routing_key=self.queue, body=json.dumps(data))
+        self.send_batch([data])
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+    def send_encoded(self, encoded: EncodedBatch):
+        publish, queue = self.impl.basic_publish, self.queue
+        self.nacked = self.returned = 0
+        for body in encoded.json_rows():
+            publish(exchange='', routing_key=queue, body=body, mandatory=True)
+            self.published += 1
+            self.unconfirmed.add(self.published)
+        self.channel._flush_output(lambda: not self.unconfirmed)  # Una sola espera por lote
+        if self.nacked or self.returned:
+            raise Exception(f"RabbitMQ rechazó {self.nacked} mensajes y devolvió {self.returned} sin ruta")
     def close(self):
         self.connection.close()
 
@@ -109,28 +431,244 @@ class MqttSink(DataSink):
         self.client.connect(host, int(port), 60)
         self.client.loop_start()
     def send(self, data: dict):
-        self.client.publish(self.topic, json.dumps(data))
+        self.send_batch([data])
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+    def send_encoded(self, encoded: EncodedBatch):
+        # publish() solo encola; el hilo de loop_start() drena la cola por la misma conexión
+        publish, topic = self.client.publish, self.topic
+        for body in encoded.json_rows():
+            publish(topic, body)
     def close(self):
         self.client.loop_stop()
         self.client.disconnect()
 
 class ConsoleSink(DataSink):
     def send(self, data: dict): print(f"[LOG] {data}")
+    def send_batch(self, rows: list): print("\n".join(f"[LOG] {r}" for r in rows))
     def close(self): pass
 
+class FanoutSink(DataSink):
+    """
+    Varios sinks alimentados por el mismo flujo generado. Cada lote se codifica una vez
+    por formato de cable (EncodedBatch) y los sinks que comparten formato reciben el mismo
+    objeto bytes. Un sink que falla no impide el envío a los demás: se cuenta como error
+    de envío de ese destino (etiqueta sink) y se propaga el primer error.
+    """
+    def __init__(self, sinks: list, names: list):
+        self.sinks = sinks
+        self.names = names  # Prefijo de sus estadísticas: kafka, file, file2...
+        self.encode_seconds = 0.0
+
+    @property
+    def serialize_seconds(self) -> float:
+        return self.encode_seconds + sum(sink.serialize_seconds for sink in self.sinks)
+
+    def _each(self, fn, stage: str = None):
+        error = None
+        for name, sink in zip(self.names, self.sinks):
+            try:
+                fn(sink)
+            except Exception as e:
+                if stage and self.telemetry is not None:
+                    self.telemetry.error(stage, sink=name)
+                error = error or Exception(f"{name}: {e}")
+        if error:
+            raise error
+
+    def send(self, data: dict):
+        self.send_batch([data])
+
+    def send_batch(self, rows: list):
+        self.send_prepared(self._encoded(rows))
+
+    def send_prepared(self, encoded: EncodedBatch):
+        before = encoded.seconds
+        try:
+            self._each(lambda sink: sink.send_encoded(encoded), stage='send')
+        finally:
+            self.encode_seconds += encoded.seconds - before
+
+    def checkpoint(self, force: bool = False) -> dict:
+        positions = [sink.checkpoint(force) for sink in self.sinks]
+        if any(p is None for p in positions):
+            return None  # Algún sink no puede cortar ahora: se reintenta en el siguiente
+        return {"sinks": positions}
+
+    def stats(self) -> dict:
+        return {f"{name}_{k}": v for name, sink in zip(self.names, self.sinks) for k, v in sink.stats().items()}
+
+    def outputs(self) -> list:
+        return [out for sink in self.sinks for out in sink.outputs()]
+
+    def close(self):
+        self._each(lambda sink: sink.close())
+
+# --- Shards de fichero: merge o manifest ---
+
+def file_sink_path(config: dict, sim_id: str, data_dir: str, part: int = None, ext: str = None) -> str:
+    ext = ext or file_extension(config.get('file_format', 'json'), config.get('file_compression'))
+    suffix = f".part{part:03d}" if part is not None else ""
+    return os.path.join(data_dir, f"{config['simulation_name']}_{sim_id}{suffix}.{ext}")
+
+def can_merge(fmt: str, compression: str = None) -> bool:
+    """Formatos cuyas partes se pueden unir concatenando bytes (sin descomprimir)."""
+    if fmt not in ENVELOPES:
+        return False
+    # Comprimidos: solo si no hay cabecera/cierre que recortar (miembros gzip/zstd concatenados)
+    return compression is None or fmt in ('ndjson', 'toml')
+
+def _copy_range(src, dst, start: int, end: int, chunk: int = 1024 * 1024):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        buf = src.read(min(chunk, remaining))
+        if not buf:
+            break
+        dst.write(buf)
+        remaining -= len(buf)
+
+def merge_file_parts(parts: list, out_path: str, fmt: str):
+    """Concatena las partes de cada shard en un único archivo válido del mismo formato."""
+    head, tail, sep = (x.encode('utf-8') for x in ENVELOPES[fmt])
+    wrote_rows = False
+    with open(out_path, 'wb') as out:
+        out.write(head)
+        for path in parts:
+            size = os.path.getsize(path)
+            with open(path, 'rb') as f:
+                start, end = len(head), size - len(tail)
+                if fmt == 'csv' and wrote_rows:
+                    f.readline()  # Cabecera repetida
+                    start = f.tell()
+                if end <= start:
+                    continue
+                if wrote_rows:
+                    out.write(sep)
+                _copy_range(f, out, start, end)
+                wrote_rows = True
+        out.write(tail)
+
+def write_manifest(path: str, files: list, **meta):
+    """Describe los ficheros [(ruta, filas)] de una simulación (con sha256 para verificar reproducibilidad)."""
+    entries = []
+    for part, n in files:
+        digest = hashlib.sha256()
+        with open(part, 'rb') as f:
+            for buf in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(buf)
+        entries.append({"file": os.path.basename(part), "rows": n,
+                        "bytes": os.path.getsize(part), "sha256": digest.hexdigest()})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(meta, parts=entries), f, indent=2)
+
+# --- Varios sinks por simulación ---
+
+def sink_configs(config: dict) -> list:
+    """
+    Configuración de cada sink: la de la simulación con las opciones de cada elemento de
+    'sinks' encima (o solo la de la simulación, con target_type). ValueError si no hay
+    destino o si dos ficheros coinciden en ruta (mismo formato y compresión).
+    """
+    specs = config.get('sinks')
+    if not specs:
+        if not config.get('target_type'):
+            raise ValueError("Falta target_type o sinks")
+        return [config]
+    configs, paths = [], set()
+    for spec in specs:
+        c = {**config, **{k: v for k, v in spec.items() if v is not None}, 'sinks': None}
+        if not c.get('target_type'):
+            raise ValueError("Cada sink necesita target_type")
+        if c['target_type'] == 'file':
+            ext = file_extension(c.get('file_format', 'json'), c.get('file_compression'))
+            if ext in paths:
+                raise ValueError(f"Dos sinks de fichero escribirían el mismo .{ext}")
+            paths.add(ext)
+        configs.append(c)
+    return configs
+
+def sink_target(config: dict) -> str:
+    """Destino para telemetría: el target_type o, con varios sinks, 'kafka+file'..."""
+    try:
+        return '+'.join(c['target_type'] for c in sink_configs(config))
+    except ValueError:
+        return config.get('target_type')
+
+def sink_names(configs: list) -> list:
+    names, seen = [], {}
+    for c in configs:
+        t = c['target_type']
+        seen[t] = seen.get(t, 0) + 1
+        names.append(t if seen[t] == 1 else f"{t}{seen[t]}")
+    return names
+
+# --- Modo pipeline: serialización fuera del hilo del sink ---
+
+def _prepare(batch, formats: tuple = (), encoder: str = None) -> EncodedBatch:
+    return EncodedBatch(batch, encoder).prepare(formats)
+
+def preparer_for(config: dict):
+    """
+    Serialización que no depende del estado de los sinks: función (picklable) ColumnBatch ->
+    EncodedBatch con los formatos de cable de todos los sinks ya calculados, que el modo
+    pipeline ejecuta en otros hilos o procesos. None si ningún sink tiene formato de cable
+    (csv, xml, toml: el fichero serializa él mismo, con cabeceras y rotación).
+    """
+    formats = []
+    for c in sink_configs(config):
+        formats.extend(f for f in wire_formats(c) if f not in formats)
+    if not formats:
+        return None
+    return partial(_prepare, formats=tuple(formats), encoder=config.get('json_encoder'))
+
 # Factory
-def get_sink(config: dict, sim_id: str, data_dir: str):
+def get_sink(config: dict, sim_id: str, data_dir: str, part: int = None, resume: dict = None):
+    get_encoder(config.get('json_encoder'))  # Codificador desconocido o no instalado: falla ya
+    if not config.get('sinks'):
+        single = sink_configs(config)[0]
+        sink = _make_sink(single, sim_id, data_dir, part, resume)
+        sink.name = single['target_type']
+    else:
+        configs = sink_configs(config)
+        resumes = resume["sinks"] if resume else [None] * len(configs)
+        sinks = []
+        try:
+            for c, r in zip(configs, resumes):
+                sinks.append(_make_sink(c, sim_id, data_dir, part, r))
+        except Exception:
+            for opened in sinks:
+                opened.close()
+            raise
+        sink = FanoutSink(sinks, sink_names(configs))
+        for child in sinks:
+            child.json_encoder = config.get('json_encoder')
+    sink.json_encoder = config.get('json_encoder')
+    return sink
+
+def _make_sink(config: dict, sim_id: str, data_dir: str, part: int = None, resume: dict = None):
     t = config.get('target_type')
     
     if t == 'file':
         fmt = config.get('file_format', 'json')
         # Asumo que TOON es TOML o un typo, añado TOML y XML
-        fname = os.path.join(data_dir, f"{config['simulation_name']}_{sim_id}.{fmt}")
-        return FileSink(fname, fmt)
+        max_mb = config.get('file_max_mb')
+        return FileSink(file_sink_path(config, sim_id, data_dir, part=part), fmt, resume=resume,
+                        compression=config.get('file_compression'),
+                        max_rows=config.get('file_max_rows'),
+                        max_bytes=int(max_mb * 1024 * 1024) if max_mb else None)
     elif t == 'http':
-        return HttpSink(config['http_url'])
+        return HttpSink(config['http_url'], batch_format=config.get('http_batch_format'),
+                        concurrency=config.get('http_concurrency') or 1,
+                        gzip_body=bool(config.get('http_gzip')),
+                        retries=config.get('http_retries') or 0,
+                        timeout=config.get('http_timeout') or 2)
     elif t == 'kafka':
-        return KafkaSink(config['kafka_bootstrap'], config['kafka_topic'])
+        # 0 es un valor válido (linger_ms=0: baja latencia): el defecto solo si no se indica
+        linger_ms, batch_size = config.get('kafka_linger_ms'), config.get('kafka_batch_size')
+        return KafkaSink(config['kafka_bootstrap'], config['kafka_topic'],
+                         linger_ms=20 if linger_ms is None else linger_ms,
+                         batch_size=256 * 1024 if batch_size is None else batch_size)
     elif t == 'rabbitmq':
         return RabbitMQSink(config['rabbitmq_host'], config['rabbitmq_queue'])
     elif t == 'mqtt':
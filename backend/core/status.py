@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+
+from config import Config
+
+INDEX_KEY = "sim_index"            # ZSET sim_id -> timestamp de creación
+EVENTS_CHANNEL = "sim_events"      # Pub/sub con los cambios de estado y progreso
+FINISHED = ("completed", "stopped", "error")
+
+def status_key(sim_id: str) -> str:
+    return f"sim_status:{sim_id}"
+
+def _retained_keys(sim_id: str) -> list:
+    # Lo que caduca junto con el estado cuando una simulación termina
+    return [status_key(sim_id), f"sim_config:{sim_id}", f"sim_files:{sim_id}", f"sim_metrics:{sim_id}"]
+
+def _decode(data: dict) -> dict:
+    return {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+
+def publish_event(conn, sim_id: str, kind: str, fields: dict):
+    """Publica un evento (conn puede ser un pipeline)."""
+    conn.publish(EVENTS_CHANNEL, json.dumps({"sim_id": sim_id, "type": kind, **fields}, default=str))
+
+def register_simulation(redis_conn, sim_id: str, status: dict, config_json: str):
+    """Alta de una simulación: estado, configuración (para reanudar) y entrada en el índice."""
+    created = time.time()
+    pipe = redis_conn.pipeline()
+    pipe.hset(status_key(sim_id), mapping={**status, "created": created})
+    pipe.set(f"sim_config:{sim_id}", config_json)
+    pipe.zadd(INDEX_KEY, {sim_id: created})
+    publish_event(pipe, sim_id, "status", status)
+    pipe.execute()
+
+def set_status(redis_conn, sim_id: str, status: str, **fields):
+    """
+    Cambia el estado y avisa a los clientes de eventos. Al terminar (completed,
+    stopped, error) las claves de la simulación caducan tras STATUS_RETENTION_SECONDS;
+    si se reanuda, vuelven a ser persistentes.
+    """
+    mapping = {"status": status, **fields}
+    pipe = redis_conn.pipeline()
+    pipe.hset(status_key(sim_id), mapping=mapping)
+    for key in _retained_keys(sim_id):
+        if status in FINISHED and Config.STATUS_RETENTION_SECONDS > 0:
+            pipe.expire(key, int(Config.STATUS_RETENTION_SECONDS))
+        else:
+            pipe.persist(key)
+    publish_event(pipe, sim_id, "status", mapping)
+    pipe.execute()
+
+def list_simulations(redis_conn, status: str = None, offset: int = 0, limit: int = 100) -> dict:
+    """
+    Página de simulaciones, más recientes primero: {sim_id: estado}.
+    Lee el índice por tramos y trae los estados con un pipeline por tramo; las
+    entradas cuyo estado ya caducó se eliminan del índice al pasar por ellas.
+    Con filtro por estado, 'offset' cuenta solo las simulaciones que lo cumplen.
+    """
+    results = {}
+    skipped = 0
+    start = 0
+    chunk = max(limit, 100)
+    while len(results) < limit:
+        ids = redis_conn.zrevrange(INDEX_KEY, start, start + chunk - 1)
+        if not ids:
+            break
+        start += len(ids)
+        pipe = redis_conn.pipeline()
+        for sid in ids:
+            pipe.hgetall(status_key(sid.decode('utf-8')))
+        expired = []
+        for sid, data in zip(ids, pipe.execute()):
+            if not data:
+                expired.append(sid)
+                continue
+            data = _decode(data)
+            if status and data.get("status") != status:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results[sid.decode('utf-8')] = data
+            if len(results) >= limit:
+                break
+        if expired:
+            redis_conn.zrem(INDEX_KEY, *expired)
+            start -= len(expired)
+    return results
+
+def ensure_index(redis_conn):
+    """Indexa (una sola vez, con SCAN) las simulaciones creadas antes de existir el índice."""
+    if not redis_conn.set(f"{INDEX_KEY}:migrated", 1, nx=True):
+        return
+    for key in redis_conn.scan_iter(match="sim_status:*", count=1000):
+        sim_id = key.decode('utf-8').split(":", 1)[1]
+        created = redis_conn.hget(key, "created")
+        redis_conn.zadd(INDEX_KEY, {sim_id: float(created or 0)}, nx=True)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def event_stream(redis_conn, async_conn, sim_id: str = None, heartbeat_seconds: float = 15):
+    """
+    Generador Server-Sent Events: primero un 'snapshot' con el estado actual y después
+    los eventos 'status' / 'progress' publicados por la API y los workers.
+    Se suscribe antes de leer el snapshot para no perder cambios entre medias.
+    Asíncrono (pub/sub con async_conn, de redis.asyncio): un cliente conectado no ocupa un
+    hilo del pool de la API y, al desconectarse, el generador se cancela al momento.
+    """
+    pubsub = async_conn.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(EVENTS_CHANNEL)
+    try:
+        if sim_id:
+            data = await async_conn.hgetall(status_key(sim_id))
+            snapshot = {sim_id: _decode(data)} if data else {}
+        else:
+            snapshot = await asyncio.to_thread(list_simulations, redis_conn, limit=Config.STATUS_PAGE_SIZE)
+        yield _sse("snapshot", snapshot)
+
+        last = time.monotonic()
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message:
+                event = json.loads(message["data"])
+                if sim_id and event.get("sim_id") != sim_id:
+                    continue
+                yield _sse(event.pop("type", "status"), event)
+                last = time.monotonic()
+            elif time.monotonic() - last >= heartbeat_seconds:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                last = time.monotonic()
+    finally:
+        # Al desconectarse el cliente el generador se cancela: la baja de la suscripción
+        # sigue en su propia tarea
+        await asyncio.shield(pubsub.aclose())
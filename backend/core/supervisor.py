@@ -0,0 +1,151 @@
+import multiprocessing as mp
+import os
+import signal
+import socket
+import time
+
+from rq import Queue, Worker
+
+from config import Config
+from core.scheduling import INTERACTIVE, QUEUES, LEGACY_QUEUE, desired_workers, queue_depths
+
+WARM_SCHEMA = [
+    {'name': 'id', 'type': 'uuid'},
+    {'name': 'value', 'type': 'float', 'min': 0, 'max': 1},
+    {'name': 'status', 'type': 'choice', 'options': ['OK', 'WARN']},
+    {'name': 'ts', 'type': 'datetime'},
+]
+
+def warm_up():
+    """
+    Deja cargado en el proceso lo que comparten todos los jobs: módulos (sinks, formatos),
+    instancias de Faker por locale y el compilador. RQ ejecuta cada job en un fork del
+    proceso worker, así que el job lo hereda ya caliente.
+    """
+    import worker  # noqa: F401 (arrastra sinks, formatos, pyarrow...)
+    from core.compiler import compile_schema
+    from core.generator import get_faker
+    for locale in filter(None, (l.strip() for l in Config.WARM_LOCALES.split(','))):
+        try:
+            faker = get_faker(locale)
+            faker.name(), faker.city()  # Carga perezosa de los proveedores
+        except Exception as e:
+            print(f"Aviso: no se pudo precargar Faker {locale}: {e}")
+    compile_schema(WARM_SCHEMA).batch(8)
+
+def _serve(name: str, queue_names: list):
+    warm_up()
+    import worker
+    queues = [Queue(q, connection=worker.redis_conn) for q in queue_names]
+    Worker(queues, connection=worker.redis_conn, name=name).work()
+
+class Supervisor:
+    """
+    Mantiene N procesos worker de RQ (por defecto, nº de CPUs):
+
+    - WORKER_INTERACTIVE_PROCESSES procesos solo atienden 'interactive': una preview no
+      espera nunca a que un job grande ceda el turno.
+    - El resto atiende interactive > bulk > default (RQ vacía las colas en ese orden) y
+      se escala cada SCALE_INTERVAL_SECONDS según la profundidad de las colas (desired_workers);
+      al sobrar, se para con apagado suave un proceso que lleve SCALE_DOWN_IDLE_SECONDS ocioso.
+    - Un proceso que muere se sustituye en la siguiente vuelta.
+    """
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+        self.mpctx = mp.get_context('spawn')  # Procesos limpios: cada uno se calienta solo
+        self.prefix = f"synth.{socket.gethostname()}.{os.getpid()}"
+        self.seq = 0
+        self.reserved = min(Config.WORKER_INTERACTIVE_PROCESSES, Config.WORKER_PROCESSES - 1)
+        self.procs = {}  # nombre -> (proceso, colas)
+        self.idle_since = {}
+        self.running = True
+
+    def _spawn(self, queue_names: list):
+        self.seq += 1
+        name = f"{self.prefix}.{self.seq}"
+        proc = self.mpctx.Process(target=_serve, args=(name, queue_names), name=name)
+        proc.start()
+        self.procs[name] = (proc, queue_names)
+        print(f"Supervisor: worker {name} arrancado ({', '.join(queue_names)})")
+
+    def _states(self) -> dict:
+        try:
+            return {w.name: w.get_state() for w in Worker.all(connection=self.redis) if w.name in self.procs}
+        except Exception as e:
+            print(f"Aviso: no se pudo leer el estado de los workers: {e}")
+            return {}
+
+    def _reap(self):
+        for name, (proc, _) in list(self.procs.items()):
+            if not proc.is_alive():
+                proc.join()
+                if proc.exitcode:
+                    print(f"Supervisor: worker {name} terminó con código {proc.exitcode}")
+                del self.procs[name]
+                self.idle_since.pop(name, None)
+
+    def scale(self):
+        self._reap()
+        reserved = [n for n, (_, q) in self.procs.items() if q == [INTERACTIVE]]
+        general = [n for n in self.procs if n not in reserved]
+        for _ in range(self.reserved - len(reserved)):
+            self._spawn([INTERACTIVE])
+
+        try:
+            depth = sum(queue_depths(self.redis).values())
+        except Exception as e:
+            print(f"Aviso: no se pudo leer la profundidad de las colas: {e}")
+            return
+        states = self._states()
+        now = time.monotonic()
+        busy = 0
+        for name in general:
+            if states.get(name) == 'busy':
+                busy += 1
+                self.idle_since.pop(name, None)
+            else:
+                self.idle_since.setdefault(name, now)
+        target = max(desired_workers(busy, depth) - self.reserved, 1)
+
+        for _ in range(target - len(general)):
+            self._spawn(list(QUEUES) + [LEGACY_QUEUE])
+        surplus = len(general) - target
+        for name in sorted(general, key=lambda n: self.idle_since.get(n, now)):
+            if surplus <= 0:
+                break
+            if states.get(name) == 'idle' and now - self.idle_since.get(name, now) >= Config.SCALE_DOWN_IDLE_SECONDS:
+                print(f"Supervisor: reduciendo workers, se para {name} (cola: {depth})")
+                os.kill(self.procs[name][0].pid, signal.SIGTERM)  # Ocioso: sale al instante
+                surplus -= 1
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Supervisor: hasta {Config.WORKER_PROCESSES} workers ({self.reserved} solo interactive)")
+        while self.running:
+            self.scale()
+            deadline = time.monotonic() + Config.SCALE_INTERVAL_SECONDS
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.2)
+        self.shutdown()
+
+    def shutdown(self, timeout: float = 30):
+        # Apagado suave de RQ (terminan el job en curso); si no, un segundo SIGTERM lo corta
+        # y el job queda con checkpoint para reanudarse
+        print("Supervisor: parando workers...")
+        for proc, _ in self.procs.values():
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        for proc, _ in self.procs.values():
+            proc.join(max(deadline - time.monotonic(), 0))
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
+                proc.join(5)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        self.procs.clear()
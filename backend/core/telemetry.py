@@ -0,0 +1,270 @@
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from config import Config
+from core.status import list_simulations
+
+# Fases del bucle del worker en las que se reparte el tiempo ('wait': el envío espera
+# al productor en modo pipeline)
+STAGES = ('generate', 'serialize', 'send', 'throttle', 'redis', 'wait')
+# Límites (s) del histograma de latencia de envío al sink; el último cubo es +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_MODES = ('cprofile', 'sampling')
+
+def metrics_key(sim_id: str) -> str:
+    return f"sim_metrics:{sim_id}"
+
+class Telemetry:
+    """
+    Métricas del bucle de un shard: tiempo por fase, errores por fase (los de envío, por
+    sink), filas, lotes e histograma de latencia de envío. Se acumulan en memoria (sin coste de red en el
+    bucle) y drain() suma los incrementos en sim_metrics:{sim_id} dentro del pipeline
+    del volcado de progreso; al ser HINCRBY/HINCRBYFLOAT, los shards se agregan solos.
+    """
+    def __init__(self, sim_id: str, target: str = None):
+        self.key = metrics_key(sim_id)
+        self.target = target
+        self.started = False
+        self.unlogged = Counter()  # Errores por fase aún no avisados en el log
+        self.logged_at = {}
+        self._reset()
+
+    def _reset(self):
+        self.rows = 0
+        self.batches = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.errors = Counter()
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.send_sum = 0.0
+
+    def add_time(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+
+    def error(self, stage: str, sink: str = None):
+        """Cuenta un error de la fase; los de envío llevan el sink que falló (errors:send:kafka)."""
+        self.errors[stage if sink is None else f"{stage}:{sink}"] += 1
+
+    def log(self, stage: str, message: str):
+        """
+        Imprime un error sin inundar el log si falla cada lote: el primero de cada fase
+        sale al momento y los siguientes, como mucho uno por ERROR_LOG_SECONDS junto al
+        número de errores omitidos desde el último aviso. No cuenta: eso es error().
+        """
+        self.unlogged[stage] += 1
+        now = time.monotonic()
+        last = self.logged_at.get(stage)
+        if last is not None and now - last < Config.ERROR_LOG_SECONDS:
+            return
+        skipped = self.unlogged[stage] - 1
+        print(f"{message} (+{skipped} errores más)" if skipped else message)
+        self.unlogged[stage] = 0
+        self.logged_at[stage] = now
+
+    def observe_send(self, seconds: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.send_sum += seconds
+
+    def batch(self, rows: int):
+        self.rows += rows
+        self.batches += 1
+
+    def drain(self, pipe):
+        """Añade al pipeline los incrementos acumulados desde el último volcado."""
+        now = time.time()
+        if not self.started:
+            pipe.hsetnx(self.key, "started", now)
+            if self.target:
+                pipe.hset(self.key, "target", self.target)
+            self.started = True
+        if self.rows:
+            pipe.hincrby(self.key, "rows", self.rows)
+        if self.batches:
+            pipe.hincrby(self.key, "batches", self.batches)
+        for stage, seconds in self.seconds.items():
+            if seconds:
+                pipe.hincrbyfloat(self.key, f"seconds:{stage}", seconds)
+        for stage, count in self.errors.items():
+            pipe.hincrby(self.key, f"errors:{stage}", count)
+        for le, count in zip(LATENCY_BUCKETS + ('+Inf',), self.buckets):
+            if count:
+                pipe.hincrby(self.key, f"send_bucket:{le}", count)
+        if self.send_sum:
+            pipe.hincrbyfloat(self.key, "send_sum", self.send_sum)
+        pipe.hset(self.key, "updated", now)
+        self._reset()
+
+# --- Perfilado opcional por simulación ---
+
+def profile_dir() -> str:
+    # Directorio oculto: el listado de /api/files no lo muestra
+    return Config.PROFILE_DIR or os.path.join(Config.DATA_DIR, '.profiles')
+
+class Profiler:
+    """
+    Perfil del bucle de un shard:
+
+    - cprofile: determinista (todas las llamadas), con overhead apreciable. Se guarda
+      el .prof (pstats, snakeviz...) y un resumen por tiempo acumulado.
+    - sampling: un hilo toma la pila del worker cada PROFILE_SAMPLE_SECONDS; overhead
+      casi nulo. Se guardan las pilas colapsadas (.folded, para flamegraph.pl/speedscope).
+    """
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Perfilado desconocido: {mode} (cprofile, sampling)")
+        self.mode = mode
+        self.profile = None
+        self.stacks = Counter()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            target = threading.get_ident()
+            self._thread = threading.Thread(target=self._sample, args=(target,), name="profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self, target: int):
+        interval = Config.PROFILE_SAMPLE_SECONDS
+        while not self._done.wait(interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+        if self._thread is not None:
+            self._done.set()
+            self._thread.join()
+
+    def summary(self, top: int = 40) -> str:
+        if self.profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(top)
+            return out.getvalue()
+        # Muestreo: funciones por muestras inclusivas (aparecen en la pila) y propias (en la cima)
+        total = sum(self.stacks.values()) or 1
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            for name in set(frames):
+                inclusive[name] += count
+            own[frames[-1]] += count
+        lines = [f"{total} muestras cada {Config.PROFILE_SAMPLE_SECONDS * 1000:g} ms",
+                 f"{'total%':>7} {'propio%':>7}  función"]
+        for name, count in inclusive.most_common(top):
+            lines.append(f"{100 * count / total:7.1f} {100 * own[name] / total:7.1f}  {name}")
+        return '\n'.join(lines) + '\n'
+
+    def save(self, sim_id: str, shard: int = 0) -> str:
+        """Guarda el perfil y su resumen (.txt); devuelve la ruta del perfil."""
+        base = os.path.join(profile_dir(), f"{sim_id}.shard{shard}")
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        if self.profile is not None:
+            path = base + '.prof'
+            self.profile.dump_stats(path)
+        else:
+            path = base + '.folded'
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(self.summary())
+        return path
+
+# --- Exposición en formato Prometheus ---
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{k}="{_label(v)}"' for k, v in labels.items()) + '}'
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def render_prometheus(redis_conn, limit: int = 100) -> str:
+    """
+    Exposición de texto Prometheus de las 'limit' simulaciones más recientes: progreso,
+    filas, tiempo y errores por fase, filas/s, histograma de envío y estadísticas del sink.
+    """
+    sims = list_simulations(redis_conn, limit=limit)
+    pipe = redis_conn.pipeline()
+    for sim_id in sims:
+        pipe.hgetall(metrics_key(sim_id))
+    metrics = {sim_id: {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+               for sim_id, data in zip(sims, pipe.execute())}
+
+    families = {}  # nombre -> (tipo, ayuda, [líneas])
+    def add(name, kind, help_text, labels, value, suffix=""):
+        if value is None:
+            return
+        family = families.setdefault(name, (kind, help_text, []))
+        family[2].append(f"{name}{suffix}{_labels(**labels)} {value:g}")
+
+    by_status = Counter(s.get("status", "unknown") for s in sims.values())
+    for status, count in sorted(by_status.items()):
+        add("synth_simulations", "gauge", "Simulaciones por estado (entre las listadas)", {"status": status}, count)
+
+    for sim_id, status in sims.items():
+        m = metrics[sim_id]
+        base = {"sim_id": sim_id, "name": status.get("name", ""), "target": m.get("target", "")}
+        current, total = _number(status.get("current")), _number(status.get("total"))
+        add("synth_rows_current", "gauge", "Filas enviadas según el estado", base, current)
+        add("synth_rows_target", "gauge", "Filas objetivo", base, total)
+        if not m:
+            continue
+        rows = _number(m.get("rows"))
+        add("synth_rows_total", "counter", "Filas generadas y enviadas por los workers", base, rows)
+        add("synth_batches_total", "counter", "Lotes procesados", base, _number(m.get("batches")))
+        for stage in STAGES:
+            add("synth_stage_seconds_total", "counter", "Tiempo del bucle por fase",
+                dict(base, stage=stage), _number(m.get(f"seconds:{stage}", 0)))
+        for key, value in m.items():
+            if key.startswith("errors:"):
+                # errors:{fase} o errors:send:{sink} (cada destino de un fan-out por separado)
+                stage, _, sink = key[7:].partition(':')
+                labels = dict(base, stage=stage, sink=sink) if sink else dict(base, stage=stage)
+                add("synth_errors_total", "counter", "Errores por fase (y sink, en el envío)",
+                    labels, _number(value))
+        started, updated = _number(m.get("started")), _number(m.get("updated"))
+        if rows and started and updated and updated > started:
+            add("synth_rows_per_second", "gauge", "Tasa media lograda desde el inicio",
+                base, round(rows / (updated - started), 2))
+        cumulative = 0
+        for le in LATENCY_BUCKETS + ('+Inf',):
+            cumulative += int(m.get(f"send_bucket:{le}", 0))
+            add("synth_sink_send_seconds", "histogram", "Latencia de envío de un lote al sink (sin serializar)",
+                dict(base, le=le), cumulative, "_bucket")
+        add("synth_sink_send_seconds", "histogram", None, base, _number(m.get("send_sum", 0)), "_sum")
+        add("synth_sink_send_seconds", "histogram", None, base, cumulative, "_count")
+        # Estadísticas propias del sink (sent, failed, p99_ms...) publicadas en el estado
+        for key, value in status.items():
+            if key.startswith("sink_"):
+                add("synth_sink_stat", "gauge", "Estadísticas del sink (sink_* en el estado)",
+                    dict(base, stat=key[5:]), _number(value))
+
+    out = []
+    for name, (kind, help_text, lines) in families.items():
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+    return '\n'.join(out) + '\n'
@@ -22,7 +22,12 @@ TEXTS = {
             "start": {
                 "summary": "Iniciar una nueva simulación",
                 "desc": "Crea y encola una nueva simulación de datos sintéticos. La simulación corre en background.",
-                "response": "Simulación creada y encolada exitosamente"
+                "response": "Simulación creada y encolada exitosamente",
+                "error_422": "Prioridad desconocida: usa interactive o bulk",
+                "error_sinks": "Indica target_type o una lista sinks (sin dos ficheros del mismo formato y compresión)",
+                "error_unique": "Campo unique imposible de cumplir",
+                "error_tables": "Configuración de tablas no válida (o faltan total_records y schema_fields)",
+                "error_ref": "Un campo ref solo vale dentro de tables, con table apuntando a una tabla existente"
             },
             "stop": {
                 "summary": "Detener una simulación",
@@ -30,18 +35,53 @@ TEXTS = {
                 "response": "Señal de parada enviada",
                 "error_404": "Simulación no encontrada"
             },
+            "resume": {
+                "summary": "Reanudar una simulación",
+                "desc": "Re-encola los shards no terminados desde su último checkpoint (tras un fallo del worker o una parada), sin regenerar ni duplicar filas ya persistidas.",
+                "response": "Simulación re-encolada desde el último checkpoint",
+                "error_404": "Simulación no encontrada",
+                "error_409": "No hay nada que reanudar (terminada o todavía en ejecución)"
+            },
             "all": {
                 "summary": "Obtener estado de todas las simulaciones",
-                "desc": "Retorna el estado actual (queued, running, completed, stopped) de todas las simulaciones."
+                "desc": "Retorna el estado actual (queued, running, completed, stopped) de las simulaciones, de la más reciente a la más antigua. Admite filtro por estado y paginación (offset/limit); el total va en la cabecera X-Total-Count."
+            },
+            "events": {
+                "summary": "Stream de estado y progreso (SSE)",
+                "desc": "Server-Sent Events: un evento 'snapshot' con el estado actual y después eventos 'status' y 'progress' a medida que cambian. Con sim_id, solo los de esa simulación."
+            },
+            "metrics": {
+                "summary": "Telemetría de una simulación",
+                "desc": "Tiempo por fase (generate, serialize, send, throttle, redis, wait), errores por fase, filas, lotes e histograma de latencia de envío, sumados entre shards. Las mismas métricas de todas las simulaciones se exponen en /metrics (formato Prometheus).",
+                "error_404": "Simulación no encontrada"
+            },
+            "profile": {
+                "summary": "Perfil de rendimiento de una simulación",
+                "desc": "Resumen del perfil capturado con profile=cprofile o profile=sampling (uno por shard). Con raw=true se descarga el perfil completo (.prof para pstats/snakeviz o pilas colapsadas .folded para flamegraph).",
+                "error_404": "No hay perfil para esta simulación o shard"
+            },
+            "workers": {
+                "summary": "Colas y workers",
+                "desc": "Trabajos en espera por cola (interactive, bulk) y estado de cada proceso worker del supervisor. Las simulaciones pequeñas van a interactive; las grandes, a bulk, donde ceden el turno por rodajas a las interactivas."
+            },
+            "cache": {
+                "summary": "Estadísticas de la caché de datasets",
+                "desc": "Entradas, bytes ocupados y máximo (CACHE_MAX_MB), aciertos, fallos, tasa de acierto, entradas guardadas y expulsadas (LRU). Una simulación con seed y cache=true que ya se generó con la misma configuración se completa al instante enlazando sus ficheros; a los destinos de mensajes se reenvía su NDJSON cacheado."
             },
             "list_files": {
                 "summary": "Listar archivos generados",
-                "desc": "Obtiene la lista de archivos (JSON, CSV, etc.) ordenados por fecha."
+                "desc": "Obtiene la lista de archivos (JSON, CSV, etc.) ordenados por fecha, paginada (offset/limit), con tamaño y número de filas de los ficheros ya cerrados."
             },
             "download": {
                 "summary": "Descargar un archivo",
-                "desc": "Descarga directa del archivo generado.",
+                "desc": "Descarga directa del archivo generado. Admite cabeceras Range para reanudar descargas; con gzip=true se comprime al vuelo.",
                 "error_404": "Archivo no encontrado"
+            },
+            "tail": {
+                "summary": "Seguir un archivo en vivo",
+                "desc": "Envía el contenido del archivo a medida que la simulación lo escribe (como tail -f) y cierra la conexión cuando termina. Los formatos de texto se envían por líneas completas.",
+                "error_404": "Archivo no encontrado",
+                "error_400": "Parquet/Arrow no se pueden seguir en vivo (el fichero solo es válido al cerrarse)"
             }
         }
     },
@@ -68,7 +108,12 @@ TEXTS = {
             "start": {
                 "summary": "Start a new simulation",
                 "desc": "Creates and queues a new synthetic data simulation running in the background.",
-                "response": "Simulation created and queued successfully"
+                "response": "Simulation created and queued successfully",
+                "error_422": "Unknown priority: use interactive or bulk",
+                "error_sinks": "Set target_type or a sinks list (no two files with the same format and compression)",
+                "error_unique": "Unique field cannot be satisfied",
+                "error_tables": "Invalid tables configuration (or total_records and schema_fields are missing)",
+                "error_ref": "A ref field is only valid inside tables, with table naming an existing table"
             },
             "stop": {
                 "summary": "Stop a simulation",
@@ -76,18 +121,53 @@ TEXTS = {
                 "response": "Stop signal sent",
                 "error_404": "Simulation not found"
             },
+            "resume": {
+                "summary": "Resume a simulation",
+                "desc": "Re-queues unfinished shards from their last checkpoint (after a worker crash or a stop), without regenerating or duplicating rows already persisted.",
+                "response": "Simulation re-queued from its last checkpoint",
+                "error_404": "Simulation not found",
+                "error_409": "Nothing to resume (finished or still running)"
+            },
             "all": {
                 "summary": "Get status of all simulations",
-                "desc": "Returns current status (queued, running, completed, stopped) of all simulations."
+                "desc": "Returns current status (queued, running, completed, stopped) of simulations, newest first. Supports status filtering and pagination (offset/limit); the total is returned in the X-Total-Count header."
+            },
+            "events": {
+                "summary": "Status and progress stream (SSE)",
+                "desc": "Server-Sent Events: a 'snapshot' event with the current state, then 'status' and 'progress' events as they change. With sim_id, only that simulation's events."
+            },
+            "metrics": {
+                "summary": "Simulation telemetry",
+                "desc": "Time per stage (generate, serialize, send, throttle, redis, wait), errors per stage, rows, batches and a send-latency histogram, summed across shards. The same metrics for every simulation are exposed at /metrics (Prometheus format).",
+                "error_404": "Simulation not found"
+            },
+            "profile": {
+                "summary": "Simulation performance profile",
+                "desc": "Summary of the profile captured with profile=cprofile or profile=sampling (one per shard). With raw=true the full profile is downloaded (.prof for pstats/snakeviz or collapsed .folded stacks for flamegraph).",
+                "error_404": "No profile for this simulation or shard"
+            },
+            "workers": {
+                "summary": "Queues and workers",
+                "desc": "Waiting jobs per queue (interactive, bulk) and the state of each supervisor worker process. Small simulations go to interactive; large ones go to bulk, where they yield to interactive jobs in time slices."
+            },
+            "cache": {
+                "summary": "Dataset cache statistics",
+                "desc": "Entries, bytes used and cap (CACHE_MAX_MB), hits, misses, hit rate, stored and evicted (LRU) entries. A seeded simulation with cache=true whose exact configuration was already generated completes immediately by linking its files; message targets get its cached NDJSON replayed."
             },
             "list_files": {
                 "summary": "List generated files",
-                "desc": "Gets the list of files (JSON, CSV, etc.) sorted by date."
+                "desc": "Gets the list of files (JSON, CSV, etc.) sorted by date, paginated (offset/limit), with size and row count for closed files."
             },
             "download": {
                 "summary": "Download a file",
-                "desc": "Direct download of the generated file.",
+                "desc": "Direct download of the generated file. Supports Range headers for resumable downloads; with gzip=true it is compressed on the fly.",
                 "error_404": "File not found"
+            },
+            "tail": {
+                "summary": "Follow a file live",
+                "desc": "Streams the file as the simulation writes it (like tail -f) and closes the connection when it finishes. Text formats are sent as complete lines.",
+                "error_404": "File not found",
+                "error_400": "Parquet/Arrow cannot be followed live (the file is only valid once closed)"
             }
         }
     }
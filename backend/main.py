@@ -1,17 +1,37 @@
+import json
 import uuid
 import redis
+import redis.asyncio
 import os
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, RedirectResponse
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from rq import Queue
+from typing import List, Literal, Optional
+from rq import Worker
 from config import Config
-from worker import simulation_task
+from worker import resume_simulation, cache_lookup
+from core.control import publish_stop
+from core.status import INDEX_KEY, register_simulation, list_simulations, ensure_index, event_stream
+from core.files import file_index, safe_path, split_extension, is_compressed, gzip_stream, tail_stream, writer_finished
+from core.formats import COLUMNAR_FORMATS
+from core.telemetry import metrics_key, render_prometheus
+from core.scheduling import queue_for, enqueue_simulation, enqueue_cached, queue_depths
+from core.sinks import sink_configs
+from core.unique import check_unique
+from core.relational import check_refs, check_tables, table_rows
+from core.cache import DatasetCache, cacheable
 from i18n import TEXTS
 
 redis_conn = redis.Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT)
-q = Queue(connection=redis_conn)
+# Cliente asíncrono para los streams de eventos (pub/sub sin ocupar hilos del pool)
+async_redis = redis.asyncio.Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT)
+
+# Las simulaciones anteriores al índice se indexan una vez al arrancar
+try:
+    ensure_index(redis_conn)
+except Exception as e:
+    print(f"Aviso: no se pudo indexar simulaciones previas: {e}")
 
 class FieldSchema(BaseModel):
     name: str = Field(..., description="Nombre del campo / Field Name", example="temperature")
@@ -21,15 +41,90 @@ class FieldSchema(BaseModel):
     min: Optional[float] = Field(None, description="Valor mínimo / Min value")
     max: Optional[float] = Field(None, description="Valor máximo / Max value")
     null_percentage: int = Field(0, description="% Nulos / % Nulls", ge=0, le=100)
+    locale: Optional[str] = Field(None, description="Locale Faker (es_ES, en_US...) / Faker locale", example="es_ES")
+    pooled: bool = Field(False, description="Muestrear de un pool pregenerado (más rápido, menos variado) / Sample from a pre-generated pool (faster, less varied)")
+    pool_size: Optional[int] = Field(None, description="Tamaño del pool / Pool size", gt=0)
+    pool_unique: bool = Field(False, description="Pool sin valores repetidos / Pool without repeated values")
+    unique: bool = Field(False, description="Sin valores repetidos en toda la simulación / No repeated values across the whole simulation")
+    table: Optional[str] = Field(None, description="Tabla referenciada por un campo 'ref' / Table referenced by a 'ref' field")
+
+class SinkSpec(BaseModel):
+    target_type: str = Field(..., description="Destino (file, mqtt, kafka...) / Target type")
+    file_format: Optional[str] = Field(None, description="Formato de archivo / File format")
+    file_compression: Optional[str] = Field(None, description="Compresión en streaming: gzip o zstd / Streaming compression: gzip or zstd")
+    file_max_rows: Optional[int] = Field(None, description="Filas máximas por fichero parte / Max rows per part file", gt=0)
+    file_max_mb: Optional[float] = Field(None, description="Tamaño máximo (MB) por fichero parte / Max size (MB) per part file", gt=0)
+    mqtt_host: Optional[str] = Field(None, description="MQTT Host")
+    mqtt_port: Optional[int] = Field(None, description="MQTT Port")
+    mqtt_topic: Optional[str] = Field(None, description="MQTT Topic")
+    kafka_bootstrap: Optional[str] = Field(None, description="Kafka Bootstrap Servers")
+    kafka_topic: Optional[str] = Field(None, description="Kafka Topic")
+    kafka_linger_ms: Optional[int] = Field(None, description="Kafka linger.ms", ge=0)
+    kafka_batch_size: Optional[int] = Field(None, description="Kafka batch.size (bytes; 0 = sin lotes / no batching)", ge=0)
+    http_url: Optional[str] = Field(None, description="HTTP Webhook URL")
+    http_batch_format: Optional[str] = Field(None, description="Lotes por POST: 'json' (array) o 'ndjson' / Batched POST bodies")
+    http_concurrency: Optional[int] = Field(None, description="Peticiones HTTP en vuelo / In-flight HTTP requests", ge=1, le=256)
+    http_gzip: Optional[bool] = Field(None, description="Comprimir cuerpos con gzip / Gzip request bodies")
+    http_retries: Optional[int] = Field(None, description="Reintentos con backoff exponencial / Retries with exponential backoff", ge=0, le=10)
+    http_timeout: Optional[float] = Field(None, description="Timeout por petición (s) / Per-request timeout (s)", gt=0)
+    rabbitmq_host: Optional[str] = Field(None, description="RabbitMQ Host")
+    rabbitmq_queue: Optional[str] = Field(None, description="RabbitMQ Queue")
+
+class Cardinality(BaseModel):
+    distribution: str = Field('fixed', description="Hijos por fila padre: fixed, uniform, poisson o zipf / Children per parent row")
+    value: Optional[int] = Field(None, description="fixed: nº de hijos / fixed: number of children", ge=0)
+    min: Optional[int] = Field(None, description="uniform: mínimo / uniform: minimum", ge=0)
+    max: Optional[int] = Field(None, description="uniform: máximo; zipf: tope / uniform: maximum; zipf: cap", ge=0)
+    mean: Optional[float] = Field(None, description="poisson: media / poisson: mean", ge=0)
+    a: Optional[float] = Field(None, description="zipf: exponente (> 1) / zipf: exponent (> 1)", gt=1)
+
+class TableSpec(BaseModel):
+    name: str = Field(..., description="Nombre de la tabla / Table name", example="orders")
+    schema_fields: List[FieldSchema] = Field([], description="Esquema de campos / Field Schema")
+    total_records: Optional[int] = Field(None, description="Filas (tablas sin parent) / Rows (tables without parent)", gt=0)
+    parent: Optional[str] = Field(None, description="Tabla padre / Parent table", example="customers")
+    cardinality: Optional[Cardinality] = Field(None, description="Hijos por fila padre / Children per parent row")
+    key: str = Field('id', description="Columna de clave primaria (1..N) / Primary key column (1..N)")
+    foreign_key: Optional[str] = Field(None, description="Columna de clave foránea (por defecto, <parent>_id) / Foreign key column")
+    sinks: Optional[List[SinkSpec]] = Field(None, description="Destinos propios de la tabla / Table-specific targets")
 
 class SimConfig(BaseModel):
     simulation_name: str = Field(..., description="Nombre de simulación / Simulation Name")
-    total_records: int = Field(..., description="Total registros / Total records", gt=0)
+    total_records: Optional[int] = Field(None, description="Total registros (sin tables) / Total records (without tables)", gt=0)
     delay_seconds: float = Field(0, description="Retraso (segundos) / Delay (seconds)", ge=0)
+    rate_per_second: Optional[float] = Field(None, description="Tasa objetivo (filas/s); sustituye a delay_seconds / Target rate (rows/s); overrides delay_seconds", gt=0)
+    rate_burst: Optional[int] = Field(None, description="Ráfaga máxima recuperable tras un atasco (filas) / Max catch-up burst (rows)", gt=0)
+    rate_profile: Optional[Literal['constant', 'ramp', 'sine', 'spike']] = Field('constant', description="Perfil de carga: constant, ramp, sine, spike / Load profile")
+    rate_period_seconds: float = Field(60, description="Duración de la rampa o periodo de sine/spike (s) / Ramp duration or sine/spike period (s)", gt=0)
+    rate_amplitude: float = Field(0.5, description="sine: amplitud relativa; spike: tasa extra del pico / sine: relative amplitude; spike: extra rate at peak", ge=0)
     device_count: int = Field(1, description="Cantidad dispositivos / Device count", gt=0)
+    batch_size: Optional[int] = Field(None, description="Filas por lote enviado al sink / Rows per batch sent to the sink", ge=1, le=100000)
+    fleet_mode: bool = Field(False, description="Flota con estado por dispositivo avanzada por ticks (device_count > 1) / Stateful per-device fleet advanced in ticks")
+    fleet_tick_seconds: float = Field(1.0, description="Intervalo entre ticks de la flota (s) / Fleet tick interval (s)", gt=0)
+    fleet_realtime: bool = Field(True, description="Emitir los ticks a ritmo real (si no, lo más rápido posible) / Pace ticks in real time (otherwise as fast as possible)")
+    fleet_volatility: float = Field(0.01, description="Paso del paseo aleatorio por tick (fracción del rango) / Random-walk step per tick (fraction of range)", ge=0)
+    fleet_failure_rate: float = Field(0.0, description="Probabilidad por tick de que un dispositivo caiga / Per-tick device failure probability", ge=0, le=1)
+    fleet_max_interval_ticks: int = Field(1, description="Intervalo de muestreo máximo por dispositivo (ticks) / Max per-device sampling interval (ticks)", ge=1, le=65535)
+
+    seed: Optional[int] = Field(None, description="Semilla: salida reproducible bit a bit (reloj virtual) / Seed: bit-for-bit reproducible output (virtual clock)", ge=0)
+    start_time: Optional[datetime] = Field(None, description="Inicio del reloj virtual con seed / Virtual clock start when seeded")
+    shards: int = Field(1, description="Nº de jobs paralelos en que se reparte la simulación / Number of parallel jobs", ge=1, le=1024)
+    merge_shards: bool = Field(False, description="Unir las partes de fichero al terminar (si no, manifest) / Merge file parts at the end (otherwise manifest)")
+    profile: Optional[str] = Field(None, description="Perfilar el worker: cprofile o sampling / Profile the worker: cprofile or sampling")
+    priority: Optional[str] = Field(None, description="Cola: interactive o bulk (por defecto, según tamaño y ritmo) / Queue: interactive or bulk (by default, from size and pacing)")
+    pipeline_mode: Optional[str] = Field(None, description="Solapar generación, serialización y envío: thread o process / Overlap generation, serialization and sending: thread or process")
+    pipeline_producers: int = Field(1, description="Procesos generadores (modo process, sin seed) / Generator processes (process mode, unseeded)", ge=1, le=64)
+    pipeline_serializers: int = Field(1, description="Hilos de serialización (modo thread) / Serializer threads (thread mode)", ge=1, le=64)
+    pipeline_queue: Optional[int] = Field(None, description="Lotes en vuelo entre etapas / Batches in flight between stages", ge=1, le=256)
     
-    target_type: str = Field(..., description="Destino (file, mqtt, kafka...) / Target type")
-    file_format: Optional[str] = Field('json', description="Formato de archivo / File format")
+    target_type: Optional[str] = Field(None, description="Destino (file, mqtt, kafka...); o bien sinks / Target type; or sinks")
+    sinks: Optional[List[SinkSpec]] = Field(None, description="Varios destinos del mismo flujo; heredan las opciones de arriba / Several targets fed from one stream; inherit the options above")
+    cache: bool = Field(False, description="Reutilizar el dataset de una simulación idéntica con seed (caché de datasets) / Reuse the dataset of an identical seeded simulation (dataset cache)")
+    json_encoder: Optional[str] = Field(None, description="Codificador JSON: json, orjson o msgspec (por defecto, el más rápido instalado) / JSON encoder")
+    file_format: Optional[str] = Field('json', description="Formato de archivo (json, ndjson, csv, xml, toml, parquet, arrow) / File format")
+    file_compression: Optional[str] = Field(None, description="Compresión en streaming: gzip o zstd / Streaming compression: gzip or zstd")
+    file_max_rows: Optional[int] = Field(None, description="Filas máximas por fichero parte / Max rows per part file", gt=0)
+    file_max_mb: Optional[float] = Field(None, description="Tamaño máximo (MB) por fichero parte / Max size (MB) per part file", gt=0)
     
     mqtt_host: Optional[str] = Field(None, description="MQTT Host")
     mqtt_port: Optional[int] = Field(1883, description="MQTT Port")
@@ -37,10 +132,18 @@ class SimConfig(BaseModel):
     kafka_bootstrap: Optional[str] = Field(None, description="Kafka Bootstrap Servers")
     kafka_topic: Optional[str] = Field(None, description="Kafka Topic")
     http_url: Optional[str] = Field(None, description="HTTP Webhook URL")
+    http_batch_format: Optional[str] = Field(None, description="Lotes por POST: 'json' (array) o 'ndjson'; vacío = un POST por fila / Batched POST bodies")
+    http_concurrency: int = Field(1, description="Peticiones HTTP en vuelo / In-flight HTTP requests", ge=1, le=256)
+    http_gzip: bool = Field(False, description="Comprimir cuerpos con gzip / Gzip request bodies")
+    http_retries: int = Field(0, description="Reintentos con backoff exponencial / Retries with exponential backoff", ge=0, le=10)
+    http_timeout: float = Field(2, description="Timeout por petición (s) / Per-request timeout (s)", gt=0)
+    kafka_linger_ms: Optional[int] = Field(None, description="Kafka linger.ms", ge=0)
+    kafka_batch_size: Optional[int] = Field(None, description="Kafka batch.size (bytes; 0 = sin lotes / no batching)", ge=0)
     rabbitmq_host: Optional[str] = Field(None, description="RabbitMQ Host")
     rabbitmq_queue: Optional[str] = Field(None, description="RabbitMQ Queue")
 
-    schema_fields: List[FieldSchema] = Field(..., description="Esquema de campos / Field Schema")
+    schema_fields: Optional[List[FieldSchema]] = Field(None, description="Esquema de campos (sin tables) / Field Schema (without tables)")
+    tables: Optional[List[TableSpec]] = Field(None, description="Tablas relacionadas (padre -> hijos), en lugar de schema_fields / Related tables (parent -> children), instead of schema_fields")
 
 class SimulationResponse(BaseModel):
     message: str
@@ -49,8 +152,16 @@ class SimulationResponse(BaseModel):
 class StopResponse(BaseModel):
     message: str
 
+class FileInfo(BaseModel):
+    name: str
+    size: int = Field(..., description="Tamaño en bytes / Size in bytes")
+    modified: str
+    rows: Optional[int] = Field(None, description="Filas (si el fichero ya está cerrado) / Rows (once the file is closed)")
+
 class FileListResponse(BaseModel):
     files: List[str]
+    items: List[FileInfo] = []
+    total: int = 0
 
 def create_app(lang: str = "es") -> FastAPI:
     """
@@ -80,15 +191,68 @@ def create_app(lang: str = "es") -> FastAPI:
               summary=endpoints["start"]["summary"], description=endpoints["start"]["desc"])
     def start_simulation(config: SimConfig):
         sim_id = str(uuid.uuid4())[:8]
-        
-        redis_conn.hset(f"sim_status:{sim_id}", mapping={
+        payload = config.dict()
+        if config.tables:
+            try:
+                # Tablas en orden de dependencias; el total es estimado hasta que el worker lo calcula
+                payload["tables"] = check_tables(payload)
+                payload["total_records"] = sum(table_rows(payload, estimate=True))
+                payload["schema_fields"] = []
+                for table, rows in zip(payload["tables"], table_rows(payload, estimate=True)):
+                    check_unique(dict(payload, schema_fields=table["schema_fields"], total_records=rows))
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"{endpoints['start']['error_tables']}: {e}")
+        elif not config.total_records or config.schema_fields is None:
+            raise HTTPException(status_code=422, detail=endpoints["start"]["error_tables"])
+        else:
+            try:
+                check_refs(payload)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=f"{endpoints['start']['error_ref']}: {e}")
+
+        shards = min(config.shards, max(payload["total_records"], 1))
+        if config.fleet_mode:
+            shards = min(shards, config.device_count)  # En modo fleet se reparten dispositivos
+        try:
+            # Falta destino o dos ficheros con la misma ruta (con tablas, en cada una)
+            for table in payload["tables"] or [{}]:
+                sink_configs(dict(payload, sinks=table["sinks"]) if table.get("sinks") else payload)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=endpoints["start"]["error_sinks"])
+        try:
+            check_unique(payload)  # Espacio de valores menor que total_records, fleet_mode...
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"{endpoints['start']['error_unique']}: {e}")
+        try:
+            queue = queue_for(payload, shards)  # Prioridad: interactive (pequeñas) o bulk
+        except ValueError:
+            raise HTTPException(status_code=422, detail=endpoints["start"]["error_422"])
+        status = {
             "name": config.simulation_name,
             "status": "queued",
-            "total": config.total_records,
-            "current": 0
-        })
-        
-        q.enqueue(simulation_task, sim_id, config.dict())
+            "total": payload["total_records"],
+            "current": 0,
+            "queue": queue
+        }
+        if config.seed is not None:
+            status["seed"] = config.seed
+        if shards > 1:
+            status.update({"shards": shards, "shards_done": 0})
+
+        if config.start_time is not None:
+            payload["start_time"] = config.start_time.isoformat()
+        # Caché de datasets: con seed, la misma configuración ya generada se enlaza sin generarla
+        hit = None
+        if cacheable(payload):
+            hit = cache_lookup(payload, shards)
+            status["cache"] = "miss" if hit is None else "hit"
+        # Se guarda la configuración (para poder reanudar desde checkpoint) y se indexa
+        register_simulation(redis_conn, sim_id, status, json.dumps(payload))
+        if hit is not None:
+            enqueue_cached(redis_conn, sim_id, payload, hit, shards, queue)
+        else:
+            for shard in range(shards):
+                enqueue_simulation(redis_conn, sim_id, payload, shard, shards, queue=queue)
         
         return {"message": endpoints["start"]["response"], "sim_id": sim_id}
 
@@ -97,39 +261,102 @@ def create_app(lang: str = "es") -> FastAPI:
     def stop_simulation(sim_id: str):
         key = f"sim_status:{sim_id}"
         if redis_conn.exists(key):
-            redis_conn.hset(key, "status", "stopped")
+            publish_stop(redis_conn, sim_id)
             return {"message": endpoints["stop"]["response"]}
         raise HTTPException(status_code=404, detail=endpoints["stop"]["error_404"])
 
+    @app.post("/api/simulation/resume/{sim_id}", response_model=StopResponse, tags=[tag_sim],
+              summary=endpoints["resume"]["summary"], description=endpoints["resume"]["desc"])
+    def resume(sim_id: str):
+        if not redis_conn.exists(f"sim_status:{sim_id}"):
+            raise HTTPException(status_code=404, detail=endpoints["resume"]["error_404"])
+        if resume_simulation(sim_id) == 0:
+            raise HTTPException(status_code=409, detail=endpoints["resume"]["error_409"])
+        return {"message": endpoints["resume"]["response"]}
+
     @app.get("/api/simulation/all", tags=[tag_sim],
              summary=endpoints["all"]["summary"], description=endpoints["all"]["desc"])
-    def get_all_status():
-        keys = redis_conn.keys("sim_status:*")
-        results = {}
-        for key in keys:
-            k_str = key.decode('utf-8')
-            sid = k_str.split(":")[1]
-            data = redis_conn.hgetall(k_str)
-            results[sid] = {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
-        return results
+    def get_all_status(response: Response,
+                       status: Optional[str] = Query(None, description="Filtrar por estado / Filter by status"),
+                       offset: int = Query(0, ge=0),
+                       limit: int = Query(Config.STATUS_PAGE_SIZE, ge=1, le=1000)):
+        if status is None:
+            response.headers["X-Total-Count"] = str(redis_conn.zcard(INDEX_KEY))
+        return list_simulations(redis_conn, status=status, offset=offset, limit=limit)
+
+    @app.get("/api/simulation/events", tags=[tag_sim],
+             summary=endpoints["events"]["summary"], description=endpoints["events"]["desc"])
+    def stream_events(sim_id: Optional[str] = None):
+        return StreamingResponse(event_stream(redis_conn, async_redis, sim_id), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.get("/api/simulation/metrics/{sim_id}", tags=[tag_sim],
+             summary=endpoints["metrics"]["summary"], description=endpoints["metrics"]["desc"])
+    def get_metrics(sim_id: str):
+        if not redis_conn.exists(f"sim_status:{sim_id}"):
+            raise HTTPException(status_code=404, detail=endpoints["metrics"]["error_404"])
+        data = redis_conn.hgetall(metrics_key(sim_id))
+        return {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+
+    @app.get("/api/simulation/profile/{sim_id}", tags=[tag_sim],
+             summary=endpoints["profile"]["summary"], description=endpoints["profile"]["desc"])
+    def get_profile(sim_id: str, shard: int = Query(0, ge=0),
+                    raw: bool = Query(False, description="Descargar el perfil (.prof / .folded) en vez del resumen / Download the raw profile instead of the summary")):
+        path = redis_conn.hget(metrics_key(sim_id), f"profile:{shard}")
+        path = path.decode('utf-8') if path else None
+        if path is None or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail=endpoints["profile"]["error_404"])
+        if raw:
+            return FileResponse(path, filename=os.path.basename(path))
+        with open(os.path.splitext(path)[0] + '.txt', encoding='utf-8') as f:
+            return PlainTextResponse(f.read())
+
+    @app.get("/api/workers", tags=[tag_sim],
+             summary=endpoints["workers"]["summary"], description=endpoints["workers"]["desc"])
+    def get_workers():
+        workers = []
+        for w in Worker.all(connection=redis_conn):
+            job = w.get_current_job_id()
+            workers.append({"name": w.name, "state": w.get_state(), "queues": w.queue_names(),
+                            "job": job.decode('utf-8') if isinstance(job, bytes) else job})
+        return {"queues": queue_depths(redis_conn), "workers": sorted(workers, key=lambda w: w["name"])}
+
+    @app.get("/api/cache", tags=[tag_sim],
+             summary=endpoints["cache"]["summary"], description=endpoints["cache"]["desc"])
+    def get_cache_stats():
+        return DatasetCache(redis_conn).stats()
 
     @app.get("/api/files", response_model=FileListResponse, tags=[tag_files],
              summary=endpoints["list_files"]["summary"], description=endpoints["list_files"]["desc"])
-    def list_files():
-        if not os.path.exists(Config.DATA_DIR):
-            return {"files": []}
-        all_files = os.listdir(Config.DATA_DIR)
-        visible_files = [f for f in all_files if not f.startswith('.')]
-        visible_files.sort(reverse=True)
-        return {"files": visible_files}
+    def list_files(offset: int = Query(0, ge=0), limit: int = Query(Config.FILE_PAGE_SIZE, ge=1, le=1000)):
+        items, total = file_index.page(redis_conn, Config.DATA_DIR, offset, limit)
+        return {"files": [f["name"] for f in items], "items": items, "total": total}
 
     @app.get("/api/files/download/{filename}", tags=[tag_files],
              summary=endpoints["download"]["summary"], description=endpoints["download"]["desc"])
-    def download_file(filename: str):
-        path = os.path.join(Config.DATA_DIR, filename)
-        if os.path.exists(path):
-            return FileResponse(path, filename=filename)
-        raise HTTPException(status_code=404, detail=endpoints["download"]["error_404"])
+    def download_file(filename: str, gzip: bool = Query(False, description="Comprimir al vuelo (.gz) / Compress on the fly (.gz)")):
+        path = safe_path(Config.DATA_DIR, filename)
+        if path is None:
+            raise HTTPException(status_code=404, detail=endpoints["download"]["error_404"])
+        if gzip and not is_compressed(filename):
+            return StreamingResponse(gzip_stream(path), media_type="application/gzip",
+                                     headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'})
+        # FileResponse atiende cabeceras Range (206 Partial Content): descargas reanudables
+        return FileResponse(path, filename=filename)
+
+    @app.get("/api/files/tail/{filename}", tags=[tag_files],
+             summary=endpoints["tail"]["summary"], description=endpoints["tail"]["desc"])
+    def tail_file(filename: str, from_start: bool = Query(True, description="Desde el principio o solo lo nuevo / From the start or only new data")):
+        path = safe_path(Config.DATA_DIR, filename)
+        if path is None:
+            raise HTTPException(status_code=404, detail=endpoints["tail"]["error_404"])
+        _, ext = split_extension(filename)
+        if ext in COLUMNAR_FORMATS:
+            raise HTTPException(status_code=400, detail=endpoints["tail"]["error_400"])
+        stream = tail_stream(path, lambda: writer_finished(redis_conn, path), from_start=from_start,
+                             lines=not is_compressed(filename), poll_seconds=Config.TAIL_POLL_SECONDS)
+        return StreamingResponse(stream, media_type="application/octet-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
     return app
 
@@ -141,6 +368,12 @@ app.mount("/en", app_en)
 def root():
     return RedirectResponse(url="/docs")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Formato de exposición de Prometheus (text/plain; version=0.0.4)
+    return PlainTextResponse(render_prometheus(redis_conn, Config.METRICS_MAX_SIMULATIONS),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,105 +1,545 @@
+import json
+import os
 import time
+import zlib
 import redis
-from rq import Worker, Queue
 from config import Config
-from core.generator import generate_row
-from core.sinks import get_sink
+from core.compiler import compile_schema
+from core.context import context_from_config, shard_range, build_sensor_pool
+from core.checkpoint import CheckpointStore, restore_ctx, active_checkpoints
+from core.control import StopWatcher, ProgressReporter
+from core.rate import scheduler_from_config
+from core.fleet import fleet_from_config
+from core.status import set_status, FINISHED
+from core.scheduling import BULK, enqueue_simulation, time_slice
+from core.telemetry import Telemetry, Profiler, metrics_key
+from core.pipeline import open_pipeline, pipeline_mode
+from core.formats import file_extension
+from core.sinks import get_sink, sink_configs, sink_target, file_sink_path, can_merge, merge_file_parts, write_manifest
+from core.unique import UniqueFilters, UniqueLog, check_unique, filter_fields, remove_logs
+from core.relational import table_config, table_keys, table_rows
+from core.cache import DatasetCache, cache_keys, file_specs, message_config, replayable, replay_batches
+from core.encoding import EncodedBatch
 
 # Conexión a Redis
 redis_conn = redis.Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT)
 
-def smart_sleep(seconds, status_key):
-    """
-    Duerme 'seconds' tiempo, pero despierta cada 0.1s para chequear 
-    si el usuario ha pulsado STOP. Devuelve True si debe parar.
-    """
-    waited = 0
-    step = 0.1
-    while waited < seconds:
-        # Chequeo rápido a Redis
+def simulation_task(sim_id, config, shard=0, shards=1, resume=False):
+    tag = sim_id if shards == 1 else f"{sim_id} (shard {shard + 1}/{shards})"
+    print(f"Worker: {'Reanudando' if resume else 'Iniciando'} simulación {tag}...")
+    status_key = f"sim_status:{sim_id}"
+    ckpt = CheckpointStore(redis_conn, sim_id, shard)
+    state = ckpt.load() if resume else None
+    if state and state["parked"]:
+        # Continuación de un job que cedió el turno: si se paró mientras esperaba, no sigue
+        ckpt.unpark()
+        status = (redis_conn.hget(status_key, "status") or b"").decode('utf-8')
+        if status in FINISHED:
+            print(f"Worker: Simulación {tag} en estado '{status}' mientras esperaba turno; no continúa.")
+            return
+    elif not state:
+        # Job nuevo: si se paró mientras seguía en cola, no arranca (ni crea su salida)
+        status = (redis_conn.hget(status_key, "status") or b"").decode('utf-8')
+        if status in FINISHED:
+            print(f"Worker: Simulación {tag} en estado '{status}' antes de empezar; no se genera.")
+            return
+    if config.get('seed') is None:
+        # Campos unique y tablas sin seed: la misma clave en todos los shards y al reanudar
+        config.setdefault('unique_key', zlib.crc32(sim_id.encode('utf-8')))
+
+    # Simulación relacional: cada job genera una tabla (en orden de dependencias) como una
+    # simulación plana; la clave foránea sale del índice de claves del padre
+    job_config, keys, sim_total = config, None, None
+    if config.get('tables'):
         try:
-            current_status = redis_conn.hget(status_key, "status")
-            if current_status and current_status.decode('utf-8') == "stopped":
-                return True # Orden de parada recibida
-        except:
-            pass # Si falla redis momentaneamente, seguimos durmiendo
-            
-        time.sleep(step)
-        waited += step
-    return False
-
-def simulation_task(sim_id, config):
-    print(f"Worker: Iniciando simulación {sim_id}...")
-    
-    # 1. Configurar Sink (Salida)
+            config, keys, sim_total = table_job(sim_id, config)
+        except Exception as e:
+            print(f"Error fatal configurando las tablas: {e}")
+            set_status(redis_conn, sim_id, "error")
+            return
+        tag = f"{tag} [{config['table_name']}]"
+
+    # 1. Configurar Sink (Salida); con shards, cada uno escribe su propia parte
     sink = None
     try:
-        sink = get_sink(config, sim_id, Config.DATA_DIR)
+        sink = get_sink(config, sim_id, Config.DATA_DIR, part=shard if shards > 1 else None,
+                        resume=state["sink"] if state else None)
     except Exception as e:
         print(f"Error fatal configurando Sink: {e}")
         # Marcar como error en Redis para que la UI se entere
-        redis_conn.hset(f"sim_status:{sim_id}", "status", "error")
+        set_status(redis_conn, sim_id, "error")
         return
 
     # 2. Leer configuración
     total = config.get('total_records', 100)
-    delay = config.get('delay_seconds', 0)
     schema = config.get('schema_fields', [])
-    
-    # Lógica Multi-Sensor
-    device_count = config.get('device_count', 1)
-    sensor_pool = []
-    if device_count > 1:
-        import uuid
-        sensor_pool = [f"SENSOR_{str(i+1).zfill(3)}_{str(uuid.uuid4())[:4]}" for i in range(device_count)]
-
-    # 3. Inicializar estado
-    status_key = f"sim_status:{sim_id}"
-    redis_conn.hset(status_key, mapping={"status": "running", "total": total, "current": 0})
+    plan = compile_schema(schema)  # Una compilación por job (cacheada entre jobs)
+    start, end = shard_range(total, shard, shards)
+    ctx = context_from_config(config, shard=shard, offset=start)
+    ctx.keys = keys
+    batch_size = config.get('batch_size') or Config.BATCH_SIZE
 
-    # 4. BUCLE PRINCIPAL
-    for i in range(total):
-        # A) Chequeo de Parada antes de generar
-        current_status = redis_conn.hget(status_key, "status").decode('utf-8')
-        if current_status == "stopped":
-            print(f"Worker: Parada detectada en registro {i}")
-            break
+    # Lógica Multi-Sensor (con seed, el pool es idéntico en todos los shards).
+    # Con fleet_mode, cada dispositivo tiene estado propio y se avanza por ticks.
+    fleet = fleet_from_config(config, plan, ctx, shard, shards)
+    sensor_pool = None if fleet else build_sensor_pool(config.get('device_count', 1), config.get('seed'))
+    try:
+        scheduler = scheduler_from_config(config, shards, batch_size, fleet=fleet is not None)
+        profiler = Profiler(config['profile']) if config.get('profile') else None
+        mode = pipeline_mode(config)
+        check_unique(config)
+    except Exception as e:
+        print(f"Error fatal configurando la simulación: {e}")
+        set_status(redis_conn, sim_id, "error")
+        sink.close()
+        return
 
-        # B) Generar y Enviar
-        try:
-            row = generate_row(schema, sensor_pool=sensor_pool)
-            sink.send(row)
-        except Exception as e:
-            print(f"Error generando/enviando fila: {e}")
-            # Si falla el envío, no paramos todo, pero lo logueamos
-            continue
-        
-        # C) Actualizar progreso (cada 10 o al final)
-        if i % 10 == 0 or i == total - 1:
-            redis_conn.hset(status_key, "current", i + 1)
-        
-        # D) SMART SLEEP (La magia para que pare rápido)
-        if delay > 0:
-            should_stop = smart_sleep(delay, status_key)
-            if should_stop:
-                print(f"Worker: Parada detectada durante el delay en registro {i}")
+    # Campos Faker unique: filtro de valores emitidos por shard, con log para reanudar
+    ulog = None
+    unique_names = filter_fields(schema, config.get('seed') is not None)
+    if unique_names:
+        ulog = UniqueLog(sim_id, shard, unique_names, state["unique"] if state else None)
+        ctx.unique = UniqueFilters(ulog.paths, shard, shards, capacity=end - start)
+
+    # 3. Inicializar estado (el contador 'current' se comparte entre shards)
+    if state:
+        restore_ctx(ctx, state["ctx"])
+        if fleet and state["fleet"]:
+            fleet.restore(state["fleet"])
+        # Las filas enviadas tras el checkpoint se regeneran: se descuentan del progreso
+        excess = state["reported"] - (state["offset"] - start)
+        if excess:
+            redis_conn.hincrby(status_key, "current", -excess)
+        ckpt.save(state["offset"], ctx, state["sink"], reported=state["offset"] - start, unique=state["unique"])
+        i = state["offset"]
+    else:
+        ckpt.save(start, ctx, sink.checkpoint(force=True), reported=0, fleet_state=fleet and fleet.state(),
+                  unique=ulog and ulog.sync())
+        i = start
+    # queued -> running solo si sigue en cola: una parada ya registrada no se pisa
+    if redis_conn.hget(status_key, "status") == b"queued":
+        if shards == 1 and not state and not config.get('table'):
+            set_status(redis_conn, sim_id, "running", total=sim_total or total, current=0)
+        else:
+            set_status(redis_conn, sim_id, "running")
+    last_ckpt = last_beat = time.monotonic()
+
+    # La parada se vigila en segundo plano y el progreso (con la telemetría) se vuelca por
+    # intervalos: el bucle no hace ningún viaje a Redis por fila
+    watcher = StopWatcher(redis_conn, sim_id, Config.STOP_POLL_SECONDS).start()
+    telemetry = Telemetry(sim_id, sink_target(config))
+    sink.telemetry = telemetry  # Errores de envío por sink (cada destino de un fan-out)
+    progress = ProgressReporter(redis_conn, status_key, ckpt.key, sink, Config.PROGRESS_FLUSH_SECONDS,
+                                sim_id=sim_id, telemetry=telemetry)
+    clock = time.perf_counter
+    # Job de la cola bulk: cede el turno por rodajas si hay trabajos interactivos esperando
+    slice_ = time_slice(redis_conn, scheduler)
+    yielded = False
+    if profiler:
+        profiler.start()
+
+    # 4. BUCLE PRINCIPAL: lotes columnares de la fuente, en serie o en pipeline (pipeline_mode);
+    #    con tasa objetivo o delay, micro-lotes del scheduler
+    if scheduler:
+        batch_size = scheduler.chunk
+    source = open_pipeline(mode, config, plan, ctx, i, end, batch_size, shard=shard, shards=shards,
+                           fleet=fleet, sensor_pool=sensor_pool, scheduler=scheduler, watcher=watcher)
+    saved_at, at_i = i, None  # Fila del último checkpoint y lote tras el que se está en la fila i
+    try:
+        for chunk in source:
+            # A) Tiempos de las etapas anteriores (espera de tasa, generación, serialización, cola)
+            for stage, seconds in chunk.seconds.items():
+                telemetry.add_time(stage, seconds)
+            if chunk.fatal:
+                telemetry.error(chunk.error)
                 break
+            n = chunk.n
+
+            # B) Enviar el lote de una vez; el tiempo se reparte entre serialización
+            #    (medida por el sink) y envío
+            if chunk.payload is None:
+                telemetry.error(chunk.error)  # Lote perdido: se cuenta y se sigue
+            elif n:
+                t0 = clock()
+                serialized = sink.serialize_seconds
+                try:
+                    if chunk.prepared:
+                        sink.send_prepared(chunk.payload)
+                    else:
+                        sink.send_columns(chunk.payload)
+                except Exception as e:
+                    # Si falla el envío, no paramos todo: el sink lo cuenta (por destino) y se loguea con límite
+                    telemetry.log('send', f"Error enviando lote: {e}")
+                serialize = sink.serialize_seconds - serialized
+                send = clock() - t0 - serialize
+                telemetry.add_time('serialize', serialize)
+                telemetry.add_time('send', send)
+                telemetry.observe_send(send)
+            if ulog is not None and chunk.payload is not None:
+                ulog.record(getattr(chunk.payload, 'batch', chunk.payload))
+            telemetry.batch(n)
+            i += n
+            at_i = chunk
 
-    # 5. Limpieza Final
+            # C) Progreso (volcado por intervalos) y checkpoint periódico
+            t0 = clock()
+            progress.add(n)
+            # Latido aparte del checkpoint: el sink puede no poder cortar todavía (Parquet/Arrow
+            # sin row group completo, flota esperando su estado) y el job no debe parecer muerto
+            if time.monotonic() - last_beat >= Config.CHECKPOINT_SECONDS:
+                ckpt.touch()
+                last_beat = time.monotonic()
+            telemetry.add_time('redis', clock() - t0)
+            if time.monotonic() - last_ckpt >= Config.CHECKPOINT_SECONDS:
+                fleet_state = source.fleet_state_at(chunk) if fleet else None
+                if fleet and fleet_state is None:
+                    source.request_fleet_state()  # Llega con uno de los próximos lotes
+                else:
+                    t0 = clock()
+                    position = sink.checkpoint()  # Hace durable lo enviado: cuenta como envío
+                    t1 = clock()
+                    telemetry.add_time('send', t1 - t0)
+                    if position is not None:
+                        ckpt.save(i, source.state_at(chunk, i), position, fleet_state=fleet_state,
+                                  unique=ulog and ulog.sync())
+                        saved_at, last_ckpt = i, time.monotonic()
+                    telemetry.add_time('redis', clock() - t1)
+
+            # D) Parada (flag local): en pipeline no se esperan los lotes ya generados
+            if watcher.stopped:
+                break
+            if slice_ is not None and i < end and slice_.expired():
+                yielded = True
+                break
+    except Exception as e:
+        # Fallo de la fuente (p. ej. un productor caído): se conserva el último checkpoint
+        print(f"Error en el pipeline: {e}")
+        telemetry.error('generate')
+        set_status(redis_conn, sim_id, "error")
+    finally:
+        source.close()
+    if i < end and watcher.stopped:
+        print(f"Worker: Parada detectada en registro {i}")
+
+    # 5. Limpieza Final (si no terminó, se deja checkpoint para poder reanudar)
     print("Worker: Cerrando conexiones...")
+    watcher.close()
+    if profiler:
+        profiler.stop()
+    progress.flush()
     try:
+        if i < end:
+            # Checkpoint en la fila i si se conoce el estado ahí (en pipeline con flota, solo si el
+            # último lote lo trajo); si no, se reanuda desde el anterior regenerando lo posterior
+            fleet_state = source.fleet_state_at(at_i) if fleet and at_i is not None else None
+            if i != saved_at and (not fleet or fleet_state is not None):
+                ckpt.save(i, source.state_at(at_i, i), sink.checkpoint(force=True), fleet_state=fleet_state,
+                          unique=ulog and ulog.sync())
+        else:
+            ckpt.clear()
+        if ulog is not None and i < end:
+            ulog.close()
+        elif ulog is not None:
+            ulog.remove()
         sink.close()
+        sink_stats = sink.stats()
+        if sink_stats:
+            redis_conn.hset(status_key, mapping={f"sink_{k}": v for k, v in sink_stats.items()})
+        if scheduler:
+            field = "rate_achieved" if shards == 1 else f"rate_achieved:{shard}"
+            redis_conn.hset(status_key, field, round(scheduler.achieved(), 2))
+        record_outputs(sim_id, shard, sink.outputs(), table=config.get('table'))
     except Exception as e:
         print(f"Error cerrando sink: {e}")
-    
+    if profiler:
+        try:
+            redis_conn.hset(metrics_key(sim_id), f"profile:{shard}", profiler.save(sim_id, shard))
+        except Exception as e:
+            print(f"Error guardando el perfil: {e}")
+
+    if i < end and yielded:
+        # Continúa desde el checkpoint al final de la cola bulk
+        ckpt.park()
+        enqueue_simulation(redis_conn, sim_id, job_config, shard, shards, resume=True, queue=BULK)
+        print(f"Worker: Simulación {tag} cede el turno en el registro {i}; continúa en la cola {BULK}.")
+        return
+    if i < end:
+        print(f"Worker: Simulación {tag} detenida en el registro {i} (reanudable).")
+        return
+
+    # Con shards, solo el último en terminar cierra la simulación
+    if shards > 1 and redis_conn.hincrby(status_key, "shards_done", 1) < shards:
+        print(f"Worker: Simulación {tag} liberada.")
+        return
+
     # Solo marcamos como completado si no fue parado manualmente
     final_status = redis_conn.hget(status_key, "status").decode('utf-8')
     if final_status != "stopped" and final_status != "error":
-        redis_conn.hset(status_key, mapping={"status": "completed", "current": total})
-    
-    print(f"Worker: Simulación {sim_id} liberada.")
+        if shards > 1:
+            finalize_shards(sim_id, config, shards)
+        if sim_total is not None and config['table'] + 1 < len(job_config['tables']):
+            next_table(sim_id, job_config, config['table'] + 1, shards)
+            print(f"Worker: Simulación {tag} liberada; sigue la tabla siguiente.")
+            return
+        set_status(redis_conn, sim_id, "completed", current=sim_total or total)
+        if config.get('cache_key'):
+            cache_outputs(sim_id, config)
+
+    print(f"Worker: Simulación {tag} liberada.")
+
+def cache_outputs(sim_id, config):
+    """Guarda en la caché de datasets los ficheros de una simulación terminada sin errores."""
+    try:
+        metrics = redis_conn.hgetall(metrics_key(sim_id))
+        if any(k.startswith(b"errors:") and int(v) for k, v in metrics.items()):
+            print(f"Worker: Simulación {sim_id} con lotes perdidos; no se guarda en la caché.")
+            return
+        outputs = {path.decode('utf-8'): json.loads(meta)
+                   for path, meta in redis_conn.hgetall(f"sim_files:{sim_id}").items()}
+        if DatasetCache(redis_conn).store(config['cache_key'], config['cache_data_key'],
+                                          f"{config['simulation_name']}_{sim_id}.", Config.DATA_DIR,
+                                          outputs, replayable(config)):
+            print(f"Worker: Simulación {sim_id} guardada en la caché ({config['cache_key']}).")
+    except Exception as e:
+        print(f"Aviso: no se pudo guardar la simulación {sim_id} en la caché: {e}")
+
+def cache_lookup(config, shards):
+    """
+    Busca la simulación en la caché de datasets (solo lecturas de Redis: la API no toca ficheros).
+    En un acierto devuelve {'key', 'replay'} para cache_task; en un fallo lo cuenta, deja en
+    config las claves para guardarla al terminar y devuelve None.
+    """
+    cache = DatasetCache(redis_conn)
+    dkey, key = cache_keys(config, shards)
+    files, messages = file_specs(config), message_config(config)
+    entry = cache.entry(key) if files else None
+    replay = cache.replay_entry(dkey) if messages else None
+    if (entry is not None or not files) and (replay is not None or not messages):
+        return {"key": key if entry is not None else None, "replay": replay}
+    cache.record(False)
+    if files:
+        config.update(cache_key=key, cache_data_key=dkey)
+    return None
+
+def cache_task(sim_id, config, hit, shards, queue):
+    """
+    Acierto de caché: enlaza los ficheros de la entrada con el nombre de la simulación (con una
+    copia completa si la caché está en otro sistema de ficheros, de ahí que sea un job), los
+    registra y reenvía el NDJSON cacheado a los destinos de mensajes. Si la entrada se expulsó
+    desde la consulta, se genera como en un fallo.
+    """
+    cache = DatasetCache(redis_conn)
+    outputs = []
+    try:
+        if hit["key"] is not None:
+            entry = cache.entry(hit["key"])
+            if entry is None:
+                raise OSError("entrada expulsada")
+            outputs = cache.materialize(hit["key"], entry, f"{config['simulation_name']}_{sim_id}.",
+                                        sim_id, Config.DATA_DIR)
+        if hit["replay"] is not None and not os.path.isdir(os.path.join(cache.root, hit["replay"][0])):
+            raise OSError("entrada expulsada")
+    except (OSError, ValueError) as e:
+        print(f"Aviso: entrada de caché no disponible para {sim_id} ({e}); se genera.")
+        for path, _, _, _ in outputs:
+            os.remove(path)
+        cache.record(False)
+        dkey, key = cache_keys(config, shards)
+        if file_specs(config):
+            config.update(cache_key=key, cache_data_key=dkey)
+        redis_conn.set(f"sim_config:{sim_id}", json.dumps(config))
+        redis_conn.hset(f"sim_status:{sim_id}", "cache", "miss")
+        for shard in range(shards):
+            enqueue_simulation(redis_conn, sim_id, config, shard, shards, queue=queue)
+        return
+    cache.record(True, [k for k in (hit["key"], hit["replay"] and hit["replay"][0]) if k])
+
+    if outputs:
+        redis_conn.hset(f"sim_files:{sim_id}", mapping={
+            path: json.dumps({"rows": rows, "shard": shard, "index": index, "table": None})
+            for path, rows, shard, index in outputs
+        })
+    if hit["replay"] is not None:
+        replay_cached(sim_id, config, hit["replay"][1])
+    else:
+        set_status(redis_conn, sim_id, "completed", current=config['total_records'])
+        print(f"Worker: Simulación {sim_id} servida desde la caché.")
+
+def replay_cached(sim_id, config, paths):
+    """
+    Acierto de caché con destinos de mensajes: reenvía las líneas del NDJSON cacheado tal
+    cual (sin generar ni volver a codificar), a máxima velocidad y sin ritmo. No tiene
+    checkpoint: si se interrumpe, se vuelve a lanzar la simulación.
+    """
+    print(f"Worker: Reproduciendo simulación {sim_id} desde la caché...")
+    status_key = f"sim_status:{sim_id}"
+    try:
+        sink = get_sink(message_config(config), sim_id, Config.DATA_DIR)
+    except Exception as e:
+        print(f"Error fatal configurando Sink: {e}")
+        set_status(redis_conn, sim_id, "error")
+        return
+    if redis_conn.hget(status_key, "status") == b"queued":
+        set_status(redis_conn, sim_id, "running")
+    watcher = StopWatcher(redis_conn, sim_id, Config.STOP_POLL_SECONDS).start()
+    telemetry = Telemetry(sim_id, sink_target(message_config(config)))
+    sink.telemetry = telemetry
+    progress = ProgressReporter(redis_conn, status_key, None, sink, Config.PROGRESS_FLUSH_SECONDS,
+                                sim_id=sim_id, telemetry=telemetry)
+    failed = False
+    try:
+        for lines in replay_batches(paths, config.get('batch_size') or Config.BATCH_SIZE):
+            t0 = time.perf_counter()
+            try:
+                sink.send_prepared(EncodedBatch.from_json_rows(lines, config.get('json_encoder')))
+            except Exception as e:
+                telemetry.log('send', f"Error enviando lote: {e}")
+            telemetry.add_time('send', time.perf_counter() - t0)
+            telemetry.batch(len(lines))
+            progress.add(len(lines))
+            if watcher.stopped:
+                break
+    except Exception as e:
+        # Entrada expulsada o ilegible a mitad: se informa como error (la simulación se puede relanzar)
+        print(f"Error leyendo la caché: {e}")
+        failed = True
+    finally:
+        watcher.close()
+        progress.flush()
+        try:
+            sink.close()
+        except Exception as e:
+            print(f"Error cerrando sink: {e}")
+    if failed:
+        set_status(redis_conn, sim_id, "error")
+    elif not watcher.stopped:
+        set_status(redis_conn, sim_id, "completed", current=config['total_records'])
+    print(f"Worker: Simulación {sim_id} reproducida.")
+
+def table_job(sim_id, config):
+    """
+    Configuración plana, índices de claves y filas totales del job de la tabla config['table'].
+    Las filas de cada tabla se calculan una vez (el primer job) y quedan en el estado.
+    """
+    status_key = f"sim_status:{sim_id}"
+    raw = redis_conn.hget(status_key, "table_rows")
+    if raw is None:
+        rows = table_rows(config)
+        redis_conn.hset(status_key, mapping={"table_rows": json.dumps(rows), "total": sum(rows)})
+    else:
+        rows = json.loads(raw)
+    k = config.get('table', 0)
+    return table_config(config, k, rows), table_keys(config, k, rows), sum(rows)
+
+def next_table(sim_id, config, k, shards):
+    """Encola los shards de la tabla k cuando la anterior ha terminado del todo."""
+    redis_conn.hset(f"sim_status:{sim_id}", mapping={"table": k, "shards_done": 0})
+    config = dict(config, table=k)
+    for shard in range(shards):
+        enqueue_simulation(redis_conn, sim_id, config, shard, shards)
+
+def record_outputs(sim_id, shard, outputs, table=None):
+    """Registra en sim_files:{sim_id} los ficheros cerrados por un shard y sus filas."""
+    if outputs:
+        redis_conn.hset(f"sim_files:{sim_id}", mapping={
+            path: json.dumps({"rows": rows, "shard": shard, "index": k, "table": table})
+            for k, (path, rows) in enumerate(outputs)
+        })
+
+def sim_outputs(sim_id, table=None) -> list:
+    """[(ruta, filas)] de una simulación (o de una de sus tablas), en orden de shard y de parte."""
+    entries = []
+    for path, meta in redis_conn.hgetall(f"sim_files:{sim_id}").items():
+        meta = json.loads(meta)
+        if meta.get("table") == table:
+            entries.append((meta["shard"], meta["index"], path.decode('utf-8'), meta["rows"]))
+    return [(path, rows) for _, _, path, rows in sorted(entries)]
+
+def finalize_shards(sim_id, config, shards):
+    """Une las partes de cada fichero (merge_shards) o deja un manifest que las describe."""
+    specs = [c for c in sink_configs(config) if c.get('target_type') == 'file']
+    outputs = sim_outputs(sim_id, config.get('table'))
+    for spec in specs:
+        fmt = spec.get('file_format', 'json')
+        compression = spec.get('file_compression')
+        ext = file_extension(fmt, compression)
+        # Con varios ficheros, cada uno se reconoce por su extensión (y lleva su manifest)
+        files = [(path, rows) for path, rows in outputs if path.endswith(f".{ext}")] if len(specs) > 1 else outputs
+        manifest_ext = f"{ext}.manifest.json" if len(specs) > 1 else 'manifest.json'
+        rolled = spec.get('file_max_rows') or spec.get('file_max_mb')
+        try:
+            if spec.get('merge_shards') and can_merge(fmt, compression) and not rolled:
+                out = file_sink_path(spec, sim_id, Config.DATA_DIR)
+                merge_file_parts([path for path, _ in files], out, fmt)
+                for path, _ in files:
+                    os.remove(path)
+                if files:
+                    redis_conn.hdel(f"sim_files:{sim_id}", *[path for path, _ in files])
+                record_outputs(sim_id, 0, [(out, sum(rows for _, rows in files))], table=config.get('table'))
+            else:
+                if spec.get('merge_shards'):
+                    print(f"Worker: {fmt}/{compression or 'sin compresión'} con rotación o compresión no se puede unir; se genera manifest.")
+                write_manifest(file_sink_path(spec, sim_id, Config.DATA_DIR, ext=manifest_ext), files,
+                               sim_id=sim_id, seed=spec.get('seed'), shards=shards, format=fmt, compression=compression)
+        except Exception as e:
+            print(f"Error finalizando shards de {sim_id}: {e}")
+
+def resume_simulation(sim_id) -> int:
+    """
+    Re-encola desde su último checkpoint los shards no terminados de una simulación.
+    Un shard con latido reciente en una simulación 'running' sigue vivo y no se toca;
+    uno que cedió el turno (parked) ya tiene su continuación en cola.
+    Devuelve el número de shards re-encolados.
+    """
+    raw = redis_conn.get(f"sim_config:{sim_id}")
+    if raw is None:
+        return 0
+    config = json.loads(raw)
+    status_key = f"sim_status:{sim_id}"
+    status = (redis_conn.hget(status_key, "status") or b"").decode('utf-8')
+    if config.get('tables'):
+        config['table'] = int(redis_conn.hget(status_key, "table") or 0)  # Tabla en curso
+    shards = int(redis_conn.hget(status_key, "shards") or 1)
+    stale_after = Config.STALE_AFTER_SECONDS + float(config.get('delay_seconds') or 0)
+    if config.get('fleet_mode'):
+        stale_after += float(config.get('fleet_tick_seconds') or 0)
+
+    enqueued = 0
+    for sid, shard in active_checkpoints(redis_conn):
+        if sid != sim_id:
+            continue
+        state = CheckpointStore(redis_conn, sim_id, shard).load()
+        if state is None or (status == "running" and (state["parked"] or time.time() - state["ts"] < stale_after)):
+            continue
+        if state["parked"]:
+            enqueued += 1  # Parada mientras esperaba turno: basta con reactivar el estado
+            continue
+        # Evita que dos workers/peticiones reanuden el mismo shard a la vez
+        if not redis_conn.set(f"sim_resume_lock:{sim_id}:{shard}", 1, nx=True, ex=max(int(stale_after), 1)):
+            continue
+        enqueue_simulation(redis_conn, sim_id, config, shard, shards, resume=True)
+        enqueued += 1
+
+    if enqueued:
+        set_status(redis_conn, sim_id, "queued")
+    return enqueued
+
+def recover_stale_simulations():
+    """
+    Re-encola automáticamente las simulaciones 'running' cuyo worker dejó de latir y
+    borra los checkpoints de simulaciones cuyo estado ya caducó (retención).
+    """
+    for sid, shard in list(active_checkpoints(redis_conn)):
+        if not redis_conn.exists(f"sim_status:{sid}"):
+            CheckpointStore(redis_conn, sid, shard).clear()
+            remove_logs(sid, shard)
+    for sim_id in {sid for sid, _ in active_checkpoints(redis_conn)}:
+        status = redis_conn.hget(f"sim_status:{sim_id}", "status")
+        if status == b"running" and resume_simulation(sim_id):
+            print(f"Worker: Simulación {sim_id} huérfana re-encolada desde su checkpoint.")
 
 if __name__ == '__main__':
     print("Iniciando Worker de Mega Simulator...")
-    worker = Worker(['default'], connection=redis_conn)
-    worker.work()
\ No newline at end of file
+    recover_stale_simulations()
+    from core.supervisor import Supervisor
+    Supervisor(redis_conn).run()
\ No newline at end of file